@@ -0,0 +1,98 @@
+# 다단계(pipeline) 모드와 단일 호출(fused) 모드의 지연시간 / 입력 토큰 비교 벤치마크
+#
+# 사용법 (저장소 루트에서 실행):
+#   python benchmarks/bench_fused.py --offline            # API 키 없이 가짜 클라이언트로 실행
+#   python benchmarks/bench_fused.py --runs 5             # 실제 OpenAI API 로 실행 (.env 의 OPENAI_API_KEY 사용)
+#   python benchmarks/bench_fused.py --user-prompt "오늘은 기분 좋은 하루"   # 충돌 감지 단계까지 포함해서 비교
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+import main  # noqa: E402
+from llm_cache import bypass_cache  # noqa: E402
+
+
+class UsageRecorder:
+    """
+    클라이언트의 create 호출을 감싸서 호출 수와 토큰 사용량을 기록합니다.
+    """
+
+    def __init__(self, client):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._create = client.chat.completions.create
+        client.chat.completions.create = self.create
+
+    async def create(self, **params):
+        response = await self._create(**params)
+        self.calls += 1
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+        return response
+
+    def reset(self):
+        self.calls = self.prompt_tokens = self.completion_tokens = 0
+
+
+async def run_mode(recorder: UsageRecorder, data: "main.DiaryRequest", runs: int) -> dict:
+    latencies, prompt_tokens, completion_tokens, calls = [], [], [], []
+    for _ in range(runs):
+        recorder.reset()
+        start = time.perf_counter()
+        with bypass_cache():  # 캐시 적중으로 결과가 왜곡되지 않도록 매번 실제 호출
+            await main.generate_diary_by_mode(data)
+        latencies.append(time.perf_counter() - start)
+        prompt_tokens.append(recorder.prompt_tokens)
+        completion_tokens.append(recorder.completion_tokens)
+        calls.append(recorder.calls)
+    return {
+        "calls": statistics.mean(calls),
+        "latency_mean_s": statistics.mean(latencies),
+        "latency_min_s": min(latencies),
+        "prompt_tokens": statistics.mean(prompt_tokens),
+        "completion_tokens": statistics.mean(completion_tokens),
+    }
+
+
+async def main_async(args):
+    if args.offline:
+        from offline_client import OfflineAsyncOpenAI
+        main.async_client = OfflineAsyncOpenAI(latency=args.latency)
+    recorder = UsageRecorder(main.async_client)
+
+    with open(args.file, encoding="utf-8") as f:
+        chat_by_date = main.extract_chat_by_date(f.read())
+    kakao_text = "\n".join(message for messages in chat_by_date.values() for message in messages)
+
+    results = {}
+    for mode in ("pipeline", "fused"):
+        data = main.DiaryRequest(kakao_text=kakao_text, user_prompt=args.user_prompt, mode=mode)
+        results[mode] = await run_mode(recorder, data, args.runs)
+
+    print(f"입력: {args.file} ({len(kakao_text)}자), 반복 {args.runs}회, {'오프라인' if args.offline else 'OpenAI API'}")
+    print(f"{'mode':<10}{'calls':>7}{'mean(s)':>10}{'min(s)':>10}{'in_tok':>10}{'out_tok':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['calls']:>7.1f}{r['latency_mean_s']:>10.2f}{r['latency_min_s']:>10.2f}"
+              f"{r['prompt_tokens']:>10.0f}{r['completion_tokens']:>10.0f}")
+    p, f_ = results["pipeline"], results["fused"]
+    print(f"fused / pipeline: 지연시간 {f_['latency_mean_s'] / p['latency_mean_s']:.2f}배, "
+          f"입력 토큰 {f_['prompt_tokens'] / p['prompt_tokens']:.2f}배")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--file", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_chat.txt"))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--user-prompt", default=None)
+    parser.add_argument("--offline", action="store_true", help="실제 API 대신 오프라인 가짜 클라이언트 사용")
+    parser.add_argument("--latency", type=float, default=0.8, help="오프라인 모드의 호출당 기본 지연시간(초)")
+    asyncio.run(main_async(parser.parse_args()))
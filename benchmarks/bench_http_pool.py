@@ -0,0 +1,125 @@
+# OpenAI 연결 풀(http_pool.py) 벤치마크: 가짜 OpenAI 서버를 상대로 SDK 기본 연결 설정과 조정한 연결 풀 비교
+# - 가짜 서버는 새 연결의 첫 요청을 --connect-latency 만큼 늦게 처리 (TCP + TLS 연결 준비 시간 흉내)
+# - cold: 클라이언트를 만든 직후 동시 요청 한 묶음 (조정한 풀은 서버 시작 때처럼 연결을 미리 열어둔 뒤)
+# - steady: 연결이 열린 뒤 계속 들어오는 요청 (--calls 회, 동시 --concurrency 개)
+# - idle: --idle 초 쉰 뒤 동시 요청 한 묶음 (SDK 기본 keep-alive 5초가 지나면 연결이 닫혀 있음)
+# - 구간별 p50 / p95 지연시간과 새로 연 연결 수 (가짜 서버 기준), 조정한 풀의 재사용률 / 풀 대기 시간
+#
+# 사용법 (저장소 루트에서 실행):
+#   python benchmarks/bench_http_pool.py
+#   python benchmarks/bench_http_pool.py --connect-latency 0.3 --concurrency 16 --calls 400 --idle 8
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from openai import AsyncOpenAI  # noqa: E402
+
+from http_pool import HttpPool  # noqa: E402
+from mock_openai_server import MockConfig, create_mock_app  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+async def timed_calls(client: AsyncOpenAI, count: int, concurrency: int) -> list[float]:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> float:
+        async with limit:
+            started = time.perf_counter()
+            await client.chat.completions.create(
+                model="gpt-4o-mini", temperature=0.1,
+                messages=[{"role": "user", "content": f"다음 대화를 요약해주세요 #{i}"}],
+            )
+            return time.perf_counter() - started
+
+    return await asyncio.gather(*(one(i) for i in range(count)))
+
+
+async def run_config(name: str, base_url: str, mock: httpx.AsyncClient, args) -> list[tuple]:
+    await mock.post("/stats/reset")
+    pool = None
+    startup = 0.0
+    if name == "tuned":
+        pool = HttpPool(max_connections=args.pool_size or args.concurrency, keepalive_expiry=args.keepalive,
+                        prewarm=args.concurrency)
+        client = AsyncOpenAI(api_key="mock", base_url=f"{base_url}/v1", max_retries=0,
+                             http_client=pool.build_client())
+        started = time.perf_counter()
+        await pool.prewarm(str(client.base_url))   # 서버 시작(lifespan) 때 하는 것과 같음
+        startup = time.perf_counter() - started
+    else:
+        client = AsyncOpenAI(api_key="mock", base_url=f"{base_url}/v1", max_retries=0)
+
+    rows = []
+    phases = [("cold", args.concurrency, 0.0), ("steady", args.calls, 0.0), ("idle", args.concurrency, args.idle)]
+    for phase, count, idle in phases:
+        if idle:
+            await asyncio.sleep(idle)
+        before = (await mock.get("/stats")).json()["connections"]
+        latencies = await timed_calls(client, count, args.concurrency)
+        opened = (await mock.get("/stats")).json()["connections"] - before
+        rows.append((phase, percentile(latencies, 50), percentile(latencies, 95), opened))
+    await client.close()
+    return [(startup, pool.stats() if pool else None)] + rows
+
+
+async def run(args):
+    port = free_port()
+    config = MockConfig(latency=args.latency, dist="fixed", token_latency=0.0, connect_latency=args.connect_latency,
+                        seed=7)
+    server = uvicorn.Server(uvicorn.Config(create_mock_app(config), host="127.0.0.1", port=port, log_level="critical",
+                                           timeout_keep_alive=120))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{port}"
+    print(f"응답 지연 {args.latency}s / 새 연결 준비 {args.connect_latency}s / 동시 {args.concurrency}개 / "
+          f"steady {args.calls}회 / idle {args.idle}s")
+    print(f"{'설정':<12} | {'구간':<6} | {'p50(s)':>7} | {'p95(s)':>7} | {'새 연결':>6}")
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as mock:
+            for name in ("sdk-default", "tuned"):
+                (startup, stats), *rows = await run_config(name, base_url, mock, args)
+                for phase, p50, p95, opened in rows:
+                    print(f"{name:<12} | {phase:<6} | {p50:>7.3f} | {p95:>7.3f} | {opened:>6}")
+                if stats:
+                    print(f"{'':<12}   미리 열기 {stats['prewarmed']}개 {startup * 1000:.0f}ms / 재사용률 {stats['reuse_rate']:.1%} / "
+                          f"평균 풀 대기 {stats['avg_pool_wait_ms']}ms / 포화 {stats['saturated']}회")
+    finally:
+        server.should_exit = True
+        await server_task
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2, help="가짜 서버 응답 지연(초)")
+    parser.add_argument("--connect-latency", type=float, default=0.15, help="새 연결 준비 시간(초, TCP + TLS 흉내)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=0, help="조정한 풀의 최대 연결 수 (0 이면 --concurrency)")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--idle", type=float, default=6.0, help="idle 구간 전에 쉬는 시간(초)")
+    parser.add_argument("--keepalive", type=float, default=90.0, help="조정한 풀의 keep-alive 유지 시간(초)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
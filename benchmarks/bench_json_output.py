@@ -0,0 +1,127 @@
+# LLM 응답 JSON 파서(json_output.extract_json) 벤치마크
+# - fixtures/malformed_llm_responses.jsonl 의 응답(정상 + 자주 보이는 형식 오류)을 단계별 스키마로 파싱
+#   (코드 펜스, 앞뒤 설명 문장, max_tokens 로 잘린 응답, 끝 쉼표, 빠진 여는 중괄호, 문자열 숫자, 키 누락 등)
+# - 이전 단계별 파싱 방식(```json 분리 + json.loads, 일기 중괄호 보정)과 비교
+#   - 실패: 예외가 나서 단계 기본값("분석 실패" 등) / 500 응답으로 이어지는 경우
+#   - 스키마 일치: 보정 없이 또는 겉모양 보정만으로 스키마에 맞는 값을 얻은 경우
+# - 응답 하나당 파싱 시간 (정상 응답은 빠른 경로)
+#
+# 사용법 (저장소 루트에서 실행):
+#   python benchmarks/bench_json_output.py
+#   python benchmarks/bench_json_output.py --repeat 2000 --verbose
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from json_output import JSONOutputError, extract_json  # noqa: E402
+
+CORPUS_PATH = os.path.join(BENCH_DIR, "fixtures", "malformed_llm_responses.jsonl")
+
+
+def load_schemas() -> dict:
+    # main.py 의 단계별 스키마를 그대로 사용 (main 을 불러오면 서버 설정도 읽으므로 캐시 / 데이터는 임시 경로로)
+    import tempfile
+    os.environ.setdefault("LLM_CACHE_DB", "off")
+    os.environ.setdefault("DIARY_DATA_DIR", tempfile.mkdtemp(prefix="bench_json_output_"))
+    import main
+    return {**main.STAGE_SCHEMAS, "fused": main.build_fused_schema(False)}
+
+
+def _legacy_fence(content: str) -> str:
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0].strip()
+    return content
+
+
+def legacy_parse(stage: str, content: str):
+    """이전 main.py 의 단계별 파싱 방식"""
+    if stage == "conflict":
+        return json.loads(content)
+    if stage in ("summary", "summary_chunk"):
+        content = _legacy_fence(content)
+        return content if not content.startswith("{") else json.loads(content)["summary"]
+    if stage in ("diary", "fused"):
+        content = _legacy_fence(content)
+        if not content.startswith("{"):
+            content = "{" + content
+        if not content.endswith("}"):
+            last_brace_index = content.rfind("}")
+            if last_brace_index != -1:
+                content = content[:last_brace_index + 1]
+        return json.loads(content)
+    return json.loads(_legacy_fence(content))
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        try:
+            fn()
+        except (ValueError, KeyError, IndexError):
+            pass
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def run(args):
+    schemas = load_schemas()
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    by_kind = defaultdict(lambda: {"total": 0, "legacy_fail": 0, "fail": 0, "conforms": 0})
+    legacy_us, new_us = [], []
+    for item in corpus:
+        stage, response = item["stage"], item["response"]
+        schema = schemas[stage]
+        row = by_kind[item["kind"]]
+        row["total"] += 1
+        try:
+            legacy_parse(stage, response)
+        except (ValueError, KeyError, IndexError):
+            row["legacy_fail"] += 1
+        try:
+            parsed = extract_json(response, schema)
+            row["conforms"] += parsed.conforms
+            if args.verbose:
+                print(f"{item['id']:<28} {parsed.repairs}")
+        except JSONOutputError as e:
+            row["fail"] += 1
+            if args.verbose:
+                print(f"{item['id']:<28} 실패: {e}")
+        legacy_us.append(timed(lambda: legacy_parse(stage, response), args.repeat))
+        new_us.append(timed(lambda: extract_json(response, schema), args.repeat))
+
+    print(f"응답 {len(corpus)}개 (fixtures/{os.path.basename(args.corpus)})")
+    print(f"{'형식':<16} | {'개수':>4} | {'이전 실패':>8} | {'새 파서 실패':>10} | {'스키마 일치':>10}")
+    for kind, row in sorted(by_kind.items()):
+        print(f"{kind:<16} | {row['total']:>4} | {row['legacy_fail']:>8} | {row['fail']:>10} | {row['conforms']:>10}")
+    total = len(corpus)
+    legacy_fail = sum(row["legacy_fail"] for row in by_kind.values())
+    fail = sum(row["fail"] for row in by_kind.values())
+    conforms = sum(row["conforms"] for row in by_kind.values())
+    print()
+    print(f"파싱 실패율: 이전 {legacy_fail / total:.1%} → 새 파서 {fail / total:.1%} (스키마 일치 {conforms / total:.1%})")
+    valid = [i for i, item in enumerate(corpus) if item["kind"] == "valid"]
+    print(f"파싱 시간(정상 응답): 이전 {statistics.mean(legacy_us[i] for i in valid):.1f}µs / "
+          f"새 파서 {statistics.mean(new_us[i] for i in valid):.1f}µs")
+    print(f"파싱 시간(전체): 이전 {statistics.mean(legacy_us):.1f}µs / 새 파서 {statistics.mean(new_us):.1f}µs")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--repeat", type=int, default=500, help="응답별 파싱 시간 측정 반복 횟수")
+    parser.add_argument("--verbose", action="store_true", help="응답별 보정 종류 출력")
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,159 @@
+# 로컬 감정 분석 / 키워드 추출(local_nlp.py) 벤치마크와 LLM 결과 일치도 리포트
+# - 속도: 문서 빈도 계산 시간, 문서 하나당 감정 / 키워드 계산 시간 (평균, p95)
+# - 일치도: fixtures/emotion_keyword_corpus.jsonl 의 LLM 결과(llm.emotions / llm.keywords)와 비교
+#   - 감정: 가장 큰 항목(좋음 / 평범함 / 나쁨)이 같은 비율, 항목별 평균 절대 오차(MAE, %p)
+#   - 키워드: 한쪽이 다른 쪽을 포함하면 같은 키워드로 보고 precision / recall / F1
+# - 코퍼스의 reference 가 "manual" 인 항목은 LLM 응답 형식에 맞춰 직접 작성한 예시 정답이므로,
+#   실제 모델과 비교하려면 --record 로 OpenAI API 결과를 다시 기록한 뒤 실행
+#
+# 사용법 (저장소 루트에서 실행):
+#   python benchmarks/bench_local_nlp.py
+#   python benchmarks/bench_local_nlp.py --days 2000 --repeat 20
+#   OPENAI_API_KEY=... python benchmarks/bench_local_nlp.py --record   # 코퍼스의 LLM 결과를 실제 API 로 갱신
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from chat_store import ChatStore  # noqa: E402
+from local_nlp import DocumentFrequencies, EmotionScorer, KeywordExtractor  # noqa: E402
+from synthetic_export import generate_export_lines  # noqa: E402
+
+CORPUS_PATH = os.path.join(BENCH_DIR, "fixtures", "emotion_keyword_corpus.jsonl")
+LABELS = ("좋음", "평범함", "나쁨")
+DIARY_SECTIONS = ["상황설명", "감정표현", "공감과인정", "따뜻한위로", "실용적제안"]
+
+
+def load_corpus(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def diary_text(diary: dict) -> str:
+    return " ".join(diary.get(section, "") for section in DIARY_SECTIONS)
+
+
+def build_frequencies(corpus: list[dict], days: int) -> tuple[DocumentFrequencies, float, int]:
+    # 서버와 같은 경로(ChatStore.iter_days)로 과거 대화 문서 빈도 계산: 가짜 내보내기 파일 + 코퍼스 대화
+    with tempfile.TemporaryDirectory(prefix="bench_local_nlp_") as tmp:
+        store = ChatStore(os.path.join(tmp, "chats.sqlite3"))
+        store.ingest("synthetic", generate_export_lines(days * 13, messages_per_day=12, seed=3))
+        started = time.perf_counter()
+        documents = ["\n".join(messages) for _, _, messages in store.iter_days()]
+        documents += [item["kakao_text"] for item in corpus]
+        frequencies = DocumentFrequencies.build(documents)
+        return frequencies, time.perf_counter() - started, len(documents)
+
+
+def keyword_match(a: str, b: str) -> bool:
+    a, b = a.replace(" ", ""), b.replace(" ", "")
+    return a in b or b in a
+
+
+def keyword_scores(predicted: list[str], expected: list[str]) -> tuple[float, float]:
+    if not predicted or not expected:
+        return 0.0, 0.0
+    precision = sum(any(keyword_match(p, e) for e in expected) for p in predicted) / len(predicted)
+    recall = sum(any(keyword_match(p, e) for p in predicted) for e in expected) / len(expected)
+    return precision, recall
+
+
+def dominant(emotions: dict) -> str:
+    return max(LABELS, key=lambda label: emotions.get(label, 0))
+
+
+def run(args):
+    corpus = load_corpus(args.corpus)
+    frequencies, df_seconds, documents = build_frequencies(corpus, args.days)
+    scorer, extractor = EmotionScorer(), KeywordExtractor(frequencies)
+    print(f"문서 빈도: 문서 {documents}개 / 단어 {len(frequencies.df)}개 / 계산 {df_seconds * 1000:.1f}ms")
+
+    emotion_ms, keyword_ms = [], []
+    rows = []
+    for item in corpus:
+        text = diary_text(item["diary"])
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            emotions = scorer.score(item["kakao_text"], item["diary"].get("감정표현", ""))
+            emotion_ms.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            keywords = extractor.extract(text)
+            keyword_ms.append((time.perf_counter() - started) * 1000)
+        rows.append((item, emotions, keywords))
+
+    print(f"감정 계산: 평균 {statistics.mean(emotion_ms):.3f}ms / p95 {percentile(emotion_ms, 95):.3f}ms")
+    print(f"키워드 추출: 평균 {statistics.mean(keyword_ms):.3f}ms / p95 {percentile(keyword_ms, 95):.3f}ms")
+    print()
+
+    references = sorted({item.get("reference", "manual") for item, _, _ in rows})
+    print(f"LLM 결과와의 일치도 (코퍼스 {len(rows)}개, reference: {', '.join(references)})")
+    print(f"{'id':<20} | {'LLM 감정':<12} | {'로컬 감정':<12} | {'MAE':>5} | {'P':>4} | {'R':>4} | 로컬 키워드")
+    same_label, maes, precisions, recalls = 0, [], [], []
+    for item, emotions, keywords in rows:
+        expected = item["llm"]
+        mae = sum(abs(emotions[label] - expected["emotions"].get(label, 0)) for label in LABELS) / len(LABELS)
+        precision, recall = keyword_scores(keywords, expected["keywords"])
+        same_label += dominant(emotions) == dominant(expected["emotions"])
+        maes.append(mae)
+        precisions.append(precision)
+        recalls.append(recall)
+        llm_emotions = "/".join(str(expected["emotions"].get(label, 0)) for label in LABELS)
+        local_emotions = "/".join(str(emotions[label]) for label in LABELS)
+        print(f"{item['id']:<20} | {llm_emotions:<12} | {local_emotions:<12} | {mae:>5.1f} | {precision:>4.2f} | "
+              f"{recall:>4.2f} | {', '.join(keywords)}")
+
+    precision, recall = statistics.mean(precisions), statistics.mean(recalls)
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    print()
+    print(f"감정: 대표 감정 일치 {same_label / len(rows):.1%} / 평균 절대 오차 {statistics.mean(maes):.1f}%p")
+    print(f"키워드: precision {precision:.2f} / recall {recall:.2f} / F1 {f1:.2f}")
+
+
+async def record(args):
+    # 코퍼스의 LLM 결과를 실제 OpenAI API 응답(main.analyze_emotions / main.extract_keywords)으로 갱신
+    os.environ.setdefault("LLM_CACHE_DB", "off")
+    os.environ.setdefault("DIARY_DATA_DIR", tempfile.mkdtemp(prefix="bench_local_nlp_"))
+    import main
+    from llm_cache import bypass_cache
+
+    corpus = load_corpus(args.corpus)
+    with bypass_cache():
+        for item in corpus:
+            request = main.DiaryRequest(kakao_text=item["kakao_text"])
+            emotions = await main.analyze_emotions(request, item["diary"])
+            keywords = await main.extract_keywords(item["diary"])
+            item["llm"] = {"emotions": emotions, "keywords": keywords}
+            item["reference"] = main.model_router.route("emotion").model
+            print(f"{item['id']}: {emotions} {keywords}")
+    with open(args.corpus, "w", encoding="utf-8") as f:
+        for item in corpus:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--days", type=int, default=1000, help="문서 빈도 계산에 쓰는 가짜 대화 날짜 수")
+    parser.add_argument("--repeat", type=int, default=50, help="속도 측정용 문서별 반복 횟수")
+    parser.add_argument("--record", action="store_true", help="코퍼스의 LLM 결과를 실제 API 로 다시 기록")
+    args = parser.parse_args()
+    if args.record:
+        asyncio.run(record(args))
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main_cli()
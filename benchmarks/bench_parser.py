@@ -0,0 +1,95 @@
+# 카카오톡 파싱 엔진 처리량 벤치마크: 기존 줄 단위 파서 vs kakao_parser 공용 엔진
+#
+# 사용법 (저장소 루트에서 실행):
+#   python benchmarks/bench_parser.py               # 100만 줄 가짜 내보내기 파일로 측정
+#   python benchmarks/bench_parser.py --lines 200000 --repeat 3
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+import main  # noqa: E402
+from synthetic_export import generate_export_lines  # noqa: E402
+
+
+# ---- 비교 기준: 공용 엔진 도입 전의 줄 단위 파서 (main.py 에 있던 구현 그대로) ----
+def legacy_extract_today_chat(text: str) -> str:
+    lines = text.splitlines()
+    chat = []
+    msg = re.compile(r"^\d{2}/\d{2}/\d{2}\s+\d{1,2}:\d{2},\s+(.*?)\s*:\s*(.*)")
+    for ln in lines:
+        ln = ln.strip()
+        matching = msg.match(ln)
+        if matching:
+            msg_txt = matching.group(2).strip()
+            if not any(k in msg_txt for k in ["[사진]", "이모티콘", "님이 입장", "님이 나갔"]):
+                chat.append(msg_txt)
+    return "\n".join(chat[-30:])
+
+
+def legacy_extract_chat_by_date(text: str, target_date: str | None = None) -> dict:
+    lines = text.splitlines()
+    chat_by_date = {}
+    current_date = None
+    date_pattern = re.compile(r"(\d{4}년\s*)?(\d{1,2}월\s*\d{1,2}일)")
+    msg_pattern = re.compile(r"^\d{2}/\d{2}/\d{2}\s+\d{1,2}:\d{2},\s+(.*?)\s*:\s*(.*)")
+    for line in lines:
+        line = line.strip()
+        date_match = date_pattern.search(line)
+        if date_match:
+            date_str = date_match.group(2)
+            day_match = re.search(r"(\d{1,2})일", date_str)
+            if day_match:
+                current_date = day_match.group(1) + "일"
+                if current_date not in chat_by_date:
+                    chat_by_date[current_date] = []
+            continue
+        msg_match = msg_pattern.match(line)
+        if msg_match and current_date:
+            msg_txt = msg_match.group(2).strip()
+            if not any(k in msg_txt for k in ["[사진]", "이모티콘", "님이 입장", "님이 나갔"]):
+                chat_by_date[current_date].append(msg_txt)
+    if target_date:
+        return {target_date: chat_by_date.get(target_date, [])}
+    return chat_by_date
+
+
+def best_of(repeat: int, func):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main_cli(args):
+    text = "\n".join(generate_export_lines(args.lines)) + "\n"
+    print(f"가짜 내보내기 파일: {args.lines:,}줄, {len(text.encode('utf-8')) / 2**20:.1f} MB, 최소 시간 기준 {args.repeat}회 반복")
+    print(f"{'작업':<36}{'기존(줄/초)':>14}{'엔진(줄/초)':>14}{'배수':>8}")
+
+    cases = [
+        ("extract_chat_by_date (전체 날짜)",
+         lambda: legacy_extract_chat_by_date(text), lambda: main.extract_chat_by_date(text)),
+        (f"extract_chat_by_date ({args.target_date})",
+         lambda: legacy_extract_chat_by_date(text, args.target_date), lambda: main.extract_chat_by_date(text, args.target_date)),
+        ("extract_today_chat",
+         lambda: legacy_extract_today_chat(text), lambda: main.extract_today_chat(text)),
+    ]
+    for label, legacy, engine in cases:
+        legacy_time, legacy_result = best_of(args.repeat, legacy)
+        engine_time, engine_result = best_of(args.repeat, engine)
+        assert legacy_result == engine_result, f"{label}: 결과가 다릅니다"
+        print(f"{label:<36}{args.lines / legacy_time:>14,.0f}{args.lines / engine_time:>14,.0f}{legacy_time / engine_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--target-date", default="15일")
+    main_cli(parser.parse_args())
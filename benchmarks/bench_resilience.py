@@ -0,0 +1,154 @@
+# OpenAI 호출 안정성(resilience.py) 벤치마크: 장애를 흉내 내는 가짜 OpenAI 서버를 상대로 main.call_llm 비교
+# - tail: 일부 요청만 아주 느릴 때 p95/p99 지연시간 (hedging 효과)
+# - flaky: 429 / 500 이 섞여 있을 때 성공률 (지터 백오프 재시도 효과)
+# - hang: 응답 없이 멈추는 요청이 있을 때 (단계 제한 시간 + 재시도 효과)
+# - outage: 전체 장애 동안 실제로 OpenAI 에 보낸 요청 수와 실패까지 걸린 시간, 복구 후 회로 차단기가 다시 닫히는지 (회로 차단기 효과)
+#
+# 사용법 (저장소 루트에서 실행, OPENAI_API_KEY 는 아무 값이나 가능):
+#   python benchmarks/bench_resilience.py
+#   python benchmarks/bench_resilience.py --scenarios tail flaky --calls 400 --concurrency 16
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+os.environ.setdefault("LLM_CACHE_DB", "off")
+os.environ.setdefault("DIARY_DATA_DIR", tempfile.mkdtemp(prefix="bench_resilience_"))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from openai import AsyncOpenAI  # noqa: E402
+
+import main  # noqa: E402
+from llm_cache import bypass_cache  # noqa: E402
+from mock_openai_server import MockConfig, create_mock_app  # noqa: E402
+from resilience import ResilientCaller  # noqa: E402
+
+SCENARIOS = {
+    "tail": {"latency": 0.2, "slow_rate": 0.05, "slow_latency": 3.0},
+    "flaky": {"latency": 0.2, "error_rate_429": 0.05, "error_rate_500": 0.2},
+    "hang": {"latency": 0.2, "hang_rate": 0.03},
+    "outage": {"latency": 0.2, "error_rate_500": 1.0},
+}
+NO_FAULTS = {"error_rate_429": 0.0, "error_rate_500": 0.0, "slow_rate": 0.0, "hang_rate": 0.0}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def make_caller(enabled: bool) -> ResilientCaller:
+    # 벤치마크용: 단계 제한 시간 2초, 회로 차단기 2초 후 재시도
+    return ResilientCaller(enabled=enabled, stage_timeout=2.0, max_retries=2, backoff_base=0.1, backoff_max=1.0,
+                           hedge_min_samples=20, failure_threshold=5, reset_timeout=2.0)
+
+
+async def one_call(i: int) -> tuple[bool, float]:
+    started = time.perf_counter()
+    try:
+        with bypass_cache():
+            await main.call_llm("summary", model="gpt-4o-mini", temperature=0.1,
+                                messages=[{"role": "user", "content": f"다음 대화를 요약해주세요 #{i}"}])
+        return True, time.perf_counter() - started
+    except Exception:
+        return False, time.perf_counter() - started
+
+
+async def run_calls(count: int, concurrency: int) -> list[tuple[bool, float]]:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def limited(i: int):
+        async with limit:
+            return await one_call(i)
+
+    return await asyncio.gather(*(limited(i) for i in range(count)))
+
+
+async def run_scenario(name: str, config: MockConfig, mock: httpx.AsyncClient, enabled: bool, args) -> dict:
+    main.llm_resilience = make_caller(enabled)
+    await mock.post("/faults", json={**NO_FAULTS, "latency": SCENARIOS[name]["latency"]})
+    await run_calls(30, args.concurrency)  # hedging 용 지연시간 표본 수집 (장애 없음)
+    await mock.post("/faults", json=SCENARIOS[name])
+    await mock.post("/stats/reset")
+
+    started = time.perf_counter()
+    results = await run_calls(args.calls, args.concurrency)
+    elapsed = time.perf_counter() - started
+    upstream = (await mock.get("/stats")).json()["requests"]
+
+    row = {
+        "ok": sum(ok for ok, _ in results) / len(results),
+        "p50": percentile([t for _, t in results], 50),
+        "p95": percentile([t for _, t in results], 95),
+        "p99": percentile([t for _, t in results], 99),
+        "elapsed": elapsed,
+        "upstream": upstream,
+        "stats": main.llm_resilience.stats(),
+    }
+    if name == "outage" and enabled:
+        # 장애 복구 후 reset_timeout 이 지나면 시험 호출 성공으로 회로가 다시 닫히는지 확인
+        await mock.post("/faults", json=NO_FAULTS)
+        await asyncio.sleep(main.llm_resilience.reset_timeout + 0.1)
+        recovered, _ = await one_call(-1)
+        row["recovered"] = recovered and main.llm_resilience.breaker("gpt-4o-mini").state == "closed"
+    return row
+
+
+async def run(args):
+    port = free_port()
+    config = MockConfig(latency=0.2, dist="fixed", token_latency=0.0, seed=7)
+    server = uvicorn.Server(uvicorn.Config(create_mock_app(config), host="127.0.0.1", port=port, log_level="critical",
+                                           timeout_graceful_shutdown=1))  # 멈춘(hang) 요청은 기다리지 않고 종료
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{port}"
+    # resilience off 일 때 멈춘 요청이 끝없이 기다리지 않도록 클라이언트 자체 제한 시간은 10초
+    main.async_client = AsyncOpenAI(api_key="mock", base_url=f"{base_url}/v1", max_retries=0, timeout=10)
+    print(f"호출 {args.calls}회 / 동시 {args.concurrency}개 / 단계 제한 시간 2초 / 최대 재시도 2회")
+    print(f"{'시나리오':<8} | {'resilience':<10} | {'성공률':>6} | {'p50(s)':>7} | {'p95(s)':>7} | {'p99(s)':>7} | "
+          f"{'총 시간':>7} | {'API 요청':>8} | 재시도 / hedge(승) / 시간초과 / 차단")
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as mock:
+            for name in args.scenarios:
+                for enabled in (False, True):
+                    row = await run_scenario(name, config, mock, enabled, args)
+                    s = row["stats"]
+                    detail = (f"{s['retries']} / {s['hedges']}({s['hedge_wins']}) / {s['timeouts']} / {s['circuit_open']}"
+                              if enabled else "-")
+                    if "recovered" in row:
+                        detail += f" / 복구 {'성공' if row['recovered'] else '실패'}"
+                    print(f"{name:<8} | {'on' if enabled else 'off':<10} | {row['ok']:>6.1%} | {row['p50']:>7.3f} | "
+                          f"{row['p95']:>7.3f} | {row['p99']:>7.3f} | {row['elapsed']:>7.2f} | {row['upstream']:>8} | {detail}")
+    finally:
+        server.should_exit = True
+        await server_task
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="*", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,118 @@
+# 일·주·월 집계(rollup) 확인 / 기간 조회 속도 벤치마크
+# - 사용자 ID 없이 같은 날짜의 다른 대화를 두 번 올리면 이벤트 / 일기 집계가 둘 다 더해지는지 (같은 파일을 다시 올리면 그대로인지)
+# - 감정 결과가 없는 일기가 감정 평균을 낮추지 않는지
+# - 결과가 하나씩 반영된 집계와 저장된 일기로 다시 계산한 집계(/rollups/rebuild)가 같은지
+# - 기록이 많을 때 일 / 주 / 월 구간 조회 시간
+#
+# 사용법 (저장소 루트에서 실행, API 키 없이 가짜 클라이언트 사용):
+#   python benchmarks/bench_rollups.py --records 3000
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+os.environ["DIARY_DATA_DIR"] = tempfile.mkdtemp(prefix="bench-rollups-")
+os.environ["LLM_CACHE_DB"] = "off"
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from offline_client import OfflineAsyncOpenAI  # noqa: E402
+from rollups import ALL_ROOMS, PERIODS, diary_fact  # noqa: E402
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_chat.txt")
+DATE = "2025-01-18"
+
+
+def day_bucket(buckets: list[dict], date: str) -> dict:
+    return next((bucket for bucket in buckets if bucket["bucket"] == date), {"diaries": 0, "event_days": 0})
+
+
+async def check_anonymous_uploads(client: httpx.AsyncClient) -> None:
+    with open(SAMPLE, encoding="utf-8") as f:
+        first = f.read()
+    # 같은 날짜의 메시지 하나가 다른 대화
+    second = first.replace("18/01/25 9:07, 지영 : 저녁 뭐 먹을래?", "18/01/25 9:07, 지영 : 점심 뭐 먹을래?")
+    assert first != second
+
+    async def upload(text: str) -> None:
+        response = await client.post("/event-timeline", files={"file": ("chat.txt", text.encode("utf-8"))},
+                                     params={"start_date": DATE, "end_date": DATE})
+        assert response.status_code == 200, response.text
+
+    async def event_days() -> int:
+        buckets = (await client.get("/rollups", params={"period": "day"})).json()["buckets"]
+        return day_bucket(buckets, DATE)["event_days"]
+
+    await upload(first)
+    await upload(second)
+    assert await event_days() == 2, "사용자 ID 없는 두 업로드의 이벤트 집계가 더해지지 않았습니다"
+    await upload(first)
+    assert await event_days() == 2, "같은 파일을 다시 올렸는데 이벤트 집계가 늘었습니다"
+
+    today = main.diary_date(None)
+    for text in ("오늘 발표 잘 끝났어", "버스 놓쳐서 지각했어"):
+        response = await client.post("/generate-diary", json={"kakao_text": text})
+        assert response.status_code == 200, response.text
+    buckets = (await client.get("/rollups", params={"period": "day"})).json()["buckets"]
+    assert day_bucket(buckets, today)["diaries"] == 2, "사용자 ID 없는 두 일기의 집계가 더해지지 않았습니다"
+    print("사용자 ID 없는 업로드 / 일기 집계: OK")
+
+
+async def check_rebuild(client: httpx.AsyncClient) -> None:
+    before = {period: (await client.get("/rollups", params={"period": period})).json() for period in PERIODS}
+    response = await client.post("/rollups/rebuild")
+    assert response.status_code == 200, response.text
+    after = {period: (await client.get("/rollups", params={"period": period})).json() for period in PERIODS}
+    assert before == after, "증분 집계와 다시 계산한 집계가 다릅니다"
+    print("증분 집계 == 다시 계산한 집계: OK")
+
+
+def check_emotion_mean() -> None:
+    store = main.rollup_store.resolve()
+    store.record("diary", "mean", "room", DATE, diary_fact({"emotions": {"좋음": 80, "평범함": 20, "나쁨": 0}}), "1")
+    store.record("diary", "mean", "room", DATE, diary_fact({"emotions": "분석 실패"}), "2")
+    bucket = store.get_range("mean", ALL_ROOMS, "day", DATE, DATE)[0]
+    assert bucket["diaries"] == 2, bucket
+    assert bucket["emotions"] == {"좋음": 80.0, "평범함": 20.0, "나쁨": 0.0}, "감정 결과가 없는 일기가 평균에 들어갔습니다"
+    print("감정 결과가 없는 일기는 감정 평균에서 제외: OK")
+
+
+def bench_ranges(records: int) -> None:
+    store = main.rollup_store.resolve()
+    labels = ["발표", "여행", "회의", "치킨", "시험", "운동"]
+    start = time.perf_counter()
+    for i in range(records):
+        date = (datetime.date(2020, 1, 1) + datetime.timedelta(days=i)).isoformat()
+        good = random.randint(0, 100)
+        diary = {"emotions": {"좋음": good, "평범함": 100 - good, "나쁨": 0}, "keywords": random.sample(labels, 3)}
+        store.record("diary", "bench", "room", date, diary_fact(diary))
+    print(f"기록 {records}개 반영: {time.perf_counter() - start:.2f} s")
+    print(f"{'구간':<8}{'구간 수':>8}{'조회 시간':>12}")
+    for period in PERIODS:
+        start = time.perf_counter()
+        buckets = store.get_range("bench", ALL_ROOMS, period, "2021-01-01", "2021-12-31")
+        print(f"{period:<8}{len(buckets):>8}{(time.perf_counter() - start) * 1000:>10.2f}ms")
+
+
+async def main_async(args):
+    main.async_client = OfflineAsyncOpenAI(latency=0.0)
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await check_anonymous_uploads(client)
+            await check_rebuild(client)
+    check_emotion_mean()
+    bench_ranges(args.records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="일·주·월 집계 확인 / 기간 조회 속도 벤치마크")
+    parser.add_argument("--records", type=int, default=3000, help="조회 속도 측정용으로 반영할 일기 기록 수")
+    asyncio.run(main_async(parser.parse_args()))
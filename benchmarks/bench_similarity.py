@@ -0,0 +1,84 @@
+# 일관성 분석 유사도 계산 벤치마크: 기존 단어 집합 이중 루프 vs similarity 모듈 (글자 n-gram, 일괄 계산, MinHash)
+#
+# 사용법 (저장소 루트에서 실행):
+#   python benchmarks/bench_similarity.py                    # 샘플 수 10 / 50 / 200 / 500 / 2000, 섹션 6개
+#   python benchmarks/bench_similarity.py --samples 1000 --repeat 3
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import similarity  # noqa: E402
+from offline_client import CANNED_DIARY, CANNED_SUMMARY  # noqa: E402
+
+SECTIONS = 6
+
+
+# ---- 비교 기준: main.py 에 있던 기존 구현 그대로 ----
+def legacy_calculate_text_similarity(texts: list) -> float:
+    if len(texts) < 2:
+        return 1.0
+    similarities = []
+    for i in range(len(texts)):
+        for j in range(i + 1, len(texts)):
+            words1 = set(texts[i].lower().split())
+            words2 = set(texts[j].lower().split())
+            if len(words1) == 0 or len(words2) == 0:
+                similarity_score = 0.0
+            else:
+                similarity_score = len(words1 & words2) / len(words1 | words2)
+            similarities.append(similarity_score)
+    return sum(similarities) / len(similarities) if similarities else 0.0
+
+
+def make_samples(base: str, count: int, rng: random.Random) -> list[str]:
+    # 같은 내용을 조사/어순만 조금씩 바꾼 샘플 (실제 일관성 테스트 응답과 비슷하게)
+    words = base.split()
+    particles = ["", "은", "는", "이", "가", "을", "를", "도"]
+    samples = []
+    for _ in range(count):
+        picked = [w + rng.choice(particles) if rng.random() < 0.3 else w for w in words]
+        if rng.random() < 0.5:
+            rng.shuffle(picked)
+        samples.append(" ".join(picked))
+    return samples
+
+
+def timed(func, repeat: int) -> tuple[float, float]:
+    best, value = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, nargs="*", default=[10, 50, 200, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    bases = [CANNED_SUMMARY, *CANNED_DIARY.values()][:SECTIONS]
+    print(f"NumPy: {'사용' if similarity.np is not None else '없음 (순수 파이썬)'}")
+    print(f"{'샘플 수':>6} | {'기존(s)':>9} | {'새 엔진(s)':>10} | {'배속':>6} | {'정확값 대비 오차':>14} | 방식")
+
+    for count in args.samples:
+        sections = [make_samples(base, count, rng) for base in bases]
+
+        legacy_time, _ = timed(lambda: [legacy_calculate_text_similarity(t) for t in sections], args.repeat)
+        new_time, scores = timed(lambda: [similarity.mean_pairwise_similarity(t) for t in sections], args.repeat)
+        # MinHash 를 쓴 경우 정확한 Jaccard 평균과의 차이 확인
+        exact = [similarity.mean_pairwise_similarity(t, minhash_min_texts=10 ** 9) for t in sections]
+        error = max(abs(a - b) for a, b in zip(scores, exact))
+        method = "MinHash" if similarity.np is not None and count >= similarity.MINHASH_MIN_TEXTS else "정확"
+        print(f"{count:>6} | {legacy_time:>9.4f} | {new_time:>10.4f} | {legacy_time / new_time:>5.1f}x | "
+              f"{error:>14.4f} | {method}")
+
+
+if __name__ == "__main__":
+    main()
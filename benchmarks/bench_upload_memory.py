@@ -0,0 +1,62 @@
+# 업로드 파일 파싱 메모리 벤치마크: 전체 읽기(read + decode + splitlines) vs 청크 단위 스트리밍 파싱
+#
+# 사용법 (저장소 루트에서 실행):
+#   python benchmarks/bench_upload_memory.py --lines 2000000
+#   (--lines 2000000 이면 약 110MB 크기의 가짜 내보내기 파일을 만들어서 측정)
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+import main  # noqa: E402
+from kakao_parser import iter_file_lines  # noqa: E402
+from synthetic_export import write_export  # noqa: E402
+
+
+def measure(label: str, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<40}{peak / 2**20:>10.1f} MB{elapsed:>10.2f} s")
+    return result
+
+
+def main_cli(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_export(os.path.join(tmp, "export.txt"), args.lines)
+        size_mb = os.path.getsize(path) / 2**20
+        print(f"가짜 내보내기 파일: {args.lines}줄, {size_mb:.1f} MB")
+        print(f"{'방식':<40}{'최대 메모리':>13}{'시간':>12}")
+
+        def read_all():
+            with open(path, "rb") as f:
+                return f.read().decode("utf-8", errors="ignore")
+
+        target = args.target_date
+        legacy = measure("전체 읽기 - extract_chat_by_date", lambda: main.extract_chat_by_date(read_all(), target))
+        streamed = measure("스트리밍 - extract_chat_by_date", lambda: _stream(path, lambda lines: main.extract_chat_by_date(lines, target)))
+        assert legacy == streamed, "두 방식의 결과가 다릅니다"
+
+        legacy = measure("전체 읽기 - extract_today_chat", lambda: main.extract_today_chat(read_all()))
+        streamed = measure("스트리밍 - extract_today_chat", lambda: _stream(path, main.extract_today_chat))
+        assert legacy == streamed, "두 방식의 결과가 다릅니다"
+
+
+def _stream(path, parse):
+    with open(path, "rb") as f:
+        return parse(iter_file_lines(f))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=2_000_000)
+    parser.add_argument("--target-date", default="15일")
+    main_cli(parser.parse_args())
@@ -0,0 +1,271 @@
+# FastAPI 서버 부하 테스트 (가짜 OpenAI 서버 사용)
+# - 가짜 OpenAI 서버(mock_openai_server.py)와 main:app 서버를 각각 별도 프로세스로 띄우고
+#   지정한 동시 접속 수로 엔드포인트를 호출해서 처리량, p50/p95/p99 지연시간, 서버 메모리(RSS)를 측정
+# - 기본적으로 OpenAI 응답 캐시를 끄고 실행 (같은 요청이 반복되어도 매번 가짜 API 를 호출하도록)
+#
+# 사용법 (저장소 루트에서 실행):
+#   python benchmarks/load_test.py --scenario generate-diary --concurrency 16 --requests 200
+#   python benchmarks/load_test.py --scenario auto-diary --concurrency 8 --duration 30 --mock-latency 0.8
+#   python benchmarks/load_test.py --scenario mixed --workers 2 --json result.json
+#   python benchmarks/load_test.py --app-url http://127.0.0.1:8000 --scenario generate-diary   # 이미 떠 있는 서버 측정
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+SAMPLE_CHAT = os.path.join(BENCH_DIR, "sample_chat.txt")
+
+# 캐시를 끌 때 LLM_CACHE_DISABLED_STAGES 에 넣는 단계 이름
+ALL_STAGES = "summary,summary_chunk,conflict,diary,emotion,keyword,fused,event"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def read_rss_kb(pid: int) -> int:
+    """프로세스와 그 자식 프로세스들(uvicorn 워커)의 RSS 합계(KB). /proc 이 없으면 0"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total
+
+
+def build_request(scenario: str, counter: int, sample: bytes, args) -> dict:
+    # 요청마다 검색 기록을 다르게 해서 같은 요청으로 합쳐지지 않게 함
+    search_log = f"부하테스트 {counter}"
+    if scenario == "generate-diary":
+        return {
+            "method": "POST", "url": "/generate-diary",
+            "json": {"kakao_text": sample.decode("utf-8"), "search_log": search_log, "mode": args.mode},
+        }
+    if scenario == "auto-diary":
+        return {
+            "method": "POST", "url": "/auto-diary",
+            "params": {"search_log": search_log, "mode": args.mode, "use_date_analysis": "true"},
+            "files": {"file": ("chat.txt", sample, "text/plain")},
+        }
+    if scenario == "consistency-test":
+        return {
+            "method": "POST", "url": "/consistency-test",
+            "params": {"test_count": args.test_count, "strategy": args.strategy},
+            "files": {"file": ("chat.txt", sample, "text/plain")},
+        }
+    raise ValueError(f"알 수 없는 시나리오: {scenario}")
+
+
+async def drive(args, base_url: str, app_pid: int | None) -> dict:
+    sample = open(args.chat_file, "rb").read()
+    scenarios = ["generate-diary", "auto-diary", "consistency-test"] if args.scenario == "mixed" else [args.scenario]
+    latencies: dict[str, list[float]] = {s: [] for s in scenarios}
+    statuses: dict[str, int] = {}
+    counter = itertools.count()
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    rss_samples: list[int] = []
+
+    async def sample_memory():
+        while True:
+            if app_pid is not None:
+                rss_samples.append(read_rss_kb(app_pid))
+            await asyncio.sleep(0.5)
+
+    async def worker(client: httpx.AsyncClient):
+        while True:
+            i = next(counter)
+            if deadline is None and i >= args.requests:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            scenario = scenarios[i % len(scenarios)]
+            request = build_request(scenario, i, sample, args)
+            start = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                key = str(response.status_code)
+            except httpx.HTTPError as e:
+                key = type(e).__name__
+            elapsed = time.perf_counter() - start
+            statuses[key] = statuses.get(key, 0) + 1
+            if key == "200":
+                latencies[scenario].append(elapsed)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        if app_pid is not None:
+            rss_samples.append(read_rss_kb(app_pid))
+        memory_task = asyncio.create_task(sample_memory())
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        wall = time.perf_counter() - started
+        memory_task.cancel()
+        if app_pid is not None:
+            rss_samples.append(read_rss_kb(app_pid))
+        server_load = (await client.get("/")).json().get("load")
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    total = sum(statuses.values())
+    return {
+        "scenario": args.scenario,
+        "concurrency": args.concurrency,
+        "requests": total,
+        "succeeded": len(all_latencies),
+        "statuses": statuses,
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(all_latencies) / wall, 2) if wall else 0.0,
+        "latency_s": {
+            name: {
+                "count": len(values),
+                "mean": round(statistics.mean(values), 3) if values else None,
+                "p50": round(percentile(values, 50), 3),
+                "p95": round(percentile(values, 95), 3),
+                "p99": round(percentile(values, 99), 3),
+                "max": round(max(values), 3) if values else None,
+            }
+            for name, values in {**latencies, "all": all_latencies}.items()
+        },
+        "server_rss_mb": {
+            "start": round(rss_samples[0] / 1024, 1) if rss_samples else None,
+            "peak": round(max(rss_samples) / 1024, 1) if rss_samples else None,
+            "end": round(rss_samples[-1] / 1024, 1) if rss_samples else None,
+        },
+        "server_load": server_load,
+    }
+
+
+def wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"서버가 {timeout}초 안에 준비되지 않았습니다: {url}")
+
+
+def start_servers(args, data_dir: str) -> tuple[list[subprocess.Popen], str, int]:
+    mock_cmd = [
+        sys.executable, os.path.join(BENCH_DIR, "mock_openai_server.py"),
+        "--port", str(args.mock_port), "--latency", str(args.mock_latency), "--dist", args.mock_dist,
+        "--spread", str(args.mock_spread), "--token-latency", str(args.mock_token_latency),
+        "--error-rate-429", str(args.error_rate_429), "--error-rate-500", str(args.error_rate_500),
+    ]
+    mock = subprocess.Popen(mock_cmd, cwd=BENCH_DIR)
+    wait_ready(f"http://127.0.0.1:{args.mock_port}/stats")
+
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        "OPENAI_API_KEY": "mock",
+        "DIARY_DATA_DIR": data_dir,
+        "LLM_CACHE_DB": "off",
+    })
+    if not args.cache:
+        env["LLM_CACHE_DISABLED_STAGES"] = ALL_STAGES
+    app_cmd = [
+        sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.app_port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ]
+    # 서버 로그는 --verbose 일 때만 출력
+    output = None if args.verbose else subprocess.DEVNULL
+    app = subprocess.Popen(app_cmd, cwd=REPO_DIR, env=env, stdout=output, stderr=output)
+    base_url = f"http://127.0.0.1:{args.app_port}"
+    wait_ready(base_url + "/")
+    return [app, mock], base_url, app.pid
+
+
+def print_report(result: dict, mock_stats: dict | None) -> None:
+    print(f"\n=== {result['scenario']} (동시 {result['concurrency']}) ===")
+    print(f"요청 {result['requests']}개 / 성공 {result['succeeded']}개 / 상태 {result['statuses']}")
+    print(f"소요 {result['wall_s']}s / 처리량 {result['throughput_rps']} req/s")
+    print(f"{'엔드포인트':<18} {'count':>6} {'mean':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}")
+    for name, lat in result["latency_s"].items():
+        if lat["count"]:
+            print(f"{name:<18} {lat['count']:>6} {lat['mean']:>7} {lat['p50']:>7} {lat['p95']:>7} {lat['p99']:>7} {lat['max']:>7}")
+    rss = result["server_rss_mb"]
+    print(f"서버 메모리(RSS, MB): 시작 {rss['start']} / 최대 {rss['peak']} / 종료 {rss['end']}")
+    if mock_stats:
+        print(f"가짜 OpenAI 호출 {mock_stats['requests']}회 (429: {mock_stats['errors_429']}, 500: {mock_stats['errors_500']}, "
+              f"최대 동시 {mock_stats['max_in_flight']})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=["generate-diary", "auto-diary", "consistency-test", "mixed"],
+                        default="generate-diary")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="총 요청 수 (--duration 이 있으면 무시)")
+    parser.add_argument("--duration", type=float, default=None, help="측정 시간(초)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--mode", choices=["pipeline", "fused"], default="pipeline")
+    parser.add_argument("--test-count", type=int, default=3)
+    parser.add_argument("--strategy", choices=["concurrent", "multi_sample"], default="concurrent")
+    parser.add_argument("--chat-file", default=SAMPLE_CHAT)
+    parser.add_argument("--app-url", default=None, help="이미 실행 중인 서버 주소 (지정하면 서버를 띄우지 않음)")
+    parser.add_argument("--app-port", type=int, default=8801)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn 워커 프로세스 수")
+    parser.add_argument("--cache", action="store_true", help="OpenAI 응답 캐시를 켠 상태로 측정")
+    parser.add_argument("--mock-port", type=int, default=8900)
+    parser.add_argument("--mock-latency", type=float, default=0.5)
+    parser.add_argument("--mock-dist", choices=["fixed", "uniform", "normal", "lognormal"], default="lognormal")
+    parser.add_argument("--mock-spread", type=float, default=0.3)
+    parser.add_argument("--mock-token-latency", type=float, default=0.002)
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-500", type=float, default=0.0)
+    parser.add_argument("--json", default=None, help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument("--verbose", action="store_true", help="서버 로그 출력")
+    args = parser.parse_args()
+
+    processes = []
+    mock_stats = None
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            if args.app_url:
+                base_url, app_pid = args.app_url, None
+            else:
+                processes, base_url, app_pid = start_servers(args, data_dir)
+            result = asyncio.run(drive(args, base_url, app_pid))
+            if not args.app_url:
+                mock_stats = httpx.get(f"http://127.0.0.1:{args.mock_port}/stats").json()
+                result["mock_stats"] = mock_stats
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    print_report(result, mock_stats)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# 부하 테스트용 가짜 OpenAI 호환 서버 (POST /v1/chat/completions)
+# - main.py 의 프롬프트 종류마다 offline_client 와 같은 그럴듯한 JSON 응답을 돌려줌
+# - 지연시간 분포(고정 / 균등 / 정규 / 로그정규)와 출력 토큰당 생성 시간을 흉내 냄
+# - 설정한 비율로 429(요청 한도 초과) / 500(서버 오류) 응답을 섞어서 재시도/오류 처리를 확인할 수 있음
+# - 일부 요청만 아주 느리게(slow) 또는 응답 없이 멈추게(hang) 해서 시간 제한 / hedging 을 확인할 수 있음
+# - POST /faults 로 실행 중에 장애 비율을 바꿀 수 있음 (예: {"error_rate_500": 1.0} 로 전체 장애 흉내)
+# - stream=True (SSE) 와 n 개 응답도 지원
+# - 새 연결의 첫 요청은 connect_latency 만큼 늦게 처리해서 TCP + TLS 연결 준비 시간을 흉내 냄 (연결 재사용 효과 확인용)
+# - GET /v1/models 도 지원 (연결 미리 열어두기 확인용)
+#
+# 사용법 (저장소 루트에서 실행):
+#   python benchmarks/mock_openai_server.py --port 8900 --latency 0.8 --dist lognormal --error-rate-429 0.02
+#   OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=mock uvicorn main:app   # 서버를 가짜 API 에 연결
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+from offline_client import canned_response, estimate_tokens
+
+
+@dataclass
+class MockConfig:
+    """
+    가짜 서버 동작 설정
+
+    Args:
+        latency: 응답 하나의 기본 지연시간 평균(초)
+        dist: 기본 지연시간 분포 (fixed / uniform / normal / lognormal)
+        spread: 분포의 퍼짐 정도 (uniform: ±latency×spread, normal/lognormal: 표준편차 비율)
+        token_latency: 출력 토큰 하나를 생성하는 시간(초)
+        error_rate_429: 429 응답 비율 (0.0 ~ 1.0)
+        error_rate_500: 500 응답 비율 (0.0 ~ 1.0)
+        slow_rate: 기본 지연시간 대신 slow_latency 만큼 걸리는 요청 비율 (긴 꼬리 지연시간)
+        slow_latency: 느린 요청의 지연시간(초)
+        hang_rate: 클라이언트가 끊을 때까지 응답하지 않는 요청 비율
+        connect_latency: 새 연결의 첫 요청에 더하는 시간(초, TCP + TLS 연결 준비 시간 흉내)
+        seed: 난수 시드
+    """
+    latency: float = 0.5
+    dist: str = "lognormal"
+    spread: float = 0.3
+    token_latency: float = 0.002
+    error_rate_429: float = 0.0
+    error_rate_500: float = 0.0
+    slow_rate: float = 0.0
+    slow_latency: float = 10.0
+    hang_rate: float = 0.0
+    connect_latency: float = 0.0
+    seed: int | None = None
+    stats: dict = field(default_factory=lambda: {
+        "requests": 0, "streams": 0, "errors_429": 0, "errors_500": 0, "slow": 0, "hangs": 0,
+        "prompt_tokens": 0, "completion_tokens": 0, "in_flight": 0, "max_in_flight": 0, "connections": 0,
+    })
+
+    def __post_init__(self):
+        self.rng = random.Random(self.seed)
+
+    def sample_latency(self) -> float:
+        roll = self.rng.random()
+        if roll < self.hang_rate:
+            self.stats["hangs"] += 1
+            return 3600.0
+        if roll < self.hang_rate + self.slow_rate:
+            self.stats["slow"] += 1
+            return self.slow_latency
+        if self.dist == "fixed":
+            return self.latency
+        if self.dist == "uniform":
+            return max(0.0, self.rng.uniform(self.latency * (1 - self.spread), self.latency * (1 + self.spread)))
+        if self.dist == "normal":
+            return max(0.0, self.rng.gauss(self.latency, self.latency * self.spread))
+        # lognormal: 평균이 latency 가 되도록 mu 를 맞춤 (긴 꼬리 지연시간)
+        sigma = self.spread
+        mu = math.log(max(self.latency, 1e-6)) - sigma * sigma / 2
+        return self.rng.lognormvariate(mu, sigma)
+
+
+def _error_response(status: int, message: str, error_type: str) -> JSONResponse:
+    headers = {"Retry-After": "1"} if status == 429 else None
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": error_type, "param": None, "code": None}},
+        headers=headers,
+    )
+
+
+def create_mock_app(config: MockConfig) -> FastAPI:
+    app = FastAPI()
+    stats = config.stats
+    seen_connections: set = set()
+
+    async def connection_setup(request: Request) -> None:
+        # 연결마다 (클라이언트 주소, 포트)가 다르므로 처음 보는 연결이면 연결 준비 시간만큼 대기
+        client = request.scope.get("client")
+        if client in seen_connections:
+            return
+        seen_connections.add(client)
+        stats["connections"] += 1
+        if config.connect_latency > 0:
+            await asyncio.sleep(config.connect_latency)
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        for key in stats:
+            stats[key] = 0
+        return stats
+
+    # 실행 중에 장애 설정 변경 (지정한 값만 바뀜)
+    @app.post("/faults")
+    async def set_faults(request: Request):
+        changes = await request.json()
+        keys = ("latency", "error_rate_429", "error_rate_500", "slow_rate", "slow_latency", "hang_rate", "connect_latency")
+        for key in keys:
+            if key in changes:
+                setattr(config, key, float(changes[key]))
+        return {key: getattr(config, key) for key in keys}
+
+    @app.get("/v1/models")
+    async def list_models(request: Request):
+        await connection_setup(request)
+        return {"object": "list", "data": [{"id": model, "object": "model", "owned_by": "mock"}
+                                           for model in ("gpt-4o", "gpt-4o-mini")]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        await connection_setup(request)
+        try:
+            params = await request.json()
+        except ClientDisconnect:  # hedging 으로 취소된 요청 (본문을 다 받기 전에 연결이 끊김)
+            return Response(status_code=499)
+        stats["requests"] += 1
+
+        roll = config.rng.random()
+        if roll < config.error_rate_429:
+            stats["errors_429"] += 1
+            return _error_response(429, "Rate limit reached (mock)", "rate_limit_error")
+        if roll < config.error_rate_429 + config.error_rate_500:
+            stats["errors_500"] += 1
+            return _error_response(500, "The server had an error (mock)", "server_error")
+
+        prompt = "\n".join(str(m.get("content", "")) for m in params.get("messages", []))
+        content = canned_response(prompt)
+        n = params.get("n") or 1
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content) * n
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+
+        first_token_delay = config.sample_latency()
+        generation_time = config.token_latency * estimate_tokens(content)
+        response_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = params.get("model", "gpt-4o")
+
+        if params.get("stream"):
+            stats["streams"] += 1
+
+            async def event_stream():
+                stats["in_flight"] += 1
+                stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+                try:
+                    await asyncio.sleep(first_token_delay)
+                    step = 8
+                    pieces = [content[i:i + step] for i in range(0, len(content), step)] or [""]
+                    for piece in pieces:
+                        chunk = {
+                            "id": response_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                        }
+                        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                        await asyncio.sleep(generation_time / len(pieces))
+                    final = {
+                        "id": response_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                    }
+                    yield f"data: {json.dumps(final)}\n\n"
+                    if (params.get("stream_options") or {}).get("include_usage"):
+                        usage_chunk = {
+                            "id": response_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                            "choices": [],
+                            "usage": {
+                                "prompt_tokens": prompt_tokens,
+                                "completion_tokens": completion_tokens,
+                                "total_tokens": prompt_tokens + completion_tokens,
+                            },
+                        }
+                        yield f"data: {json.dumps(usage_chunk)}\n\n"
+                    yield "data: [DONE]\n\n"
+                finally:
+                    stats["in_flight"] -= 1
+
+            return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(first_token_delay + generation_time)
+        finally:
+            stats["in_flight"] -= 1
+        return JSONResponse(content={
+            "id": response_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {"index": i, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                for i in range(n)
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5, help="기본 지연시간 평균(초)")
+    parser.add_argument("--dist", choices=["fixed", "uniform", "normal", "lognormal"], default="lognormal")
+    parser.add_argument("--spread", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.002, help="출력 토큰당 생성 시간(초)")
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-500", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="slow-latency 만큼 느린 요청 비율")
+    parser.add_argument("--slow-latency", type=float, default=10.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="응답하지 않는 요청 비율")
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="새 연결의 첫 요청에 더하는 시간(초)")
+    parser.add_argument("--keep-alive", type=int, default=60, help="쉬고 있는 연결을 서버가 닫기까지의 시간(초)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency, dist=args.dist, spread=args.spread, token_latency=args.token_latency,
+        error_rate_429=args.error_rate_429, error_rate_500=args.error_rate_500,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency, hang_rate=args.hang_rate,
+        connect_latency=args.connect_latency, seed=args.seed,
+    )
+    uvicorn.run(create_mock_app(config), host=args.host, port=args.port, log_level="warning",
+                timeout_keep_alive=args.keep_alive)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# 벤치마크용 오프라인 OpenAI 클라이언트
+# - 실제 API 키 없이도 main.py 의 프롬프트마다 그럴듯한 JSON 응답을 돌려줌
+# - 호출마다 지연시간을 흉내 내고, 입력/출력 토큰 수(추정치)를 usage 에 담아 반환
+import asyncio
+import json
+import random
+import types
+
+CANNED_DIARY = {
+    "상황설명": "친구들과 팀 프로젝트 회의를 진행했고, 저녁에는 함께 치킨을 먹었습니다.",
+    "감정표현": "회의가 길어져 지쳤지만 저녁 시간에는 즐거운 감정이 드러납니다.",
+    "공감과인정": "긴 회의를 끝까지 해내셨군요. 지친 하루였을 것 같아요.",
+    "따뜻한위로": "고생 많으셨어요. 맛있는 저녁으로 기운을 되찾으셨다니 다행이에요.",
+    "실용적제안": "다음 회의 전에는 안건을 미리 공유해서 시간을 줄여보는 건 어떨까요?",
+}
+CANNED_SUMMARY = "팀 프로젝트 회의가 길게 진행되었고, 저녁에 친구들과 치킨을 먹기로 약속했다."
+CANNED_EMOTIONS = {"좋음": 45, "평범함": 35, "나쁨": 20}
+CANNED_KEYWORDS = ["팀프로젝트", "회의", "치킨", "저녁", "발표"]
+CANNED_CONFLICT = {"has_conflict": False, "conflict_type": "none", "confidence": 0.1, "suggestion": "충돌 없음"}
+
+
+def estimate_tokens(text: str) -> int:
+    # 한글은 대략 글자당 1토큰, 영문/숫자/공백은 4글자당 1토큰 정도로 추정
+    hangul = sum(1 for ch in text if "가" <= ch <= "힣")
+    return hangul + (len(text) - hangul) // 4 + 1
+
+
+def canned_response(prompt: str) -> str:
+    """
+    main.py 의 각 프롬프트 종류에 맞는 JSON 응답 문자열을 반환합니다.
+    """
+    if "한 번에 작성하는 전문가" in prompt:
+        fused = {"summary": CANNED_SUMMARY, **CANNED_DIARY, "emotions": CANNED_EMOTIONS, "keywords": CANNED_KEYWORDS}
+        if "conflict_info" in prompt:
+            fused["conflict_info"] = CANNED_CONFLICT
+        return json.dumps(fused, ensure_ascii=False)
+    if "충돌 여부" in prompt:
+        return json.dumps(CANNED_CONFLICT, ensure_ascii=False)
+    if "감성 일기를 작성하는 전문가" in prompt:
+        return "```json\n" + json.dumps(CANNED_DIARY, ensure_ascii=False, indent=2) + "\n```"
+    if "감정 상태를 백분율" in prompt:
+        return json.dumps(CANNED_EMOTIONS, ensure_ascii=False)
+    if "키워드를 추출" in prompt:
+        return json.dumps({"keywords": CANNED_KEYWORDS}, ensure_ascii=False)
+    if "이벤트나 일이" in prompt:
+        return json.dumps({"date": "", "events": ["팀 프로젝트 회의", "저녁 치킨"], "summary": CANNED_SUMMARY, "emotion": "중립"}, ensure_ascii=False)
+    return json.dumps({"summary": CANNED_SUMMARY}, ensure_ascii=False)
+
+
+async def _stream_chunks(content: str, delay: float, usage=None):
+    # 응답을 몇 글자씩 나눠 스트리밍 청크 형태로 전달
+    step = 8
+    pieces = [content[i:i + step] for i in range(0, len(content), step)] or [""]
+    for piece in pieces:
+        await asyncio.sleep(delay / len(pieces))
+        yield types.SimpleNamespace(
+            choices=[types.SimpleNamespace(index=0, delta=types.SimpleNamespace(content=piece))],
+            usage=None,
+        )
+    if usage is not None:  # stream_options={"include_usage": True} 이면 마지막에 사용량만 담은 청크
+        yield types.SimpleNamespace(choices=[], usage=usage)
+
+
+class _Completions:
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+
+    async def create(self, **params):
+        prompt = "\n".join(m["content"] for m in params["messages"])
+        content = canned_response(prompt)
+        n = params.get("n") or 1
+        # 출력이 길수록 오래 걸리도록 (토큰 생성 시간 흉내)
+        delay = self.latency * (1 + estimate_tokens(content) / 400) + random.uniform(0, self.jitter)
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content) * n
+        usage = types.SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+        if params.get("stream"):
+            include_usage = (params.get("stream_options") or {}).get("include_usage")
+            return _stream_chunks(content, delay, usage if include_usage else None)
+        await asyncio.sleep(delay)
+        return types.SimpleNamespace(
+            model=params["model"],
+            choices=[types.SimpleNamespace(index=i, message=types.SimpleNamespace(content=content)) for i in range(n)],
+            usage=usage,
+        )
+
+
+class OfflineAsyncOpenAI:
+    """
+    AsyncOpenAI 와 같은 방식(client.chat.completions.create)으로 호출할 수 있는 가짜 클라이언트
+
+    Args:
+        latency: 호출 1회의 기본 지연시간(초)
+        jitter: 지연시간에 더해지는 무작위 값의 최대치(초)
+    """
+
+    def __init__(self, latency: float = 0.8, jitter: float = 0.2):
+        self.chat = types.SimpleNamespace(completions=_Completions(latency, jitter))
@@ -0,0 +1,47 @@
+# 벤치마크용 가짜 카카오톡 내보내기 파일 생성기
+# - 여러 해에 걸친 단체 대화방 형식 (날짜 구분선 + "DD/MM/YY HH:MM, 이름 : 메시지")
+# - 사진/이모티콘/입장/퇴장 같은 시스템 메시지도 섞어서 실제 파일과 비슷한 비율로 만듦
+import datetime
+import random
+from typing import Iterator
+
+NAMES = ["민수", "지영", "현우", "서연", "도윤", "하은"]
+MESSAGES = [
+    "오늘 팀 프로젝트 회의 너무 길었어", "저녁 뭐 먹을래?", "치킨 어때", "좋아 ㅋㅋ 7시에 만나자",
+    "내일 발표 준비는 다 했어?", "아직 슬라이드 정리 중이야", "시험 끝나서 너무 행복하다",
+    "버스 놓쳐서 지각했어 ㅠㅠ", "날씨 진짜 춥다", "카페에서 공부하는 중", "과제 마감이 내일이라 걱정돼",
+    "영화 보러 갈 사람?", "주말에 등산 가자", "발표 잘 끝났어! 교수님이 칭찬해주심",
+    "오늘 점심은 학식 먹었는데 생각보다 괜찮았어", "다음 주 모임 장소 정해야 하는데 의견 있어?",
+]
+SYSTEM_MESSAGES = ["[사진]", "이모티콘", "지영님이 입장했습니다.", "도윤님이 나갔습니다."]
+WEEKDAYS = ["월요일", "화요일", "수요일", "목요일", "금요일", "토요일", "일요일"]
+
+
+def generate_export_lines(n_lines: int, messages_per_day: int = 300, seed: int = 42,
+                          start: datetime.date = datetime.date(2022, 1, 1)) -> Iterator[str]:
+    """
+    대략 n_lines 줄의 가짜 내보내기 파일 내용을 한 줄씩 생성합니다.
+    """
+    rng = random.Random(seed)
+    yield "벤치마크 단체방 님과 카카오톡 대화"
+    yield f"저장한 날짜 : {start.isoformat()} 09:00:00"
+    yield ""
+    produced, day = 3, start
+    while produced < n_lines:
+        yield f"--------------- {day.year}년 {day.month}월 {day.day}일 {WEEKDAYS[day.weekday()]} ---------------"
+        produced += 1
+        for i in range(messages_per_day):
+            if produced >= n_lines:
+                break
+            text = rng.choice(SYSTEM_MESSAGES) if rng.random() < 0.1 else rng.choice(MESSAGES)
+            minute = i * 1440 // messages_per_day
+            yield f"{day.day:02d}/{day.month:02d}/{day.year % 100:02d} {minute // 60}:{minute % 60:02d}, {rng.choice(NAMES)} : {text}"
+            produced += 1
+        day += datetime.timedelta(days=1)
+
+
+def write_export(path: str, n_lines: int, **kwargs) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        for line in generate_export_lines(n_lines, **kwargs):
+            f.write(line + "\n")
+    return path
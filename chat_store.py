@@ -0,0 +1,355 @@
+# 업로드된 카카오톡 대화를 한 번만 파싱해서 저장해두는 모듈 (SQLite)
+# - 같은 파일을 다시 올리면 내용 해시로 같은 chat_id 를 돌려주고 다시 파싱하지 않음
+# - 메시지는 (chat_id, 날짜, 순번) 기본키로 저장해서 특정 날짜의 메시지를 인덱스 범위 조회로 바로 꺼냄
+# - 날짜마다 대화 블록 지문을 저장해서, 매일 다시 내보낸 대화(이전 파일 + 새 메시지)에서 새로 생기거나 바뀐 날짜를 찾음
+# - 같은 대화방을 다시 내보낸 파일들은 같은 room_id 로 묶음 (파일마다 chat_id 는 달라도 일기 저장소에서는 한 대화방)
+# - 큰 파일도 쓰기 잠금은 메시지 묶음 저장 / 마지막 공개 때만 짧게 잡음 (파싱 중에는 잡지 않음)
+import hashlib
+import os
+import threading
+import time
+from typing import BinaryIO, Iterable, Iterator
+
+from concurrency import connect_sqlite
+from kakao_parser import iter_dated_messages, iter_file_blocks
+
+# 메시지를 DB 에 넣을 때 한 번에 묶어서 넣는 개수
+_INSERT_BATCH = 5000
+
+
+def hash_upload(fileobj: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """
+    업로드 파일 내용의 SHA-256 해시를 계산합니다. (계산 후 파일 위치를 처음으로 되돌림)
+    """
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    while chunk := fileobj.read(chunk_size):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def fingerprint_day(date: str, messages: Iterable[str]) -> str:
+    """
+    날짜 하나의 대화 블록 지문을 계산합니다. (날짜와 메시지 내용 / 순서가 같으면 같은 값)
+    - 날짜별 처리 결과(day_results)를 다시 쓸 수 있는지 판단하는 키
+    """
+    digest = hashlib.sha256(date.encode("utf-8"))
+    for text in messages:
+        digest.update(b"\n" + text.encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class ChatStore:
+    """
+    파싱된 대화 메시지를 날짜 인덱스와 함께 보관하는 저장소
+
+    Args:
+        db_path: SQLite 파일 경로
+    """
+
+    def __init__(self, db_path: str):
+        self._db = connect_sqlite(db_path)
+        self._lock = threading.Lock()
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chats (
+                chat_id TEXT PRIMARY KEY,
+                filename TEXT,
+                size_bytes INTEGER,
+                message_count INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                room_id TEXT
+            );
+            CREATE TABLE IF NOT EXISTS chat_dates (
+                chat_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                message_count INTEGER NOT NULL,
+                fingerprint TEXT,
+                PRIMARY KEY (chat_id, date)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS chat_dates_fingerprint ON chat_dates (fingerprint);
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                chat_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (chat_id, date, seq)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def exists(self, chat_id: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM chats WHERE chat_id = ?", (chat_id,)).fetchone() is not None
+
+    def ingest(self, chat_id: str, source: str | Iterable[str], filename: str | None = None,
+               size_bytes: int | None = None, previous_chat_id: str | None = None) -> dict:
+        """
+        대화를 파싱하면서 메시지를 날짜별로 저장합니다. (이미 있는 chat_id 면 다시 파싱하지 않음)
+        - 날짜마다 대화 블록 지문을 함께 계산해서 저장 (fingerprint_day 와 같은 값)
+
+        Args:
+            chat_id: 대화 식별자 (보통 파일 내용 해시, 같은 chat_id 는 같은 내용이어야 함)
+            source: 파일 전체 문자열 또는 줄/블록 이터러블 (예: iter_file_blocks)
+            previous_chat_id: 비교할 이전 대화 (None 이면 날짜 블록이 가장 많이 겹치는 대화, 이전 대화의 room_id 를 이어받음)
+
+        Returns:
+            dict: {"chat_id", "reused", "room_id", "message_count", "dates": [{"date", "message_count", "fingerprint"}, ...],
+                   "changes": compare() 결과}
+        """
+        if self.exists(chat_id):
+            return {"chat_id": chat_id, "reused": True, **self.describe(chat_id),
+                    "changes": self.compare(chat_id, previous_chat_id)}
+
+        # 메시지는 잠금 없이 파싱하고, 묶음마다 짧은 트랜잭션으로 저장 (큰 파일이라도 다른 워커의 쓰기를 오래 막지 않음)
+        # - chats 행을 넣기 전까지는 어떤 조회에도 나오지 않음 (날짜 / 메시지 조회는 모두 공개된 chat_id 로만 함)
+        # - chat_id 는 파일 내용 해시라 같은 파일을 동시에 올려도 같은 행을 쓰므로 INSERT OR REPLACE 로 겹쳐 써도 됨
+        day_counts: dict[str, int] = {}
+        digests = {}
+        batch = []
+        try:
+            for date, text in iter_dated_messages(source):
+                seq = day_counts.setdefault(date, 0)
+                if text is None:
+                    digests.setdefault(date, hashlib.sha256(date.encode("utf-8")))
+                    continue
+                batch.append((chat_id, date, seq, text))
+                digests[date].update(b"\n" + text.encode("utf-8"))
+                day_counts[date] = seq + 1
+                if len(batch) >= _INSERT_BATCH:
+                    self._insert_messages(batch)
+                    batch.clear()
+            if batch:
+                self._insert_messages(batch)
+        except BaseException:
+            self._discard_unpublished(chat_id)
+            raise
+
+        with self._lock:
+            # 마지막에 날짜 목록 / 대화 정보만 넣어서 공개 (그 사이 다른 워커가 같은 파일을 먼저 공개했으면 그대로 사용)
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._db.execute("SELECT 1 FROM chats WHERE chat_id = ?", (chat_id,)).fetchone() is not None:
+                    self._db.execute("COMMIT")
+                    return {"chat_id": chat_id, "reused": True, **self._describe_unlocked(chat_id),
+                            "changes": self._compare_unlocked(chat_id, previous_chat_id)}
+                self._db.executemany(
+                    "INSERT INTO chat_dates (chat_id, date, message_count, fingerprint) VALUES (?, ?, ?, ?)",
+                    [(chat_id, date, count, digests[date].hexdigest()[:32]) for date, count in day_counts.items()],
+                )
+                previous_chat_id = previous_chat_id or self._find_previous_unlocked(chat_id)
+                row = self._db.execute("SELECT room_id FROM chats WHERE chat_id = ?", (previous_chat_id,)).fetchone()
+                self._db.execute(
+                    "INSERT INTO chats (chat_id, filename, size_bytes, message_count, created_at, room_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (chat_id, filename, size_bytes, sum(day_counts.values()), time.time(), row[0] if row else chat_id),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+        return {"chat_id": chat_id, "reused": False, **self.describe(chat_id),
+                "changes": self.compare(chat_id, previous_chat_id)}
+
+    def _insert_messages(self, batch: list[tuple]) -> None:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO chat_messages VALUES (?, ?, ?, ?)", batch)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _discard_unpublished(self, chat_id: str) -> None:
+        # 파싱 / 저장 중 실패하면 공개되지 않은 메시지를 지움 (이미 공개된 대화면 그대로 둠)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            if self._db.execute("SELECT 1 FROM chats WHERE chat_id = ?", (chat_id,)).fetchone() is None:
+                self._db.execute("DELETE FROM chat_messages WHERE chat_id = ?", (chat_id,))
+            self._db.execute("COMMIT")
+
+    def ingest_file(self, fileobj: BinaryIO, filename: str | None = None, previous_chat_id: str | None = None) -> dict:
+        """
+        업로드 파일 객체를 해시 → (처음 보는 파일이면) 청크 단위 파싱 → 저장 순서로 처리합니다.
+        """
+        chat_id = hash_upload(fileobj)[:32]
+        if self.exists(chat_id):
+            return {"chat_id": chat_id, "reused": True, **self.describe(chat_id),
+                    "changes": self.compare(chat_id, previous_chat_id)}
+        fileobj.seek(0, os.SEEK_END)
+        size_bytes = fileobj.tell()
+        fileobj.seek(0)
+        return self.ingest(chat_id, iter_file_blocks(fileobj), filename=filename, size_bytes=size_bytes,
+                           previous_chat_id=previous_chat_id)
+
+    def describe(self, chat_id: str) -> dict:
+        """
+        대화 정보와 날짜별 메시지 수를 반환합니다. (없는 chat_id 면 KeyError)
+        """
+        with self._lock:
+            return self._describe_unlocked(chat_id)
+
+    def _describe_unlocked(self, chat_id: str) -> dict:
+        row = self._db.execute(
+            "SELECT filename, message_count, created_at, room_id FROM chats WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(chat_id)
+        dates = self._db.execute(
+            "SELECT date, message_count, fingerprint FROM chat_dates WHERE chat_id = ? ORDER BY date", (chat_id,)
+        ).fetchall()
+        return {
+            "filename": row[0],
+            "room_id": row[3],
+            "message_count": row[1],
+            "created_at": row[2],
+            "dates": [
+                {"date": date, "message_count": count, "fingerprint": fingerprint}
+                for date, count, fingerprint in dates
+            ],
+        }
+
+    def room_of(self, chat_id: str) -> str:
+        """
+        대화가 속한 대화방 ID 를 반환합니다. (없는 chat_id 면 KeyError)
+        """
+        with self._lock:
+            row = self._db.execute("SELECT room_id FROM chats WHERE chat_id = ?", (chat_id,)).fetchone()
+        if row is None:
+            raise KeyError(chat_id)
+        return row[0]
+
+    def fingerprints(self, chat_id: str, dates: Iterable[str] | None = None) -> dict[str, str]:
+        """
+        날짜별 대화 블록 지문을 {날짜: 지문} 형태로 반환합니다. (dates 가 None 이면 전체 날짜, 없는 날짜는 빠짐)
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT date, fingerprint FROM chat_dates WHERE chat_id = ? ORDER BY date", (chat_id,)
+            ).fetchall()
+        if dates is None:
+            return dict(rows)
+        wanted = set(dates)
+        return {date: fingerprint for date, fingerprint in rows if date in wanted}
+
+    def find_previous(self, chat_id: str) -> str | None:
+        """
+        날짜 블록이 가장 많이 겹치는 다른 대화를 찾습니다. (같은 대화방을 전에 내보낸 파일, 없으면 None)
+        - 겹치는 수가 같으면 가장 최근에 저장한 대화
+        """
+        with self._lock:
+            return self._find_previous_unlocked(chat_id)
+
+    def _find_previous_unlocked(self, chat_id: str) -> str | None:
+        row = self._db.execute(
+            """
+            SELECT o.chat_id
+            FROM chat_dates c
+            JOIN chat_dates o ON o.fingerprint = c.fingerprint AND o.chat_id != c.chat_id
+            JOIN chats h ON h.chat_id = o.chat_id
+            WHERE c.chat_id = ?
+            GROUP BY o.chat_id
+            ORDER BY COUNT(*) DESC, MAX(h.created_at) DESC
+            LIMIT 1
+            """,
+            (chat_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def compare(self, chat_id: str, previous_chat_id: str | None = None) -> dict:
+        """
+        이전 대화와 날짜별 대화 블록 지문을 비교합니다.
+
+        Args:
+            chat_id: 새로 올린 대화
+            previous_chat_id: 비교할 이전 대화 (None 이면 find_previous 로 찾음)
+
+        Returns:
+            dict: {"previous_chat_id", "new_dates", "changed_dates", "unchanged_dates"}
+                - new_dates: 이전 대화에 없던 날짜 / changed_dates: 메시지가 추가되거나 바뀐 날짜
+        """
+        with self._lock:
+            return self._compare_unlocked(chat_id, previous_chat_id)
+
+    def _compare_unlocked(self, chat_id: str, previous_chat_id: str | None) -> dict:
+        if previous_chat_id is None:
+            previous_chat_id = self._find_previous_unlocked(chat_id)
+        query = "SELECT date, fingerprint FROM chat_dates WHERE chat_id = ? ORDER BY date"
+        current = self._db.execute(query, (chat_id,)).fetchall()
+        previous = dict(self._db.execute(query, (previous_chat_id,)).fetchall()) if previous_chat_id else {}
+        changes = {"previous_chat_id": previous_chat_id, "new_dates": [], "changed_dates": [], "unchanged_dates": []}
+        for date, fingerprint in current:
+            if date not in previous:
+                changes["new_dates"].append(date)
+            elif previous[date] != fingerprint:
+                changes["changed_dates"].append(date)
+            else:
+                changes["unchanged_dates"].append(date)
+        return changes
+
+    def list_dates(self, chat_id: str) -> list[str]:
+        """
+        대화에 있는 날짜 목록을 오래된 순서로 반환합니다. (없는 chat_id 면 KeyError)
+        """
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM chats WHERE chat_id = ?", (chat_id,)).fetchone() is None:
+                raise KeyError(chat_id)
+            rows = self._db.execute(
+                "SELECT date FROM chat_dates WHERE chat_id = ? ORDER BY date", (chat_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def resolve_date(self, chat_id: str, target_date: str | None) -> str | None:
+        """
+        요청한 날짜를 실제 저장된 날짜("YYYY-MM-DD")로 바꿉니다.
+        - None 이면 가장 최근 날짜
+        - "2025-01-20" 형식이면 그대로 (없는 날짜면 None)
+        - 기존 "20일" 형식이면 그 일(day)에 해당하는 가장 최근 날짜
+        """
+        dates = self.list_dates(chat_id)
+        if not dates:
+            return None
+        if target_date is None:
+            return dates[-1]
+        if target_date in dates:
+            return target_date
+        if target_date.endswith("일") and target_date[:-1].isdigit():
+            day = int(target_date[:-1])
+            matches = [d for d in dates if int(d[8:10]) == day]
+            return matches[-1] if matches else None
+        return None
+
+    def get_messages(self, chat_id: str, date: str) -> list[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT text FROM chat_messages WHERE chat_id = ? AND date = ? ORDER BY seq", (chat_id, date)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_messages_by_date(self, chat_id: str, dates: Iterable[str] | None = None) -> dict[str, list[str]]:
+        """
+        여러 날짜의 메시지를 {날짜: [메시지, ...]} 형태로 반환합니다. (dates 가 None 이면 전체 날짜)
+        """
+        wanted = self.list_dates(chat_id) if dates is None else list(dates)
+        return {date: self.get_messages(chat_id, date) for date in wanted}
+
+    def iter_days(self) -> Iterator[tuple[str, str, list[str]]]:
+        """
+        저장된 모든 대화의 (chat_id, 날짜, 메시지 목록)을 하나씩 반환합니다. (키워드 문서 빈도 계산용)
+        """
+        with self._lock:
+            keys = self._db.execute("SELECT chat_id, date FROM chat_dates ORDER BY chat_id, date").fetchall()
+        for chat_id, date in keys:
+            yield chat_id, date, self.get_messages(chat_id, date)
+
+    def delete(self, chat_id: str) -> bool:
+        with self._lock:
+            self._db.execute("BEGIN")
+            cursor = self._db.execute("DELETE FROM chats WHERE chat_id = ?", (chat_id,))
+            self._db.execute("DELETE FROM chat_dates WHERE chat_id = ?", (chat_id,))
+            self._db.execute("DELETE FROM chat_messages WHERE chat_id = ?", (chat_id,))
+            self._db.execute("COMMIT")
+        return cursor.rowcount > 0
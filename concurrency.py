@@ -0,0 +1,252 @@
+# 서버 과부하 방지를 위한 동시성 제어 모듈
+# - LLM 호출 동시 실행 수 제한 (세마포어)
+# - 일기 생성 요청 입장 제어: 동시에 처리 중인 요청 수 + 대기열 길이를 제한하고, 넘치면 바로 거절
+# - OpenAI 분당 요청 수(RPM) 제한을 넘지 않도록 요청 속도 제한 (토큰 버킷, 여러 워커 프로세스가 함께 쓰는 SQLite 버전 포함)
+# - 클라이언트 / DB 연결을 처음 쓸 때 만들고 fork 된 프로세스에서는 새로 만드는 지연 생성 객체 (ForkSafe)
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable
+
+
+# 과부하로 요청을 받을 수 없을 때 발생하는 예외 (main.py 에서 503 응답으로 변환)
+class OverloadedError(Exception):
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# 환경 변수에서 정수 설정값을 읽는 함수 (값이 없거나 잘못되면 기본값 사용)
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class AdmissionController:
+    """
+    동시에 실행되는 요청 수와 대기열 길이를 제한하는 입장 제어기
+
+    Args:
+        max_active: 동시에 실행할 수 있는 요청 수
+        max_queued: 실행 슬롯을 기다릴 수 있는 최대 요청 수 (넘으면 즉시 거절)
+        queue_timeout: 대기열에서 기다릴 수 있는 최대 시간(초)
+    """
+
+    def __init__(self, max_active: int, max_queued: int, queue_timeout: float):
+        self.max_active = max(1, max_active)
+        self.max_queued = max(0, max_queued)
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(self.max_active)
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        # 실행 슬롯이 다 찼고 대기열도 가득 찼으면 기다리지 않고 바로 거절
+        if self.active + self.queued >= self.max_active + self.max_queued:
+            self.rejected += 1
+            raise OverloadedError("서버가 처리할 수 있는 요청 수를 초과했습니다. 잠시 후 다시 시도해주세요.")
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise OverloadedError("대기 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.")
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_active": self.max_active,
+            "max_queued": self.max_queued,
+            "rejected": self.rejected,
+        }
+
+
+class RateLimiter:
+    """
+    분당 요청 수를 제한하는 토큰 버킷 속도 제한기
+    - 토큰이 남아 있으면 바로 통과, 없으면 다음 토큰이 채워질 때까지 대기 (먼저 온 요청부터 순서대로)
+
+    Args:
+        requests_per_minute: 분당 허용 요청 수 (0 이하이면 제한 없음)
+        burst: 한꺼번에 보낼 수 있는 최대 요청 수 (None 이면 1초에 채워지는 양, 최소 1)
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int | None = None):
+        self.rate = max(0.0, requests_per_minute) / 60.0
+        self.capacity = float(burst if burst else max(1, int(self.rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited = 0
+        self.wait_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        if not self.enabled:
+            return
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                self.waited += 1
+                self.wait_seconds += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self._tokens -= 1
+
+    def stats(self) -> dict:
+        return {
+            "requests_per_minute": round(self.rate * 60, 1),
+            "burst": self.capacity,
+            "waited": self.waited,
+            "wait_seconds": round(self.wait_seconds, 2),
+        }
+
+
+# 여러 워커 프로세스가 함께 쓰는 SQLite 파일에 연결하는 함수 (각 저장소 / 공유 속도 제한기에서 사용)
+# - 스레드풀에서도 쓰므로 check_same_thread=False (한 번에 한 스레드만 쓰도록 호출하는 쪽에서 잠금)
+# - 트랜잭션은 호출하는 쪽에서 BEGIN / COMMIT 으로 직접 관리 (isolation_level=None)
+def connect_sqlite(db_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA busy_timeout = 5000")   # 여러 워커 프로세스가 같은 파일을 쓸 때 잠금이 풀릴 때까지 대기
+    return db
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    여러 워커 프로세스가 SQLite 파일 하나로 함께 쓰는 토큰 버킷 속도 제한기
+    - uvicorn --workers N 으로 실행해도 분당 요청 수 예산을 워커마다 따로(N 배로) 쓰지 않음
+    - 토큰이 모자라면 다음 토큰을 미리 예약(남은 토큰이 음수가 됨)하고 차례가 올 때까지 대기 (먼저 온 요청부터 순서대로)
+
+    Args:
+        db_path: 버킷 상태를 저장할 SQLite 파일 경로 (같은 경로를 쓰는 프로세스끼리 예산을 나눠 씀)
+        requests_per_minute / burst: RateLimiter 와 같음
+        name: 한 파일에 여러 버킷을 둘 때 구분하는 이름
+    """
+
+    def __init__(self, db_path: str, requests_per_minute: float, burst: int | None = None, name: str = "llm"):
+        super().__init__(requests_per_minute, burst)
+        self.db_path = db_path
+        self.name = name
+        self._db: sqlite3.Connection | None = None
+        self._db_pid: int | None = None
+        self._db_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # 처음 쓸 때 연결 (fork 된 자식 프로세스는 부모의 연결을 쓰지 않고 새로 연결)
+        if self._db is None or self._db_pid != os.getpid():
+            db = connect_sqlite(self.db_path)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                " name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def _reserve(self) -> float:
+        # 토큰 하나를 가져가고, 기다려야 하는 시간(초)을 반환
+        with self._db_lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")   # 다른 프로세스가 같은 버킷을 동시에 읽고 쓰지 않도록 쓰기 잠금을 먼저 잡음
+            try:
+                now = time.time()
+                row = db.execute("SELECT tokens, updated_at FROM rate_limits WHERE name = ?", (self.name,)).fetchone()
+                tokens = self.capacity if row is None else min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+                tokens -= 1
+                db.execute("INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?)", (self.name, tokens, now))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return max(0.0, -tokens / self.rate)
+
+    async def acquire(self) -> None:
+        if not self.enabled:
+            return
+        delay = await asyncio.to_thread(self._reserve)
+        if delay > 0:
+            self.waited += 1
+            self.wait_seconds += delay
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "shared_db": self.db_path}
+
+
+class ForkSafe:
+    """
+    처음 사용할 때 만들고, 프로세스가 바뀌면(fork 된 워커) 다시 만드는 지연 생성 객체
+    - 모듈 import 시점에는 아무것도 만들지 않음 (OpenAI 클라이언트 / SQLite 연결 / 파일 읽기 없음)
+    - gunicorn --preload 처럼 부모 프로세스에서 만든 객체를 물려받아도 커넥션 풀 / DB 연결을 프로세스끼리 공유하지 않음
+    - 속성 접근은 실제 객체로 그대로 전달 (store.get(...), client.chat.completions.create(...) 등)
+
+    Args:
+        factory: 실제 객체를 만드는 함수
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._instance: Any = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def resolve(self) -> Any:
+        """현재 프로세스의 실제 객체를 반환합니다. (없으면 만듦)"""
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._instance = self._factory()
+                    self._pid = pid
+        return self._instance
+
+    @property
+    def created(self) -> bool:
+        return self._pid == os.getpid()
+
+    def reset(self) -> None:
+        """만든 객체를 버립니다. (다음에 사용할 때 다시 만듦, 예: 서버 종료 때 닫은 클라이언트)"""
+        with self._lock:
+            self._instance = None
+            self._pid = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.resolve(), name)
+
+    def __repr__(self) -> str:
+        return f"ForkSafe({self._instance!r})" if self.created else "ForkSafe(<not created>)"
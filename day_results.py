@@ -0,0 +1,85 @@
+# 날짜별 처리 결과(이벤트 분석 / 일기)를 대화 블록 지문으로 저장해두는 모듈 (SQLite)
+# - 매일 다시 내보낸 대화는 이전 파일 + 새 메시지라서 대부분의 날짜 블록이 그대로임
+# - 날짜 블록 지문(chat_store.fingerprint_day)이 같으면 이전 결과를 그대로 쓰고, 새로 생기거나 바뀐 날짜만 다시 처리
+# - 지문(내용) 기준이라 이전 대화(chat_id)를 지워도 결과는 남고, 업로드 파일로 요청해도 같은 결과를 찾음
+import json
+import threading
+import time
+from typing import Any
+
+from concurrency import connect_sqlite
+
+
+class DayResultStore:
+    """
+    (종류, 날짜 블록 지문, 옵션) 을 키로 날짜별 처리 결과를 보관하는 저장소
+
+    Args:
+        db_path: SQLite 파일 경로
+    """
+
+    def __init__(self, db_path: str):
+        self._db = connect_sqlite(db_path)
+        self._lock = threading.Lock()
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS day_results (
+                kind TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (kind, fingerprint, variant)
+            ) WITHOUT ROWID;
+            """
+        )
+        self.counters = {"hits": 0, "misses": 0, "stores": 0}
+
+    def get_many(self, kind: str, fingerprints: dict[str, str], variant: str = "") -> dict[str, Any]:
+        """
+        날짜별 지문에 해당하는 저장된 결과를 찾습니다.
+
+        Args:
+            kind: 결과 종류 (예: "event", "diary")
+            fingerprints: {날짜: 지문}
+            variant: 결과에 영향을 주는 옵션의 해시 (예: 일기 생성 옵션, 없으면 "")
+
+        Returns:
+            dict: {날짜: 결과} (저장된 결과가 있는 날짜만)
+        """
+        found = {}
+        with self._lock:
+            for date, fingerprint in fingerprints.items():
+                row = self._db.execute(
+                    "SELECT result FROM day_results WHERE kind = ? AND fingerprint = ? AND variant = ?",
+                    (kind, fingerprint, variant),
+                ).fetchone()
+                if row is not None:
+                    found[date] = json.loads(row[0])
+            self.counters["hits"] += len(found)
+            self.counters["misses"] += len(fingerprints) - len(found)
+        return found
+
+    def put_many(self, kind: str, fingerprints: dict[str, str], results: dict[str, Any], variant: str = "") -> int:
+        """
+        날짜별 결과를 지문과 함께 저장합니다. (지문이 없는 날짜는 건너뜀)
+
+        Returns:
+            int: 저장한 결과 수
+        """
+        now = time.time()
+        rows = [
+            (kind, fingerprints[date], variant, json.dumps(result, ensure_ascii=False), now)
+            for date, result in results.items() if date in fingerprints
+        ]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR REPLACE INTO day_results VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+            self.counters["stores"] += len(rows)
+        return len(rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = dict(self._db.execute("SELECT kind, COUNT(*) FROM day_results GROUP BY kind").fetchall())
+        return {**self.counters, "entries": entries}
@@ -0,0 +1,266 @@
+# 생성한 일기를 저장하고 다시 찾는 모듈 (SQLite + FTS5)
+# - 일기 결과(섹션 / summary / emotions / keywords / target_date)를 모두 보관
+#   (사용자 ID 와 대화(chat_id)가 함께 있는 일기만 사용자 + 대화방 + 날짜마다 하나씩 두고 다시 만들면 덮어씀,
+#    사용자 ID 없이 만든 일기 / 붙여넣은 텍스트로 만든 일기는 누구의 어느 대화인지 알 수 없어 매번 새로 저장)
+# - 날짜 / 대표 감정 / 키워드 인덱스로 "이번 달 나쁨이 가장 큰 날", "발표 키워드가 있는 일기" 같은 조회를 LLM 호출 없이 처리
+# - 본문 검색: 한국어는 두 글자 단어가 많아 FTS5 기본 토크나이저(어절 단위) / trigram 으로는 '발표를' 에서 '발표' 를 찾지 못함
+#   → 한글 어절을 두 글자 조각(bigram)으로 나눠 FTS5 에 색인하고, 후보를 찾은 뒤 원문에 검색어가 실제로 있는지 한 번 더 확인
+import datetime
+import json
+import re
+import threading
+import time
+from typing import Any, Iterator
+
+from concurrency import connect_sqlite
+
+# 감정 분석 결과의 라벨 (main.DEFAULT_EMOTIONS 와 같은 순서, 동률이면 앞의 라벨을 대표 감정으로)
+EMOTION_LABELS = ("좋음", "평범함", "나쁨")
+
+# 검색 본문에 넣지 않는 결과 키 (원문 대화 / 실행 정보)
+_NON_TEXT_KEYS = {"kakao_text", "emotions", "keywords", "target_date", "token_budget", "conflict_info"}
+
+_WORD = re.compile(r"[가-힣]+|[0-9A-Za-z]+")
+_HANGUL = re.compile(r"[가-힣]+")
+
+
+def search_terms(text: str) -> str:
+    """
+    FTS5 에 색인할 검색어 목록을 만듭니다. (공백으로 구분)
+    - 한글 어절: 두 글자 조각 전부 ('발표를' → '발표 표를')
+    - 영문 / 숫자: 소문자 단어 그대로
+    """
+    terms = []
+    for word in _WORD.findall(text):
+        if _HANGUL.fullmatch(word):
+            terms.extend(word[i:i + 2] for i in range(max(1, len(word) - 1)))
+        else:
+            terms.append(word.lower())
+    return " ".join(terms)
+
+
+def _match_query(words: list[str]) -> str | None:
+    # 검색어마다 두 글자 조각을 모두 포함하는 행 (한 글자 한글 검색어는 색인으로 찾을 수 없어 원문 확인에만 사용)
+    terms = [term for word in words for term in search_terms(word).split() if len(term) >= 2 or not _HANGUL.fullmatch(term)]
+    if not terms:
+        return None
+    return " AND ".join('"' + term.replace('"', '""') + '"' for term in dict.fromkeys(terms))
+
+
+def has_day_key(user_id: str | None, chat_id: str | None) -> bool:
+    """사용자 + 대화방 + 날짜마다 하나만 두는 일기인지 (사용자 ID 와 대화 ID 가 모두 있어야 같은 일기인지 알 수 있음)"""
+    return bool(user_id) and bool(chat_id)
+
+
+def dominant_emotion(emotions: dict | None) -> str | None:
+    """감정 비율이 가장 큰 라벨 (감정 결과가 없으면 None)"""
+    scores = {label: emotions.get(label) for label in EMOTION_LABELS} if isinstance(emotions, dict) else {}
+    scores = {label: value for label, value in scores.items() if isinstance(value, (int, float))}
+    return max(scores, key=scores.get) if scores else None
+
+
+def diary_text(result: dict) -> str:
+    """검색 본문 (일기 섹션 + 요약 + 키워드)"""
+    parts = [value for key, value in result.items() if key not in _NON_TEXT_KEYS and isinstance(value, str)]
+    parts.extend(str(keyword) for keyword in result.get("keywords") or [])
+    return "\n".join(parts)
+
+
+class DiaryStore:
+    """
+    일기 결과를 날짜 / 감정 / 키워드 / 본문 검색 인덱스와 함께 보관하는 저장소
+
+    Args:
+        db_path: SQLite 파일 경로
+    """
+
+    # 조회 결과 열 순서 (_to_item 에서 사용)
+    _COLUMNS = ("d.diary_id, d.user_id, d.room_id, d.chat_id, d.date, d.dominant_emotion, d.good, d.neutral, d.bad, "
+                "d.summary, d.result, d.created_at")
+
+    def __init__(self, db_path: str):
+        self._db = connect_sqlite(db_path)
+        self._lock = threading.Lock()
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS diaries (
+                diary_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                room_id TEXT NOT NULL,
+                chat_id TEXT,
+                date TEXT NOT NULL,
+                dominant_emotion TEXT,
+                good INTEGER,
+                neutral INTEGER,
+                bad INTEGER,
+                summary TEXT,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS diaries_user_date ON diaries (user_id, date);
+            CREATE INDEX IF NOT EXISTS diaries_user_emotion ON diaries (user_id, dominant_emotion, date);
+            CREATE INDEX IF NOT EXISTS diaries_room_date ON diaries (room_id, date);
+            CREATE UNIQUE INDEX IF NOT EXISTS diaries_day_key ON diaries (user_id, room_id, date)
+                WHERE user_id != '' AND chat_id IS NOT NULL;
+            CREATE TABLE IF NOT EXISTS diary_keywords (
+                keyword TEXT NOT NULL,
+                diary_id INTEGER NOT NULL,
+                PRIMARY KEY (keyword, diary_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS diary_keywords_diary ON diary_keywords (diary_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS diaries_fts USING fts5(terms, body UNINDEXED);
+            """
+        )
+
+    def save(self, result: dict, user_id: str = "", room_id: str = "", chat_id: str | None = None,
+             date: str | None = None) -> int:
+        """
+        일기 결과를 저장합니다.
+        사용자 ID 와 chat_id 가 모두 있으면 같은 사용자 / 대화방 / 날짜의 일기를 새 결과로 바꾸고, 아니면 새로 추가
+
+        Args:
+            result: 일기 생성 결과 (섹션, summary, emotions, keywords, target_date …)
+            user_id: 사용자 ID (없으면 "")
+            room_id: 대화방 ID (chat_store 의 room_id, 대화방 없이 만든 일기는 "")
+            chat_id: 일기를 만든 대화 파일 ID
+            date: 일기 날짜 "YYYY-MM-DD" (None 이면 오늘)
+
+        Returns:
+            int: diary_id
+        """
+        result = {key: value for key, value in result.items() if key != "kakao_text"}
+        emotions = result.get("emotions") if isinstance(result.get("emotions"), dict) else {}
+        keywords = list(dict.fromkeys(str(k).strip() for k in result.get("keywords") or [] if str(k).strip()))
+        body = diary_text(result)
+        date = date or datetime.date.today().isoformat()
+        row = (
+            user_id, room_id, chat_id, date, dominant_emotion(emotions),
+            *(emotions.get(label) for label in EMOTION_LABELS), result.get("summary"),
+            json.dumps(result, ensure_ascii=False), time.time(),
+        )
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                old = self._db.execute(
+                    "SELECT diary_id FROM diaries WHERE user_id = ? AND room_id = ? AND date = ? "
+                    "AND user_id != '' AND chat_id IS NOT NULL", (user_id, room_id, date)
+                ).fetchone() if has_day_key(user_id, chat_id) else None
+                if old is not None:
+                    self._delete_unlocked(old[0])
+                diary_id = self._db.execute(
+                    "INSERT INTO diaries (user_id, room_id, chat_id, date, dominant_emotion, good, neutral, bad, summary, "
+                    "result, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                ).lastrowid
+                self._db.executemany("INSERT INTO diary_keywords VALUES (?, ?)", [(k, diary_id) for k in keywords])
+                self._db.execute("INSERT INTO diaries_fts (rowid, terms, body) VALUES (?, ?, ?)",
+                                 (diary_id, search_terms(body), body))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return diary_id
+
+    def _delete_unlocked(self, diary_id: int) -> bool:
+        cursor = self._db.execute("DELETE FROM diaries WHERE diary_id = ?", (diary_id,))
+        self._db.execute("DELETE FROM diary_keywords WHERE diary_id = ?", (diary_id,))
+        self._db.execute("DELETE FROM diaries_fts WHERE rowid = ?", (diary_id,))
+        return cursor.rowcount > 0
+
+    def delete(self, diary_id: int) -> bool:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            deleted = self._delete_unlocked(diary_id)
+            self._db.execute("COMMIT")
+        return deleted
+
+    def get(self, diary_id: int) -> dict | None:
+        with self._lock:
+            row = self._db.execute(f"SELECT {self._COLUMNS} FROM diaries d WHERE diary_id = ?", (diary_id,)).fetchone()
+        return None if row is None else self._to_item(row, include_result=True)
+
+    def query(self, user_id: str | None = None, room_id: str | None = None, start_date: str | None = None,
+              end_date: str | None = None, emotion: str | None = None, keyword: str | None = None,
+              text: str | None = None, limit: int = 50, offset: int = 0, include_result: bool = False) -> dict:
+        """
+        조건에 맞는 일기를 최근 날짜부터 반환합니다. (조건은 모두 AND)
+
+        Args:
+            user_id / room_id: 사용자 / 대화방
+            start_date / end_date: 날짜 범위 ("YYYY-MM-DD", 양 끝 포함)
+            emotion: 대표 감정 (좋음 / 평범함 / 나쁨)
+            keyword: 키워드 (일기 결과의 keywords 와 정확히 같은 값)
+            text: 본문 검색어 (공백으로 나눈 검색어가 모두 들어간 일기)
+            include_result: True 면 항목마다 일기 결과 전체를 포함
+
+        Returns:
+            dict: {"total": 조건에 맞는 일기 수, "items": [...]}
+        """
+        joins, where, args = [], [], []
+        if keyword:
+            joins.append("JOIN diary_keywords k ON k.diary_id = d.diary_id AND k.keyword = ?")
+            args.append(keyword.strip())
+        words = text.split() if text else []
+        if words:
+            # 색인 검색은 한 번만 실행되도록 하위 쿼리로 (조인 조건에 두면 다른 조건의 행마다 검색이 다시 실행됨)
+            joins.append("JOIN diaries_fts f ON f.rowid = d.diary_id")
+            match = _match_query(words)
+            if match:
+                where.append("d.diary_id IN (SELECT rowid FROM diaries_fts WHERE diaries_fts MATCH ?)")
+                args.append(match)
+            for word in words:
+                where.append("instr(f.body, ?) > 0")
+                args.append(word)
+        for column, value in (("d.user_id = ?", user_id), ("d.room_id = ?", room_id), ("d.date >= ?", start_date),
+                              ("d.date <= ?", end_date), ("d.dominant_emotion = ?", emotion)):
+            if value is not None:
+                where.append(column)
+                args.append(value)
+
+        sql = f"FROM diaries d {' '.join(joins)}" + (f" WHERE {' AND '.join(where)}" if where else "")
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) {sql}", args).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT {self._COLUMNS} {sql} ORDER BY d.date DESC, d.diary_id DESC LIMIT ? OFFSET ?",
+                [*args, limit, offset],
+            ).fetchall()
+        return {"total": total, "items": [self._to_item(row, include_result) for row in rows]}
+
+    @staticmethod
+    def _to_item(row: tuple, include_result: bool) -> dict:
+        result = json.loads(row[10])
+        item = {
+            "diary_id": row[0],
+            "user_id": row[1],
+            "room_id": row[2],
+            "chat_id": row[3],
+            "date": row[4],
+            "dominant_emotion": row[5],
+            "emotions": {label: value for label, value in zip(EMOTION_LABELS, row[6:9]) if value is not None},
+            "keywords": result.get("keywords") or [],
+            "summary": row[9],
+            "created_at": row[11],
+        }
+        if include_result:
+            item["result"] = result
+        return item
+
+    def iter_results(self) -> Iterator[tuple[int, str, str, str | None, str, dict]]:
+        """
+        저장된 모든 일기의 (diary_id, user_id, room_id, chat_id, 날짜, 일기 결과)를 하나씩 반환합니다. (집계 다시 계산용)
+        """
+        with self._lock:
+            ids = [row[0] for row in self._db.execute("SELECT diary_id FROM diaries ORDER BY diary_id")]
+        for diary_id in ids:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT user_id, room_id, chat_id, date, result FROM diaries WHERE diary_id = ?", (diary_id,)
+                ).fetchone()
+            if row is not None:
+                yield diary_id, row[0], row[1], row[2], row[3], json.loads(row[4])
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            diaries = self._db.execute("SELECT COUNT(*) FROM diaries").fetchone()[0]
+            keywords = self._db.execute("SELECT COUNT(DISTINCT keyword) FROM diary_keywords").fetchone()[0]
+        return {"diaries": diaries, "keywords": keywords}
@@ -0,0 +1,285 @@
+# OpenAI 호출용 HTTP 연결 풀 모듈
+# - 연결 수를 LLM 동시 호출 제한(LLM_MAX_CONCURRENCY)에 맞추고, 쉬는 연결을 오래 유지해서 TLS 연결을 재사용
+#   (SDK 기본값은 최대 1000개 연결 / keep-alive 5초라서 잠깐만 쉬어도 다음 요청이 연결 준비 시간을 다시 냄)
+# - h2 패키지가 있으면 HTTP/2 사용 가능 (연결 하나로 여러 요청을 동시에 보냄)
+# - 서버 시작 시 연결을 미리 열어두고(pre-warm), 설정하면 오래 쉰 뒤에도 다시 열어둠 (keep-warm)
+# - 요청마다 새 연결 / 재사용 여부, 연결 준비 시간, 풀 대기 시간, 풀 포화 여부를 기록 (metrics.py)
+# - 사용 중 / 쉬는 연결 수는 httpx 내부(비공개) 값이라 요청마다 읽지 않고 백그라운드 작업에서 1초마다 읽음
+import asyncio
+import importlib
+import time
+from typing import AsyncIterator, Callable
+
+from openai import DefaultAsyncHttpxClient
+
+from concurrency import env_float, env_int
+from metrics import record_http_connection, record_http_pool
+
+try:
+    import h2  # noqa: F401  HTTP/2 지원 (httpx[http2])
+except ImportError:
+    h2 = None
+
+# OpenAI SDK 버전에 따라 httpx 또는 httpx2 를 쓰므로 SDK 기본 클라이언트가 상속한 모듈을 그대로 사용 (transport / 스트림 타입이 맞아야 함)
+httpx = importlib.import_module(
+    next(base for base in DefaultAsyncHttpxClient.__mro__ if base.__name__ == "AsyncClient").__module__.split(".")[0]
+)
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """응답 본문을 다 읽거나 닫을 때 연결 사용을 끝낸 것으로 기록하는 스트림 (스트리밍 응답 포함)"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class TrackedTransport(httpx.AsyncBaseTransport):
+    """
+    httpx 연결 풀 transport 를 감싸서 요청마다 연결 사용 결과를 기록
+    - httpcore trace 이벤트로 새 연결(connect_tcp)인지, 요청을 보내기 전까지 얼마나 기다렸는지 계산
+    """
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport, pool: "HttpPool"):
+        self._transport = transport
+        self._pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        pool = self._pool
+        started = time.perf_counter()
+        timing: dict[str, float] = {}
+        previous_trace = request.extensions.get("trace")
+
+        async def trace(event: str, info: dict) -> None:
+            if event.endswith("connect_tcp.started"):
+                timing["connect"] = time.perf_counter()
+            elif event.endswith("send_request_headers.started") and "sent" not in timing:
+                timing["sent"] = time.perf_counter()
+                connect_started = timing.get("connect")
+                pool.record_connection(
+                    new=connect_started is not None,
+                    connect_seconds=None if connect_started is None else timing["sent"] - connect_started,
+                    pool_wait_seconds=(connect_started or timing["sent"]) - started,
+                )
+            if previous_trace is not None:
+                await previous_trace(event, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        release = pool.acquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class HttpPool:
+    """
+    OpenAI 클라이언트가 쓰는 HTTP 연결 풀 설정과 통계
+
+    Args:
+        max_connections: 최대 연결 수 (LLM 동시 호출 제한과 같게)
+        max_keepalive: 쉬는 상태로 유지할 최대 연결 수 (None 이면 max_connections)
+        keepalive_expiry: 쉬는 연결을 닫기까지의 시간(초)
+        http2: HTTP/2 사용 여부 (h2 패키지가 없으면 HTTP/1.1)
+        connect_timeout: 연결 준비 제한 시간(초)
+        prewarm: 서버 시작 시 미리 열어둘 연결 수 (0 이면 사용 안 함)
+        keep_warm: 이 시간(초) 동안 OpenAI 요청이 없으면 연결을 다시 열어둠 (0 이면 사용 안 함)
+    """
+
+    _SAMPLE_INTERVAL = 1.0   # 연결 수를 읽는 간격(초)
+
+    def __init__(self, max_connections: int = 8, max_keepalive: int | None = None, keepalive_expiry: float = 90.0,
+                 http2: bool = False, connect_timeout: float = 10.0, prewarm: int = 2, keep_warm: float = 0.0):
+        if http2 and h2 is None:
+            print("⚠️ h2 패키지가 없어 HTTP/1.1 을 사용합니다 (pip install 'httpx[http2]')")
+            http2 = False
+        self.max_connections = max(1, max_connections)
+        self.max_keepalive = self.max_connections if max_keepalive is None else max(0, max_keepalive)
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.prewarm_connections = max(0, prewarm)
+        self.keep_warm = max(0.0, keep_warm)
+        self.client: httpx.AsyncClient | None = None
+        self._transport: httpx.AsyncHTTPTransport | None = None
+        self._background_task: asyncio.Task | None = None
+        self._connections = (0, 0)   # 마지막으로 읽은 (사용 중, 쉬는) 연결 수
+        self._last_request = time.monotonic()
+        self.in_flight = 0
+        self.counters = {
+            "requests": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "saturated": 0,
+            "max_in_flight": 0,
+            "prewarmed": 0,
+            "prewarm_errors": 0,
+            "connect_seconds": 0.0,
+            "pool_wait_seconds": 0.0,
+        }
+
+    @classmethod
+    def from_env(cls, default_connections: int) -> "HttpPool":
+        """
+        환경 변수에서 설정을 읽습니다.
+        - LLM_HTTP_MAX_CONNECTIONS / LLM_HTTP_KEEPALIVE_CONNECTIONS: 최대 연결 수 (기본: LLM 동시 호출 제한) / 유지할 연결 수
+        - LLM_HTTP_KEEPALIVE_EXPIRY: 쉬는 연결 유지 시간(초, 기본 90)
+        - LLM_HTTP2: 1 이면 HTTP/2 사용 (h2 패키지 필요)
+        - LLM_HTTP_CONNECT_TIMEOUT: 연결 준비 제한 시간(초, 기본 10)
+        - LLM_HTTP_PREWARM: 서버 시작 시 미리 열어둘 연결 수 (기본 2, 0 이면 사용 안 함)
+        - LLM_HTTP_KEEP_WARM: 이 시간(초) 동안 요청이 없으면 연결을 다시 열어둠 (기본 0, 사용 안 함)
+        """
+        max_connections = env_int("LLM_HTTP_MAX_CONNECTIONS", default_connections)
+        return cls(
+            max_connections=max_connections,
+            max_keepalive=env_int("LLM_HTTP_KEEPALIVE_CONNECTIONS", max_connections),
+            keepalive_expiry=env_float("LLM_HTTP_KEEPALIVE_EXPIRY", 90.0),
+            http2=env_int("LLM_HTTP2", 0) != 0,
+            connect_timeout=env_float("LLM_HTTP_CONNECT_TIMEOUT", 10.0),
+            prewarm=env_int("LLM_HTTP_PREWARM", 2),
+            keep_warm=env_float("LLM_HTTP_KEEP_WARM", 0.0),
+        )
+
+    def build_client(self) -> httpx.AsyncClient:
+        """
+        이 풀 설정으로 OpenAI SDK 용 httpx 클라이언트를 만듭니다. (AsyncOpenAI(http_client=...) 에 전달)
+        """
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            http2=self.http2,
+        )
+        self.client = DefaultAsyncHttpxClient(
+            transport=TrackedTransport(self._transport, self),
+            timeout=httpx.Timeout(600.0, connect=self.connect_timeout),
+        )
+        return self.client
+
+    def sample_connections(self) -> tuple[int, int]:
+        """
+        연결 풀의 (사용 중, 쉬는) 연결 수를 읽어 저장합니다.
+        - httpcore 의 비공개 연결 목록을 읽으므로, 버전이 달라 읽을 수 없으면 이전 값을 그대로 사용
+        """
+        try:
+            connections = list(self._transport._pool.connections)
+            idle = sum(1 for connection in connections if connection.is_idle())
+        except (AttributeError, TypeError):
+            return self._connections
+        self._connections = (len(connections) - idle, idle)
+        return self._connections
+
+    def acquire(self) -> Callable[[], None]:
+        """요청 시작을 기록하고, 요청이 끝났을 때 한 번만 호출할 함수를 반환합니다."""
+        # HTTP/1.1 은 연결 하나에 요청 하나씩이라 진행 중인 요청이 최대 연결 수에 닿으면 풀이 가득 찬 것
+        saturated = not self.http2 and self.in_flight >= self.max_connections
+        self.in_flight += 1
+        self.counters["requests"] += 1
+        self.counters["saturated"] += saturated
+        self.counters["max_in_flight"] = max(self.counters["max_in_flight"], self.in_flight)
+        self._last_request = time.monotonic()
+        record_http_pool(self.in_flight, *self._connections, saturated=saturated)
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight -= 1
+                record_http_pool(self.in_flight, *self._connections)
+
+        return release
+
+    def record_connection(self, new: bool, connect_seconds: float | None, pool_wait_seconds: float) -> None:
+        self.counters["new_connections" if new else "reused_connections"] += 1
+        self.counters["connect_seconds"] += connect_seconds or 0.0
+        self.counters["pool_wait_seconds"] += pool_wait_seconds
+        record_http_connection(new, connect_seconds, pool_wait_seconds)
+
+    async def prewarm(self, base_url: str, headers: dict | None = None, count: int | None = None) -> int:
+        """
+        연결을 미리 열어둡니다. (GET {base_url}/models 를 동시에 보내서 연결 count 개를 만든 뒤 풀에 반납)
+        - 이 풀로 만든 클라이언트가 없으면(테스트용 가짜 클라이언트 등) 아무것도 하지 않음
+
+        Returns:
+            int: 응답을 받은(연결이 열린) 요청 수
+        """
+        count = self.prewarm_connections if count is None else count
+        if self.client is None or count <= 0:
+            return 0
+        url = base_url.rstrip("/") + "/models"
+        # HTTP/2 는 연결 하나를 같이 쓰므로 하나만 열면 됨
+        requests = [self.client.get(url, headers=headers, timeout=self.connect_timeout)
+                    for _ in range(1 if self.http2 else min(count, self.max_connections))]
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        opened = sum(1 for result in results if isinstance(result, httpx.Response))
+        self.counters["prewarmed"] += opened
+        self.counters["prewarm_errors"] += len(results) - opened
+        if opened < len(results):
+            error = next(result for result in results if not isinstance(result, httpx.Response))
+            print(f"⚠️ OpenAI 연결 미리 열기 실패 ({len(results) - opened}/{len(results)}): {type(error).__name__}")
+        return opened
+
+    def start_background(self, base_url: str, headers: dict | None = None) -> None:
+        """
+        연결 수를 주기적으로 읽고, keep_warm 초 동안 요청이 없으면 연결을 다시 열어두는 백그라운드 작업을 시작합니다.
+        """
+        if self.client is None or self._background_task is not None:
+            return
+        record_http_pool(self.in_flight, *self.sample_connections())   # 미리 열어둔 연결 수부터 반영
+
+        async def loop() -> None:
+            while True:
+                await asyncio.sleep(self._SAMPLE_INTERVAL)
+                record_http_pool(self.in_flight, *self.sample_connections())
+                if self.keep_warm > 0 and time.monotonic() - self._last_request >= self.keep_warm:
+                    await self.prewarm(base_url, headers)
+
+        self._background_task = asyncio.create_task(loop(), name="llm-http-pool")
+
+    async def stop(self) -> None:
+        """백그라운드 작업을 멈추고 연결 풀을 닫습니다. (서버 종료 / 다시 불러오기 때 연결이 남지 않도록)"""
+        if self._background_task is not None:
+            self._background_task.cancel()
+            await asyncio.gather(self._background_task, return_exceptions=True)
+            self._background_task = None
+        if self.client is not None:
+            await self.client.aclose()   # TrackedTransport → 연결 풀 transport 까지 닫힘
+            self.client = None
+            self._transport = None
+        self._connections = (0, 0)
+
+    def stats(self) -> dict:
+        active, idle = self.sample_connections()
+        connections = self.counters["new_connections"] + self.counters["reused_connections"]
+        return {
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive,
+            "keepalive_expiry": self.keepalive_expiry,
+            "http2": self.http2,
+            "in_flight": self.in_flight,
+            "connections": {"active": active, "idle": idle},
+            **{key: value for key, value in self.counters.items() if not key.endswith("_seconds")},
+            "reuse_rate": round(self.counters["reused_connections"] / connections, 3) if connections else 0.0,
+            "avg_connect_ms": round(self.counters["connect_seconds"] / self.counters["new_connections"] * 1000, 2)
+            if self.counters["new_connections"] else 0.0,
+            "avg_pool_wait_ms": round(self.counters["pool_wait_seconds"] / connections * 1000, 2) if connections else 0.0,
+        }
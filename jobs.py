@@ -0,0 +1,424 @@
+# 여러 날짜의 일기를 한꺼번에 만드는 백그라운드 작업(Job) 모듈
+# - 작업과 날짜별 항목을 SQLite 에 저장해서 별도 메시지 브로커 없이 큐로 사용
+# - 서버가 재시작되면 실행 중이던 항목을 다시 대기 상태로 돌려서 이어서 처리
+#   (여러 워커 프로세스가 같은 DB 를 쓰면 하트비트가 끊긴 워커의 항목만 다시 대기 상태로)
+# - 워커 수만큼만 동시에 처리하고, 항목이 끝날 때마다 구독자(SSE)에게 진행 상황을 알림
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+from concurrency import connect_sqlite
+
+# 작업 / 항목 상태
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobStore:
+    """
+    작업과 날짜별 항목을 저장하는 SQLite 큐
+
+    Args:
+        db_path: SQLite 파일 경로
+    """
+
+    def __init__(self, db_path: str):
+        self._db = connect_sqlite(db_path)
+        self._lock = threading.Lock()
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                chat_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                options TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                worker TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job_id, date)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status, job_id);
+            CREATE TABLE IF NOT EXISTS job_workers (
+                worker TEXT PRIMARY KEY,
+                heartbeat REAL NOT NULL
+            );
+            """
+        )
+
+    def create_job(self, chat_id: str, dates: list[str], options: dict, results: dict[str, Any] | None = None) -> str:
+        """
+        작업을 만들고 날짜마다 대기 상태의 항목을 추가합니다.
+
+        Args:
+            results: 이미 결과가 있는 날짜의 {날짜: 결과} (완료 상태의 항목으로 바로 추가, 모두 있으면 작업도 바로 완료)
+
+        Returns:
+            str: 작업 ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        results = results or {}
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, chat_id, PENDING, json.dumps(options, ensure_ascii=False), len(dates) + len(results), now, now),
+            )
+            self._db.executemany(
+                "INSERT INTO job_items (job_id, date, status, updated_at) VALUES (?, ?, ?, ?)",
+                [(job_id, date, PENDING, now) for date in dates],
+            )
+            self._db.executemany(
+                "INSERT INTO job_items (job_id, date, status, result, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, date, DONE, json.dumps(result, ensure_ascii=False), now) for date, result in results.items()],
+            )
+            if not dates:
+                self._refresh_job_status(job_id, now)
+            self._db.execute("COMMIT")
+        return job_id
+
+    def claim_next(self, worker: str | None = None) -> dict | None:
+        """
+        가장 먼저 만들어진 작업의 대기 항목 하나를 실행 상태로 바꾸고 반환합니다. (없으면 None)
+        - 조회와 상태 변경을 쓰기 잠금(BEGIN IMMEDIATE) 안에서 해서 여러 워커 프로세스가 같은 항목을 가져가지 않음
+
+        Args:
+            worker: 항목을 가져가는 워커 ID (하트비트가 끊기면 다른 워커가 다시 대기 상태로 돌림)
+
+        Returns:
+            dict | None: {"job_id", "chat_id", "date", "options"}
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    """
+                    SELECT i.job_id, j.chat_id, i.date, j.options
+                    FROM job_items i JOIN jobs j ON j.job_id = i.job_id
+                    WHERE i.status = ? AND j.status IN (?, ?)
+                    ORDER BY j.created_at, i.date
+                    LIMIT 1
+                    """,
+                    (PENDING, PENDING, RUNNING),
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                job_id, chat_id, date, options = row
+                now = time.time()
+                self._db.execute(
+                    "UPDATE job_items SET status = ?, worker = ?, updated_at = ? WHERE job_id = ? AND date = ?",
+                    (RUNNING, worker, now, job_id, date),
+                )
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                    (RUNNING, now, job_id, PENDING),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return {"job_id": job_id, "chat_id": chat_id, "date": date, "options": json.loads(options)}
+
+    def finish_item(self, job_id: str, date: str, result: Any = None, error: str | None = None,
+                    worker: str | None = None) -> str:
+        """
+        항목의 결과(또는 오류)를 저장하고, 마지막 항목이었으면 작업 상태도 끝난 상태로 바꿉니다.
+        - worker 를 주면 그 워커가 아직 항목을 가지고 있을 때만 저장 (하트비트가 늦어 다른 워커에게 넘어간 항목은 건너뜀)
+
+        Returns:
+            str: 작업 상태
+        """
+        now = time.time()
+        result_json = None if result is None else json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "UPDATE job_items SET status = ?, result = ?, error = ?, worker = NULL, updated_at = ? "
+                    "WHERE job_id = ? AND date = ? AND status = ? AND (? IS NULL OR worker = ?)",
+                    (FAILED if error is not None else DONE, result_json, error, now, job_id, date, RUNNING,
+                     worker, worker),
+                )
+                status = self._refresh_job_status(job_id, now)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return status
+
+    def _refresh_job_status(self, job_id: str, now: float) -> str:
+        # 남은 항목이 없으면 작업을 끝난 상태로 (항목이 하나라도 성공했으면 done, 모두 실패면 failed)
+        status = self._db.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()[0]
+        if status in FINISHED_STATES:
+            return status
+        counts = dict(self._db.execute(
+            "SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status", (job_id,)
+        ).fetchall())
+        if counts.get(PENDING, 0) or counts.get(RUNNING, 0):
+            return status
+        status = DONE if counts.get(DONE, 0) or not counts.get(FAILED, 0) else FAILED
+        self._db.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?", (status, now, job_id))
+        return status
+
+    def heartbeat(self, worker: str) -> None:
+        """워커가 살아 있음을 기록합니다."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO job_workers VALUES (?, ?)", (worker, time.time()))
+
+    def retire(self, worker: str) -> None:
+        """워커를 목록에서 지웁니다. (남은 실행 중 항목은 다음 requeue_running 때 다시 대기 상태가 됨)"""
+        with self._lock:
+            self._db.execute("DELETE FROM job_workers WHERE worker = ?", (worker,))
+
+    def requeue_running(self, stale_after: float = 0.0) -> int:
+        """
+        실행 중 상태로 남은 항목(서버가 중간에 종료된 경우)을 다시 대기 상태로 돌립니다.
+
+        Args:
+            stale_after: 이 시간(초) 안에 하트비트를 보낸 워커의 항목은 그대로 둠 (0 이면 모든 실행 중 항목)
+
+        Returns:
+            int: 다시 대기 상태가 된 항목 수
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM job_workers WHERE heartbeat <= ?", (now - stale_after,))
+                cursor = self._db.execute(
+                    "UPDATE job_items SET status = ?, worker = NULL, updated_at = ? "
+                    "WHERE status = ? AND (worker IS NULL OR worker NOT IN (SELECT worker FROM job_workers))",
+                    (PENDING, now, RUNNING),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return cursor.rowcount
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        작업을 취소합니다. 아직 시작하지 않은 항목은 취소되고, 실행 중인 항목은 끝까지 실행됩니다.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status NOT IN (?, ?, ?)",
+                (CANCELLED, now, job_id, *FINISHED_STATES),
+            )
+            self._db.execute(
+                "UPDATE job_items SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                (CANCELLED, now, job_id, PENDING),
+            )
+            self._db.execute("COMMIT")
+        return cursor.rowcount > 0
+
+    def get(self, job_id: str, include_results: bool = True) -> dict | None:
+        """
+        작업 상태와 진행률, 날짜별 항목 상태(와 결과)를 반환합니다. (없는 작업이면 None)
+        """
+        with self._lock:
+            job = self._db.execute(
+                "SELECT chat_id, status, options, total, created_at, updated_at FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+            if job is None:
+                return None
+            items = self._db.execute(
+                "SELECT date, status, result, error FROM job_items WHERE job_id = ? ORDER BY date", (job_id,)
+            ).fetchall()
+
+        progress = {state: 0 for state in (PENDING, RUNNING, DONE, FAILED, CANCELLED)}
+        item_list = []
+        for date, status, result, error in items:
+            progress[status] += 1
+            item = {"date": date, "status": status}
+            if error is not None:
+                item["error"] = error
+            if include_results and result is not None:
+                item["result"] = json.loads(result)
+            item_list.append(item)
+
+        return {
+            "job_id": job_id,
+            "chat_id": job[0],
+            "status": job[1],
+            "options": json.loads(job[2]),
+            "total": job[3],
+            "progress": progress,
+            "created_at": job[4],
+            "updated_at": job[5],
+            "items": item_list,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM job_items GROUP BY status").fetchall()
+        return dict(rows)
+
+
+class JobRunner:
+    """
+    JobStore 의 대기 항목을 꺼내서 처리하는 asyncio 워커 묶음
+
+    Args:
+        store: 작업 저장소
+        handler: (chat_id, 날짜, 옵션)을 받아 결과 딕셔너리를 돌려주는 비동기 함수
+        workers: 동시에 처리할 항목 수
+        poll_interval: 새 작업 알림이 없을 때 큐를 다시 확인하는 간격(초) (하트비트 간격으로도 사용)
+        stale_after: 이 시간(초) 동안 하트비트가 없는 워커 프로세스의 실행 중 항목을 다시 대기 상태로 돌림
+    """
+
+    def __init__(self, store: JobStore, handler: Callable[[str, str, dict], Awaitable[dict]],
+                 workers: int = 2, poll_interval: float = 5.0, stale_after: float = 30.0):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.stale_after = max(stale_after, poll_interval * 3)
+        self.worker_id: str | None = None
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+
+    def start(self) -> int:
+        """
+        워커를 시작합니다. 이전 실행에서 끝나지 않은 항목(하트비트가 끊긴 워커의 항목)은 다시 대기 상태로 돌립니다.
+        - 워커 ID 는 프로세스마다 새로 만듦 (uvicorn --workers N 이면 프로세스마다 JobRunner 가 하나씩)
+
+        Returns:
+            int: 다시 대기 상태가 된 항목 수
+        """
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.store.heartbeat(self.worker_id)
+        requeued = self.store.requeue_running(self.stale_after)
+        self._tasks = [asyncio.create_task(self._work(), name=f"job-worker:{i}") for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat(), name="job-heartbeat"))
+        return requeued
+
+    async def stop(self) -> None:
+        # 실행 중이던 항목은 실행 상태로 남고, 다른 워커의 하트비트 / 다음 시작 때 다시 대기 상태가 됨
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.worker_id is not None:
+            await asyncio.to_thread(self.store.retire, self.worker_id)
+
+    def notify(self) -> None:
+        """새 작업이 추가되었음을 워커에게 알립니다."""
+        self._wakeup.set()
+
+    async def cancel(self, job_id: str) -> bool:
+        """작업을 취소하고 구독자에게 done 이벤트를 보냅니다."""
+        cancelled = await asyncio.to_thread(self.store.cancel, job_id)
+        if cancelled:
+            self._publish(job_id, "done", {"job_id": job_id, "status": CANCELLED})
+        return cancelled
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(job_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[job_id]
+
+    def _publish(self, job_id: str, event: str, payload: dict) -> None:
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait((event, payload))
+
+    async def _heartbeat(self) -> None:
+        # 살아 있음을 기록하고, 멈춘 다른 워커 프로세스의 항목을 다시 대기 상태로 돌림
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await asyncio.to_thread(self.store.heartbeat, self.worker_id)
+                requeued = await asyncio.to_thread(self.store.requeue_running, self.stale_after)
+            except Exception as e:
+                # 다른 워커가 쓰기 잠금을 오래 잡고 있으면(database is locked) 다음 주기에 다시 시도
+                print(f"🧵 워커 하트비트 기록 실패: {e}")
+                continue
+            if requeued:
+                print(f"🧵 응답이 없는 워커의 작업 항목 {requeued}개를 다시 대기열에 넣었습니다")
+                self.notify()
+
+    async def _work(self) -> None:
+        # 저장소 오류(database is locked 등)로 워커 태스크가 끝나면 서버를 다시 시작할 때까지 작업이 멈추므로,
+        # 오류는 기록만 하고 poll_interval 뒤 계속 실행
+        while True:
+            try:
+                claimed = await self._run_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"🧵 작업 워커 오류, {self.poll_interval:g}초 뒤 다시 시도: {e}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if not claimed:
+                # 할 일이 없으면 새 작업 알림(또는 poll_interval)까지 대기
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _run_next(self) -> bool:
+        """대기 항목 하나를 가져와 실행합니다. (가져올 항목이 없으면 False)"""
+        item = await asyncio.to_thread(self.store.claim_next, self.worker_id)
+        if item is None:
+            return False
+
+        job_id, date = item["job_id"], item["date"]
+        self._publish(job_id, "item_started", {"date": date})
+        try:
+            result = await self.handler(item["chat_id"], date, item["options"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e) or type(e).__name__
+            print(f"🧵 작업 {job_id} / {date} 실패: {detail}")
+            status = await self._finish(job_id, date, None, str(detail))
+            self._publish(job_id, "item", {"date": date, "status": FAILED, "error": str(detail)})
+        else:
+            status = await self._finish(job_id, date, result, None)
+            self._publish(job_id, "item", {"date": date, "status": DONE, "result": result})
+
+        if status in FINISHED_STATES:
+            self._publish(job_id, "done", {"job_id": job_id, "status": status})
+        return True
+
+    async def _finish(self, job_id: str, date: str, result: Any, error: str | None) -> str:
+        # 항목 결과는 잠금 대기(database is locked)로 실패해도 저장될 때까지 다시 시도
+        # (저장하지 못하면 이 워커가 살아 있는 동안 항목이 실행 상태로 남음)
+        while True:
+            try:
+                return await asyncio.to_thread(self.store.finish_item, job_id, date, result, error, self.worker_id)
+            except sqlite3.OperationalError as e:
+                print(f"🧵 작업 {job_id} / {date} 결과 저장 실패, {self.poll_interval:g}초 뒤 다시 시도: {e}")
+                await asyncio.sleep(self.poll_interval)
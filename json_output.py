@@ -0,0 +1,361 @@
+# LLM 응답 JSON 처리 모듈
+# - 단계별 출력 스키마를 OpenAI response_format(json_schema, strict) 으로 요청하기 위한 인자 생성
+# - 모든 단계의 응답을 extract_json 하나로 파싱
+#   코드 펜스(```json), 앞뒤 설명 문장, 중간에 잘린 응답, 끝 쉼표, 빠진 여는 중괄호를 처리
+# - 파싱한 값은 스키마에 맞춰 보정 (빠진 키는 기본값, "80%" → 80, 문자열 → 배열, enum 밖의 값 → 기본값)
+#   JSON 이 전혀 없는 응답도 스키마가 문자열 하나 / 배열 하나짜리면 그 값으로 감싸서 살림
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+try:
+    import orjson  # 있으면 빠른 경로(정상 JSON)에 사용
+except ImportError:
+    orjson = None
+
+# 응답 형식 요청 방식
+# - schema: json_schema + strict (모델이 스키마에 맞는 JSON 만 생성)
+# - json_object: JSON 모드 (JSON 이라는 것만 보장, 키는 프롬프트로 지정)
+# - off: response_format 을 보내지 않음 (프롬프트 지시만 사용)
+JSON_MODES = ("schema", "json_object", "off")
+
+# 스키마를 벗어난 응답으로 보는 보정 종류 (나머지는 펜스 / 설명 문장 같은 겉모양 보정)
+SCHEMA_REPAIRS = frozenset({"truncated", "plain_text", "wrapped", "missing_key", "type", "enum"})
+
+_FENCE = re.compile(r"```[ \t]*(?:json|JSON)?[ \t]*\n?(.*?)(?:```|$)", re.DOTALL)
+_MISSING_BRACE = re.compile(r'\s*"[^"\n]+"\s*:')
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_LIST_SPLIT = re.compile(r"\s*(?:[,、\n]|^\s*[-*•]\s*)\s*", re.MULTILINE)
+_DECODER = json.JSONDecoder(strict=False)  # 문자열 안의 줄바꿈 같은 제어 문자 허용
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONOutputError(ValueError):
+    """응답에서 스키마에 맞는 JSON 을 전혀 찾지 못한 경우"""
+
+
+@dataclass
+class ParsedOutput:
+    """
+    extract_json 결과
+
+    Args:
+        value: 스키마에 맞춰 보정된 값
+        repairs: 적용한 보정 종류 (fence / prefix / suffix / missing_brace / trailing_comma / truncated /
+                 plain_text / wrapped / missing_key / type / enum / extra_key)
+    """
+    value: Any
+    repairs: list[str] = field(default_factory=list)
+
+    @property
+    def conforms(self) -> bool:
+        """겉모양 보정만 했고 값 자체는 스키마에 맞았는지"""
+        return not SCHEMA_REPAIRS.intersection(self.repairs)
+
+
+def object_schema(properties: dict) -> dict:
+    """모든 키가 필수이고 다른 키는 허용하지 않는 object 스키마 (strict 모드 요구사항)"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def response_format(name: str, schema: dict, mode: str = "schema") -> dict | None:
+    """
+    chat.completions.create 의 response_format 인자를 만듭니다. (mode 가 off 면 None)
+    """
+    if mode == "schema":
+        return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+    if mode == "json_object":
+        return {"type": "json_object"}
+    return None
+
+
+def _loads(text: str) -> Any:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _strip_fence(text: str, repairs: list[str]) -> str:
+    # JSON 이 들어 있는 첫 번째 코드 펜스 내용 (닫는 ``` 이 잘려 없어도 처리)
+    for match in _FENCE.finditer(text):
+        body = match.group(1).strip()
+        if "{" in body or "[" in body:
+            repairs.append("fence")
+            return body
+    return text
+
+
+def _scan(text: str, start: int) -> tuple[int | None, list[tuple[int, tuple[str, ...]]], tuple[str, ...], bool]:
+    """
+    start 의 여는 괄호부터 문자열 / 괄호 짝을 따라가며 읽습니다.
+
+    Returns:
+        (닫히는 위치 다음 인덱스 또는 None, [(잘라도 되는 위치, 그 위치의 열린 괄호들)], 끝에서 열린 괄호들, 문자열 안에서 끝났는지)
+    """
+    stack: list[str] = []
+    cuts: list[tuple[int, tuple[str, ...]]] = []
+    in_string = escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(ch)
+            cuts.append((i + 1, tuple(stack)))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return i + 1, cuts, (), False
+            cuts.append((i + 1, tuple(stack)))
+        elif ch == ",":
+            cuts.append((i, tuple(stack)))
+    return None, cuts, tuple(stack), in_string
+
+
+def _close(text: str, stack: tuple[str, ...]) -> str:
+    return text + "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+def _remove_trailing_commas(text: str) -> str:
+    # 문자열 밖의 ", }" / ", ]" 에서 쉼표 제거
+    out = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            out.append(ch)
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "}]":
+            j = len(out) - 1
+            while j >= 0 and out[j].isspace():
+                j -= 1
+            if j >= 0 and out[j] == ",":
+                del out[j]
+        out.append(ch)
+    return "".join(out)
+
+
+def _decode_truncated(text: str, stack: tuple[str, ...], in_string: bool,
+                      cuts: list[tuple[int, tuple[str, ...]]]) -> Any:
+    # 잘린 응답: 열린 문자열 / 괄호를 닫아보고, 안 되면 마지막으로 완성된 값 뒤에서 잘라 닫음
+    if in_string:
+        candidate = text[:-1] if text.endswith("\\") else text
+        try:
+            return _DECODER.decode(_close(candidate + '"', stack))
+        except ValueError:
+            pass
+    for position, open_stack in reversed(cuts):
+        try:
+            return _DECODER.decode(_remove_trailing_commas(_close(text[:position], open_stack)))
+        except ValueError:
+            continue
+    raise JSONOutputError("잘린 응답에서 완성된 값을 찾지 못했습니다")
+
+
+def _decode(text: str, repairs: list[str]) -> Any:
+    text = text.strip().lstrip("﻿")
+    try:
+        return _loads(text)  # 정상 응답은 여기서 끝남
+    except ValueError:
+        pass
+
+    text = _strip_fence(text, repairs)
+    if _MISSING_BRACE.match(text):  # 여는 중괄호만 빠진 응답 ('"상황설명": "..." }')
+        repairs.append("missing_brace")
+        return _decode("{" + text, repairs)
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise JSONOutputError("응답에 JSON 이 없습니다")
+    start = min(starts)
+    if text[:start].strip():
+        repairs.append("prefix")
+
+    end, cuts, stack, in_string = _scan(text, start)
+    if end is None:
+        repairs.append("truncated")
+        return _decode_truncated(text[start:], stack, in_string, [(p - start, s) for p, s in cuts])
+    if text[end:].strip():
+        repairs.append("suffix")
+    body = text[start:end]
+    try:
+        return _DECODER.decode(body)
+    except ValueError:
+        fixed = _remove_trailing_commas(body)
+        if fixed != body:
+            repairs.append("trailing_comma")
+        try:
+            return _DECODER.decode(fixed)
+        except ValueError as e:
+            raise JSONOutputError(f"JSON 파싱 실패: {e}") from e
+
+
+def _default_for(schema: dict) -> Any:
+    # enum 은 마지막 값이 기본값 (중립 / none 을 마지막에 둠)
+    kind = schema.get("type")
+    if "enum" in schema:
+        return schema["enum"][-1]
+    if kind == "object":
+        return {key: _default_for(sub) for key, sub in schema.get("properties", {}).items()}
+    return {"string": "", "integer": 0, "number": 0.0, "boolean": False, "array": []}.get(kind)
+
+
+def _enum_key(text: str) -> str:
+    # enum 비교용: 대소문자 / 공백 / 밑줄 / 따옴표 무시 ('감정 충돌' == '감정_충돌')
+    return re.sub(r"[\s_\"']", "", text).lower()
+
+
+def _single_property(schema: dict, kind: str) -> str | None:
+    # 키가 하나뿐이고 그 타입이 kind 인 object 스키마면 그 키 이름
+    properties = schema.get("properties") or {}
+    if schema.get("type") == "object" and len(properties) == 1:
+        key, sub = next(iter(properties.items()))
+        if sub.get("type") == kind:
+            return key
+    return None
+
+
+def _split_list(text: str) -> list[str]:
+    return [item.strip().strip("\"'") for item in _LIST_SPLIT.split(text.strip()) if item.strip().strip("\"'")]
+
+
+def conform(value: Any, schema: dict, repairs: list[str], defaults: dict | None = None) -> Any:
+    """
+    값을 스키마 타입에 맞춥니다. (맞출 수 없으면 기본값, 적용한 보정은 repairs 에 추가)
+
+    Args:
+        defaults: object 스키마의 빠진 키 / 잘못된 값에 쓸 기본값 {키: 값} (없으면 타입별 기본값)
+    """
+    kind = schema.get("type")
+    if kind == "object":
+        properties = schema.get("properties", {})
+        if not isinstance(value, dict):
+            key = _single_property(schema, "array" if isinstance(value, list) else "string")
+            if key is None or not isinstance(value, (list, str)):
+                repairs.append("type")
+                value = {}
+            else:
+                repairs.append("wrapped")
+                value = {key: value}
+        result = {}
+        for key, sub in properties.items():
+            fallback = (defaults or {}).get(key)
+            if key not in value:
+                repairs.append("missing_key")
+                result[key] = fallback if fallback is not None else _default_for(sub)
+                continue
+            before = len(repairs)
+            result[key] = conform(value[key], sub, repairs)
+            if fallback is not None and "enum" in repairs[before:]:
+                result[key] = fallback
+        if schema.get("additionalProperties") is False and set(value) - set(properties):
+            repairs.append("extra_key")
+        return result
+
+    if "enum" in schema:
+        if value in schema["enum"]:
+            return value
+        text = _enum_key(str(value))
+        for option in schema["enum"]:
+            if text == _enum_key(str(option)):
+                repairs.append("type")
+                return option
+        repairs.append("enum")
+        return _default_for(schema)
+
+    if kind == "array":
+        if isinstance(value, str):
+            repairs.append("type")
+            value = _split_list(value)
+        elif not isinstance(value, list):
+            repairs.append("type")
+            value = [] if value is None else [value]
+        item_schema = schema.get("items")
+        return [conform(item, item_schema, repairs) for item in value] if item_schema else value
+
+    if kind == "string":
+        if isinstance(value, str):
+            return value
+        repairs.append("type")
+        if value is None:
+            return ""
+        if isinstance(value, list):
+            return " ".join(str(item) for item in value)
+        return json.dumps(value, ensure_ascii=False) if isinstance(value, dict) else str(value)
+
+    if kind in ("integer", "number"):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            repairs.append("type")
+            match = _NUMBER.search(str(value)) if isinstance(value, str) else None
+            value = float(match.group()) if match else 0
+        if kind == "integer" and not isinstance(value, int):
+            if value != int(value):
+                repairs.append("type")
+            value = int(round(value))
+        return value
+
+    if kind == "boolean":
+        if isinstance(value, bool):
+            return value
+        repairs.append("type")
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "yes", "y", "1", "예", "네", "있음")
+        return bool(value)
+
+    return value
+
+
+def extract_json(text: str, schema: dict | None = None, defaults: dict | None = None) -> ParsedOutput:
+    """
+    LLM 응답 텍스트에서 JSON 값을 꺼내고 스키마에 맞춰 보정합니다.
+
+    Args:
+        text: 응답 텍스트
+        schema: 출력 JSON 스키마 (None 이면 파싱만)
+        defaults: object 스키마의 빠진 키에 넣을 기본값
+
+    Returns:
+        ParsedOutput: 값과 적용한 보정 목록
+
+    Raises:
+        JSONOutputError: JSON 을 찾지 못했고 스키마로도 감쌀 수 없는 경우
+    """
+    repairs: list[str] = []
+    try:
+        value = _decode(text or "", repairs)
+    except JSONOutputError:
+        # JSON 이 없는 일반 텍스트 응답: 문자열 하나 / 배열 하나짜리 스키마면 그 값으로 사용
+        stripped = (text or "").strip()
+        if schema is None or not stripped:
+            raise
+        key = _single_property(schema, "string")
+        if key is not None:
+            return ParsedOutput({key: stripped}, ["plain_text"])
+        key = _single_property(schema, "array")
+        if key is not None and _split_list(stripped):
+            return ParsedOutput(conform({key: _split_list(stripped)}, schema, repairs), ["plain_text", *repairs])
+        raise
+    if schema is not None:
+        value = conform(value, schema, repairs, defaults)
+    return ParsedOutput(value, repairs)
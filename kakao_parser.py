@@ -0,0 +1,212 @@
+# 카카오톡 내보내기 파일 파싱 엔진
+# - 업로드 파일 전체를 메모리에 올리지 않고, 일정 크기씩 읽어서 UTF-8 을 점진적으로 디코딩
+# - 줄마다 파이썬에서 정규식을 여러 번 호출하지 않고, 여러 줄이 담긴 텍스트 블록에
+#   "메시지 줄 | 날짜 줄" 을 한 번에 분류하는 정규식을 findall 로 적용 (반복은 C 레벨에서 처리됨)
+import codecs
+import datetime
+import re
+from collections import deque
+from typing import BinaryIO, Iterable, Iterator
+
+# 업로드 파일을 읽는 기본 청크 크기 (64KB)
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# 대화 내용에서 제외할 시스템 메시지 / 불필요한 항목 (예: [사진], 이모티콘, 입장/퇴장 알림)
+SYSTEM_MESSAGE_MARKERS = ("[사진]", "이모티콘", "님이 입장", "님이 나갔")
+
+# 한 줄을 한 번에 분류하는 정규식 (줄 시작에 고정, MULTILINE)
+# - 메시지 줄: "DD/MM/YY HH:MM, 이름 : 메시지" → 1번 그룹에 메시지 내용
+# - 날짜 줄: "2025년 1월 20일" 또는 "1월 20일" 이 들어간 줄 (메시지 줄 제외) → 2~4번 그룹에 연/월/일
+# - 나머지 줄은 매칭되지 않고 정규식 엔진 안에서 건너뜀
+_LINE_PATTERN = re.compile(
+    r"^[ \t]*(?:"
+    r"\d\d/\d\d/\d\d[ \t]+\d{1,2}:\d\d,[ \t]+[^:\n]*:([^\n]*)"
+    r"|(?!\d\d/\d\d/\d\d[ \t])[^\n]*?(?:(\d{4})년[ \t]*)?(\d{1,2})월[ \t]*(\d{1,2})일[^\n]*"
+    r")$",
+    re.MULTILINE,
+)
+# 날짜와 무관하게 메시지 내용만 필요할 때 쓰는 정규식 (_LINE_PATTERN 의 메시지 부분과 동일)
+_MESSAGE_PATTERN = re.compile(r"^[ \t]*\d\d/\d\d/\d\d[ \t]+\d{1,2}:\d\d,[ \t]+[^:\n]*:([^\n]*)$", re.MULTILINE)
+
+
+def iter_file_blocks(fileobj: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    바이너리 파일 객체에서 청크 단위로 읽어, 완전한 줄들로만 이루어진 텍스트 블록을 돌려줍니다.
+
+    Args:
+        fileobj: 바이너리 모드 파일 객체 (예: UploadFile.file)
+        chunk_size: 한 번에 읽을 바이트 수
+
+    Returns:
+        Iterator[str]: 줄 단위로 끊긴 텍스트 블록 (줄바꿈은 "\\n" 으로 통일)
+    """
+    # 청크 경계에서 잘린 멀티바이트 문자는 다음 청크와 합쳐서 디코딩됨 (잘못된 바이트는 무시)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    pending = ""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        text = pending + decoder.decode(chunk)
+        if "\r" in text:
+            # "\r\n" 이 청크 경계에서 나뉘는 경우를 위해 끝의 "\r" 은 다음 청크로 넘김
+            keep_cr = text.endswith("\r")
+            text = text[:-1] if keep_cr else text
+            text = text.replace("\r\n", "\n").replace("\r", "\n") + ("\r" if keep_cr else "")
+        # 마지막 줄이 줄바꿈으로 끝나지 않았으면 다음 청크와 이어 붙이기 위해 남겨둠
+        cut = text.rfind("\n") + 1
+        pending = text[cut:]
+        if cut:
+            yield text[:cut]
+    pending += decoder.decode(b"", final=True)
+    pending = pending.replace("\r\n", "\n").replace("\r", "\n")
+    if pending:
+        yield pending
+
+
+def iter_file_lines(fileobj: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    바이너리 파일 객체에서 청크 단위로 읽어 한 줄씩 돌려줍니다. (줄바꿈 문자 제거)
+    """
+    for block in iter_file_blocks(fileobj, chunk_size):
+        yield from block.splitlines()
+
+
+def iter_text_blocks(source: str | Iterable[str], block_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    문자열 전체 또는 줄(혹은 줄 단위로 끊긴 블록) 이터러블을 일정 크기의 텍스트 블록으로 묶어줍니다.
+
+    Args:
+        source: 파일 전체 문자열, 또는 한 줄씩/여러 줄씩 담긴 문자열 이터러블
+        block_size: 블록 하나의 대략적인 글자 수
+    """
+    if isinstance(source, str):
+        start = 0
+        while start < len(source):
+            end = source.find("\n", start + block_size)
+            end = len(source) if end == -1 else end + 1
+            yield source[start:end]
+            start = end
+        return
+
+    batch, size = [], 0
+    for item in source:
+        batch.append(item)
+        size += len(item)
+        if size >= block_size:
+            yield "\n".join(batch)
+            batch, size = [], 0
+    if batch:
+        yield "\n".join(batch)
+
+
+def iter_record_blocks(source: str | Iterable[str]) -> Iterator[list[tuple[str, str, str, str]]]:
+    """
+    텍스트 블록마다 분류된 줄 목록을 돌려줍니다.
+
+    Returns:
+        Iterator[list]: 블록별 (메시지 내용, 연, 월, 일) 튜플 목록
+            - 메시지 줄이면 일(4번째 값)이 빈 문자열
+            - 날짜 줄이면 일이 채워져 있음 (연도가 없는 날짜 줄이면 연은 빈 문자열)
+    """
+    findall = _LINE_PATTERN.findall
+    for block in iter_text_blocks(source):
+        yield findall(block)
+
+
+def collect_recent_messages(source: str | Iterable[str], limit: int = 30) -> list[str]:
+    """
+    시스템 메시지를 제외한 대화 메시지 중 마지막 limit 개를 반환합니다. (날짜와 무관)
+    """
+    recent = deque(maxlen=limit)
+    findall = _MESSAGE_PATTERN.findall
+    for block in iter_text_blocks(source):
+        # 블록마다 뒤에서부터 유효한 메시지를 limit 개까지만 골라서 추가 (앞쪽 메시지는 어차피 밀려나므로 건너뜀)
+        picked = []
+        for text in reversed(findall(block)):
+            # 시스템 메시지 필터 (SYSTEM_MESSAGE_MARKERS 와 같은 내용 - 함수 호출 비용을 피하려고 직접 비교)
+            if not ("[사진]" in text or "이모티콘" in text or "님이 입장" in text or "님이 나갔" in text):
+                picked.append(text.strip())
+                if len(picked) == limit:
+                    break
+        recent.extend(reversed(picked))
+    return list(recent)
+
+
+def collect_messages_by_day(source: str | Iterable[str], target_day: str | None = None) -> dict[str, list[str]]:
+    """
+    "20일" 형태의 날짜(일) 키로 메시지를 묶어 반환합니다.
+
+    Args:
+        source: 파일 전체 문자열 또는 줄/블록 이터러블
+        target_day: 지정하면 해당 날짜의 메시지만 보관 (다른 날짜는 빈 목록)
+    """
+    chat_by_date: dict[str, list[str]] = {}
+    current = None  # 현재 날짜의 메시지 목록 (보관하지 않는 날짜면 None)
+    for records in iter_record_blocks(source):
+        for text, _, _, day in records:
+            if day:
+                key = day + "일"
+                bucket = chat_by_date.setdefault(key, [])
+                current = bucket if target_day is None or key == target_day else None
+            elif current is not None and not ("[사진]" in text or "이모티콘" in text or "님이 입장" in text or "님이 나갔" in text):
+                current.append(text.strip())
+    return chat_by_date
+
+
+def iter_dated_messages(source: str | Iterable[str], default_year: int | None = None) -> Iterator[tuple[str, str | None]]:
+    """
+    실제 연-월-일 날짜("2025-01-20")와 함께 메시지를 하나씩 돌려줍니다.
+    - "20일" 처럼 일(day)만 쓰면 서로 다른 달의 같은 날짜가 합쳐지므로, 날짜 줄의 연/월/일을 모두 사용
+    - 연도가 없는 날짜 줄은 직전 날짜 줄의 연도를 이어받고, 월이 줄어들면(12월 → 1월) 다음 해로 넘어간 것으로 봄
+    - 첫 날짜 줄 이전의 메시지는 날짜를 알 수 없으므로 건너뜀 (extract_chat_by_date 와 동일)
+
+    Args:
+        source: 파일 전체 문자열 또는 줄/블록 이터러블
+        default_year: 연도가 한 번도 나오지 않았을 때 사용할 연도 (None 이면 올해)
+
+    Returns:
+        Iterator[tuple]: 날짜 줄이면 (날짜, None), 메시지 줄이면 (날짜, 메시지 내용)
+    """
+    if default_year is None:
+        default_year = datetime.date.today().year
+    year, last_month, current = None, None, None
+    for records in iter_record_blocks(source):
+        for text, year_text, month_text, day in records:
+            if day:
+                month = int(month_text)
+                if year_text:
+                    year = int(year_text)
+                elif year is None:
+                    year = default_year
+                elif last_month is not None and month < last_month:
+                    year += 1
+                last_month = month
+                try:
+                    current = datetime.date(year, month, int(day)).isoformat()
+                except ValueError:
+                    current = None  # 존재하지 않는 날짜 (예: 2월 30일) 는 날짜 줄로 보지 않음
+                    continue
+                yield current, None
+            elif current is not None and not ("[사진]" in text or "이모티콘" in text or "님이 입장" in text or "님이 나갔" in text):
+                yield current, text.strip()
+
+
+def collect_messages_by_date(source: str | Iterable[str], start_date: str | None = None,
+                             end_date: str | None = None) -> dict[str, list[str]]:
+    """
+    "2025-01-20" 형태의 날짜 키로 메시지를 묶어 반환합니다. (iter_dated_messages 기반)
+
+    Args:
+        source: 파일 전체 문자열 또는 줄/블록 이터러블
+        start_date: 이 날짜 이전은 제외 ("YYYY-MM-DD", None 이면 처음부터)
+        end_date: 이 날짜 이후는 제외 ("YYYY-MM-DD", None 이면 끝까지)
+    """
+    chat_by_date: dict[str, list[str]] = {}
+    for date, text in iter_dated_messages(source):
+        if (start_date and date < start_date) or (end_date and date > end_date):
+            continue
+        bucket = chat_by_date.setdefault(date, [])
+        if text is not None:
+            bucket.append(text)
+    return chat_by_date
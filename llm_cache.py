@@ -0,0 +1,247 @@
+# OpenAI 응답 캐시 모듈
+# - 모델 + 메시지 + 샘플링 파라미터를 해시한 값을 키로 사용 (내용 기반 캐시)
+# - 1차: 프로세스 메모리 LRU / 2차: 재시작 후에도 남는 SQLite 디스크 캐시
+# - TTL(만료 시간)과 최대 개수 기준으로 오래된 항목을 정리
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from concurrency import connect_sqlite
+
+# 캐시 키에 포함하지 않는 파라미터 (응답 내용에 영향이 없거나 전송 방식만 바꾸는 값)
+_NON_KEY_PARAMS = {"stream", "stream_options", "timeout", "extra_headers", "user"}
+
+_MISS = object()   # 캐시에 없음 표시 (저장된 값이 None 일 수도 있어 구분용)
+
+# 현재 실행 흐름에서 캐시를 건너뛸지 여부
+# - 일관성 테스트처럼 매번 새 응답이 필요한 경우 bypass_cache() 로 감싸서 사용
+# - asyncio 태스크는 생성 시점의 컨텍스트를 복사하므로 파이프라인의 모든 단계에 적용됨
+_cache_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_cache():
+    token = _cache_bypass.set(True)
+    try:
+        yield
+    finally:
+        _cache_bypass.reset(token)
+
+
+def is_cache_bypassed() -> bool:
+    return _cache_bypass.get()
+
+
+def make_cache_key(params: dict) -> str:
+    """
+    chat.completions.create 인자로 캐시 키를 만듭니다.
+
+    Args:
+        params: model, messages, temperature 등 API 호출 인자
+
+    Returns:
+        str: SHA-256 해시 문자열
+    """
+    key_params = {k: v for k, v in params.items() if k not in _NON_KEY_PARAMS}
+    raw = json.dumps(key_params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    메모리 LRU + SQLite 2단계 캐시
+
+    Args:
+        max_entries: 메모리에 보관할 최대 항목 수
+        ttl: 항목 유효 시간(초). 0 이하이면 만료 없음
+        db_path: SQLite 파일 경로. None 이면 디스크 캐시 사용 안 함
+        disk_max_entries: 디스크에 보관할 최대 항목 수 (넘으면 오래 안 쓴 항목부터 삭제)
+    """
+
+    _PRUNE_EVERY = 100  # 디스크 정리는 저장 100번마다 한 번씩
+
+    def __init__(self, max_entries: int = 512, ttl: float = 7 * 24 * 3600,
+                 db_path: str | None = None, disk_max_entries: int = 20000):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.disk_max_entries = disk_max_entries
+        self._memory: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()      # 메모리 LRU / 카운터용 (짧게만 잡음)
+        self._db_lock = threading.Lock()   # SQLite 연결용 (디스크 대기 중에도 메모리 조회는 막지 않도록 분리)
+        self._db: sqlite3.Connection | None = None
+        self._sets_since_prune = 0
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "bypassed": 0,
+            "evictions": 0,
+            "expired": 0,
+            "stale_hits": 0,
+        }
+        if db_path:
+            self._db = connect_sqlite(db_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache(last_access)")
+
+    def _expires_at(self) -> float | None:
+        return time.time() + self.ttl if self.ttl > 0 else None
+
+    def _remember(self, key: str, expires_at: float | None, value: Any):
+        # 메모리 LRU 에 넣고, 최대 개수를 넘으면 가장 오래 안 쓴 항목 제거
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _get_memory(self, key: str, now: float, allow_stale: bool) -> Any:
+        # 메모리 LRU 만 확인 (잠금이 짧아 이벤트 루프에서 바로 호출해도 됨). 없으면 _MISS
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return _MISS
+            expires_at, value = item
+            if expires_at is None or expires_at > now:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return value
+            if allow_stale:
+                self.counters["stale_hits"] += 1
+                return value
+            self.counters["expired"] += 1
+            return _MISS
+
+    def _get_disk(self, key: str, now: float, allow_stale: bool) -> Any:
+        # SQLite 조회 (다른 워커가 쓰기 잠금을 잡고 있으면 busy_timeout 만큼 기다릴 수 있으므로 스레드에서 호출)
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return _MISS
+            value_json, expires_at = row
+            fresh = expires_at is None or expires_at > now
+            if fresh:
+                self._db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        with self._lock:
+            if fresh:
+                value = json.loads(value_json)
+                self._remember(key, expires_at, value)
+                self.counters["disk_hits"] += 1
+                return value
+            if allow_stale:
+                self.counters["stale_hits"] += 1
+                return json.loads(value_json)
+            # 만료된 항목은 바로 지우지 않고 정리(_prune_disk) 때 삭제 (그 전까지는 장애 시 대체 응답으로 사용 가능)
+            self.counters["expired"] += 1
+            return _MISS
+
+    def _finish_get(self, value: Any) -> Any | None:
+        if value is _MISS:
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+        return value
+
+    def get(self, key: str, allow_stale: bool = False) -> Any | None:
+        """
+        캐시된 응답을 반환합니다. 없거나 만료되었으면 None
+        (디스크 캐시까지 동기로 조회하므로 이벤트 루프에서는 aget 사용)
+
+        Args:
+            allow_stale: True 이면 만료된 항목도 반환 (OpenAI 장애 시 대체 응답용, 아직 정리되지 않은 항목만)
+        """
+        now = time.time()
+        value = self._get_memory(key, now, allow_stale)
+        if value is _MISS and self._db is not None:
+            value = self._get_disk(key, now, allow_stale)
+        return self._finish_get(value)
+
+    async def aget(self, key: str, allow_stale: bool = False) -> Any | None:
+        """
+        get 의 비동기 버전. 메모리 LRU 는 바로 확인하고, 디스크 캐시 조회만 스레드에서 실행합니다.
+        """
+        now = time.time()
+        value = self._get_memory(key, now, allow_stale)
+        if value is _MISS and self._db is not None:
+            value = await asyncio.to_thread(self._get_disk, key, now, allow_stale)
+        return self._finish_get(value)
+
+    def _set_memory(self, key: str, value: Any) -> float | None:
+        expires_at = self._expires_at()
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.counters["stores"] += 1
+        return expires_at
+
+    def _write_disk(self, key: str, value: Any, expires_at: float | None):
+        # 디스크에 기록하고, 저장 _PRUNE_EVERY 번마다 정리
+        value_json = json.dumps(value, ensure_ascii=False)
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value_json, expires_at, time.time()),
+            )
+            self._sets_since_prune += 1
+            if self._sets_since_prune >= self._PRUNE_EVERY:
+                self._prune_disk()
+
+    def set(self, key: str, value: Any):
+        expires_at = self._set_memory(key, value)
+        if self._db is not None:
+            self._write_disk(key, value, expires_at)
+
+    async def aset(self, key: str, value: Any):
+        """
+        set 의 비동기 버전. 메모리 LRU 에는 바로 넣고, 디스크 기록 / 정리는 스레드에서 실행합니다.
+        """
+        expires_at = self._set_memory(key, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_disk, key, value, expires_at)
+
+    def _prune_disk(self):
+        # 만료된 항목 삭제 후, 최대 개수를 넘는 만큼 오래 안 쓴 항목부터 삭제 (_db_lock 안에서 호출)
+        self._sets_since_prune = 0
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,),
+        )
+
+    def record_bypass(self):
+        self.counters["bypassed"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        lookups = hits + self.counters["misses"]
+        disk_entries = None
+        if self._db is not None:
+            with self._db_lock:
+                disk_entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": disk_entries,
+        }
@@ -0,0 +1,345 @@
+# OpenAI 호출 없이 서버 안에서 바로 계산하는 감정 분석 / 키워드 추출 모듈
+# - 한글 토큰화: 조사와 '하다' 활용 어미를 떼어 명사 후보를 만들고, 용언 어미로 끝나는 토큰과 불용어는 제외
+# - 키워드: TF-IDF (문서 빈도는 저장된 과거 대화의 날짜별 대화를 문서 하나로 보고 미리 계산해서 JSON 으로 저장)
+# - 감정: 긍정 / 부정 어휘 사전 + 부정어(안, 못, 않, 없) / 강조어(너무, 진짜 …) / 이모티콘(ㅋㅋ, ㅠㅠ) 가중치
+# - 둘 다 CPU 에서 수 ms 안에 끝나므로 요청마다 LLM 대신 선택해서 사용할 수 있음 (DiaryRequest.analysis = "local")
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Iterable
+
+_HANGUL_WORD = re.compile(r"[가-힣]+")
+_LAUGH = re.compile(r"[ㅋㅎ]{2,}")
+_CRY = re.compile(r"[ㅠㅜ]{2,}")
+
+# 명사 뒤에 붙는 조사 (긴 것부터 확인)
+_PARTICLES = sorted([
+    "에서는", "에게서", "으로는", "으로서", "으로써", "이라고", "이라서", "이랑은", "까지는", "부터는",
+    "에서", "에게", "한테", "께서", "까지", "부터", "보다", "처럼", "같이", "으로", "이랑", "하고", "이나", "이라",
+    "만으로", "만큼", "라도", "이야", "이라도",
+    "랑", "와", "과", "은", "는", "이", "가", "을", "를", "에", "의", "도", "만", "로", "나", "야", "라",
+], key=len, reverse=True)
+
+# '공부했어', '정리하는' 처럼 명사 + 하다 활용형은 명사만 남김
+_HADA_ENDINGS = sorted([
+    "했는데", "했어요", "했습니다", "했었어", "하는데", "해야지", "하려고", "했어", "했다", "했네", "했지", "해서", "해요",
+    "하고", "하는", "하면", "하기", "하자", "할게", "할까", "해도", "해야", "합니다", "한다", "했", "해", "한", "할", "함",
+    "해주심", "해주셨어", "해줬어", "해줘서", "됐어", "됐다", "되는", "되어", "돼서", "돼", "됨", "된",
+], key=len, reverse=True)
+
+# 이 어미로 끝나는 토큰은 용언(동사 / 형용사)으로 보고 키워드 후보에서 제외
+_PREDICATE_ENDINGS = (
+    "었어", "았어", "였어", "었다", "았다", "였다", "는데", "은데", "네요", "어요", "아요", "세요", "거든", "잖아",
+    "지만", "니까", "는다", "ㄴ다", "겠다", "겠어", "어서", "아서", "려고", "면서", "다가", "자고", "래요", "대요",
+    "였네", "었네", "았네", "구나", "군요", "으러", "보자", "봐", "었던", "았던", "던", "면", "며", "려", "져", "워",
+    "진", "린", "든", "운", "온", "간", "심", "러", "다", "요", "지", "고", "서", "네", "죠", "게", "니", "까", "데", "냐", "래", "어", "아",
+)
+
+STOPWORDS = frozenset("""
+나 너 저 우리 저희 너희 그 이 저것 그것 이것 거 것 게 뭐 왜 어디 언제 누구 무엇 어떻게
+오늘 내일 어제 모레 지금 이제 아까 나중 요즘 항상 계속 다시 먼저 이번 다음 저번 하루 시간
+그냥 진짜 정말 너무 완전 엄청 약간 조금 많이 좀 잘 더 또 꼭 막 딱 다들 모두 같이 혼자
+근데 그런데 그래서 그리고 그러면 그럼 하지만 그래도 아니 응 네 예 아 어 음 헐 오 와 우와 대박
+사진 이모티콘 동영상 파일 삭제된 메시지 입장 퇴장 님이 샵검색 보이스톡 페이스톡 통화
+생각 느낌 마음 기분 정도 부분 경우 때문 때 끝 수 줄 데 전 후 앞 뒤 위 밖 중 하나 두 세 번 개 분 명 사람 얘기 이야기 내용 일기
+오늘은 오늘도 하루를 감정 표현 상황 설명 위로 제안 공감 인정
+""".split())
+
+# 감정 어휘 사전: 어간(토큰 앞부분) → 가중치
+POSITIVE_LEXICON = {
+    "좋": 1.0, "행복": 1.5, "기쁘": 1.5, "기뻐": 1.5, "신나": 1.3, "신난": 1.3, "재밌": 1.2, "재미있": 1.2, "즐거": 1.3,
+    "즐겁": 1.3, "웃": 0.8, "감사": 1.2, "고마": 1.2, "사랑": 1.4, "최고": 1.4, "뿌듯": 1.4, "설레": 1.2, "설렘": 1.2,
+    "다행": 1.0, "맛있": 1.0, "칭찬": 1.2, "축하": 1.3, "성공": 1.2, "편안": 1.0, "편하": 0.8, "만족": 1.2, "기대": 0.8,
+    "괜찮": 0.6, "멋지": 1.0, "멋있": 1.0, "귀엽": 0.8, "상쾌": 1.0, "후련": 1.0, "든든": 1.0, "힐링": 1.2, "합격": 1.5,
+}
+NEGATIVE_LEXICON = {
+    "슬프": 1.5, "슬퍼": 1.5, "힘들": 1.3, "힘든": 1.3, "짜증": 1.4, "화나": 1.4, "화났": 1.4, "우울": 1.5, "피곤": 1.0,
+    "아프": 1.1, "아파": 1.1, "싫": 1.2, "걱정": 1.0, "속상": 1.4, "답답": 1.2, "불안": 1.2, "무섭": 1.1, "외롭": 1.3,
+    "지치": 1.2, "지쳤": 1.2, "지각": 0.8, "놓쳐": 0.8, "놓쳤": 0.8, "망했": 1.3, "망쳤": 1.3, "실망": 1.3, "후회": 1.2,
+    "스트레스": 1.3, "서운": 1.2, "억울": 1.3, "아쉽": 0.9, "아쉬": 0.9, "최악": 1.5, "귀찮": 0.8, "춥": 0.5, "떨어졌": 1.2,
+    "미안": 0.7, "눈물": 1.2, "울었": 1.3, "싸웠": 1.3, "혼났": 1.2, "긴장": 0.7, "마감": 0.5, "야근": 0.9,
+}
+_NEGATORS = frozenset({"안", "못", "별로", "전혀"})
+_NEGATING_SUFFIXES = ("않", "없", "못")
+_INTENSIFIERS = frozenset({"너무", "진짜", "정말", "완전", "엄청", "매우", "넘", "되게", "아주", "굉장히", "제일"})
+_POSITIVE_STEMS = sorted(POSITIVE_LEXICON, key=len, reverse=True)
+_NEGATIVE_STEMS = sorted(NEGATIVE_LEXICON, key=len, reverse=True)
+
+
+def hangul_words(text: str) -> list[str]:
+    """한글 어절 목록 (영문 / 숫자 / 자모만 있는 부분은 제외)"""
+    return _HANGUL_WORD.findall(text)
+
+
+def _strip_particle(word: str) -> str | None:
+    # 조사를 떼고 남은 부분이 두 글자 이상일 때만 뗌 ('아이가' → '아이', '나는' / '결과' 는 그대로)
+    # - '것만으로도' 처럼 조사가 겹치면 두 번까지 뗌
+    # - 두 글자 이상 조사를 떼면 한 글자만 남는 경우('집으로')는 한 글자 그대로 반환 (키워드 후보에서 빠짐)
+    # - '것만으로', '거야' 처럼 불용어 + 조사면 None
+    for _ in range(2):
+        for particle in _PARTICLES:
+            if not word.endswith(particle):
+                continue
+            stem = word[:-len(particle)]
+            if stem in STOPWORDS:
+                return None
+            if len(stem) >= 2 or (stem and len(particle) >= 2):
+                word = stem
+                break
+        else:
+            break
+    return word
+
+
+def _strip_hada(word: str) -> str | None:
+    for ending in _HADA_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 2:
+            return word[:-len(ending)]
+    return None
+
+
+def _has_past_tense(word: str) -> bool:
+    # 받침이 ㅆ 인 글자가 있으면 과거형 용언으로 봄 ('지쳤지', '하루였지') - 받침 ㅆ 으로 끝나는 명사는 거의 없음
+    return any(0xAC00 <= ord(ch) <= 0xD7A3 and (ord(ch) - 0xAC00) % 28 == 20 for ch in word)
+
+
+def noun_candidate(word: str) -> tuple[str, bool] | None:
+    """
+    어절에서 명사 후보를 만듭니다. 명사로 보기 어려우면 None
+
+    Returns:
+        (명사 후보, 조사 / '하다' 활용을 떼어내서 명사일 가능성이 높은지)
+        - '공부했어' → ('공부', True), '회의가' → ('회의', True), '팝콘' → ('팝콘', False), '먹었어' → None
+    """
+    noun = _strip_hada(word)
+    if noun is None:
+        stem = _strip_particle(word)
+        if stem is None:
+            return None
+        noun = _strip_hada(stem) or (stem if stem != word else None)  # '합격했다는' → '합격했다' → '합격'
+    if noun is not None:
+        return None if noun in STOPWORDS or _has_past_tense(noun) else (noun, True)
+    if len(word) < 2 or word in STOPWORDS or word.endswith(_PREDICATE_ENDINGS) or _has_past_tense(word):
+        return None
+    return word, False
+
+
+def noun_candidates(text: str) -> list[tuple[str, bool]]:
+    """텍스트에서 (두 글자 이상 명사 후보, 명사일 가능성이 높은지) 목록 (나온 순서대로)"""
+    nouns = []
+    for word in hangul_words(text):
+        candidate = noun_candidate(word)
+        if candidate and len(candidate[0]) >= 2 and candidate[0] not in STOPWORDS:
+            nouns.append(candidate)
+    return nouns
+
+
+def extract_nouns(text: str) -> list[str]:
+    """텍스트에서 키워드 후보(두 글자 이상 명사 후보) 목록"""
+    return [noun for noun, _ in noun_candidates(text)]
+
+
+class DocumentFrequencies:
+    """
+    키워드 추출용 문서 빈도(DF) 표
+
+    Args:
+        docs: 전체 문서 수
+        df: {단어: 그 단어가 나온 문서 수}
+    """
+
+    def __init__(self, docs: int = 0, df: dict[str, int] | None = None):
+        self.docs = docs
+        self.df = df or {}
+
+    @classmethod
+    def build(cls, documents: Iterable[str], min_df: int = 2) -> "DocumentFrequencies":
+        """
+        문서들에서 DF 를 계산합니다. (min_df 번보다 적게 나온 단어는 저장하지 않음 → 처음 보는 단어와 같은 취급)
+        """
+        counts: Counter = Counter()
+        docs = 0
+        for document in documents:
+            docs += 1
+            counts.update(set(extract_nouns(document)))
+        return cls(docs, {term: n for term, n in counts.items() if n >= min_df})
+
+    @classmethod
+    def load(cls, path: str) -> "DocumentFrequencies":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["docs"], data["df"])
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"docs": self.docs, "df": self.df}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def idf(self, term: str) -> float:
+        # 스무딩한 IDF (DF 표가 비어 있으면 모든 단어가 1.0 → 단어 빈도만으로 순위)
+        return math.log((self.docs + 1) / (self.df.get(term, 0) + 1)) + 1.0
+
+
+class KeywordExtractor:
+    """
+    TF-IDF 기반 한글 키워드 추출기
+
+    Args:
+        frequencies: 과거 대화로 계산한 문서 빈도 (None 이면 단어 빈도만 사용)
+    """
+
+    def __init__(self, frequencies: DocumentFrequencies | None = None):
+        self.frequencies = frequencies or DocumentFrequencies()
+
+    # 조사 / '하다' 활용 없이 단독으로만 나온 후보(용언일 수도 있음)의 점수 비율
+    BARE_WEIGHT = 0.6
+
+    def extract(self, text: str, top_k: int = 5, min_k: int = 3) -> list[str]:
+        """
+        텍스트에서 점수(단어 빈도 × IDF)가 높은 명사를 top_k 개까지 반환합니다.
+        - 후보가 min_k 개보다 적으면 있는 만큼만 반환
+        - 점수가 같으면 먼저 나온 단어 우선 (일기는 상황설명이 앞에 옴)
+        - 다른 키워드에 포함되는 짧은 키워드는 제외 ('발표' 와 '발표준비' 중 점수가 높은 쪽만)
+        """
+        candidates = noun_candidates(text)
+        if not candidates:
+            return []
+        tf = Counter(noun for noun, _ in candidates)
+        strong = {noun for noun, is_strong in candidates if is_strong}
+        first_seen = {}
+        for position, (noun, _) in enumerate(candidates):
+            first_seen.setdefault(noun, position)
+
+        def score(term: str) -> float:
+            weight = 1.0 if term in strong else self.BARE_WEIGHT
+            return (1 + math.log(tf[term])) * self.frequencies.idf(term) * weight
+
+        scored = sorted(tf, key=lambda term: (-score(term), first_seen[term]))
+        keywords: list[str] = []
+        for term in scored:
+            if any(term in kept or kept in term for kept in keywords):
+                continue
+            keywords.append(term)
+            if len(keywords) >= max(top_k, min_k):
+                break
+        return keywords
+
+
+def _lexicon_weight(word: str, stems: list[str], lexicon: dict[str, float]) -> float:
+    for stem in stems:
+        if word.startswith(stem) or (len(stem) >= 2 and stem in word):
+            return lexicon[stem]
+    return 0.0
+
+
+def emotion_scores(text: str) -> tuple[float, float, int]:
+    """
+    텍스트의 (긍정 점수, 부정 점수, 어절 수)를 계산합니다.
+    - 앞 어절이 부정어(안 / 못 …)이거나 어절 안에 '않 / 없' 이 붙으면 긍정 ↔ 부정을 뒤집음
+    - 앞 어절이 강조어(너무 / 진짜 …)이면 1.5배
+    """
+    positive = negative = 0.0
+    words = hangul_words(text)
+    for i, word in enumerate(words):
+        pos = _lexicon_weight(word, _POSITIVE_STEMS, POSITIVE_LEXICON)
+        neg = _lexicon_weight(word, _NEGATIVE_STEMS, NEGATIVE_LEXICON)
+        if not pos and not neg:
+            continue
+        previous = words[i - 1] if i > 0 else ""
+        if previous in _NEGATORS or any(suffix in word[1:] for suffix in _NEGATING_SUFFIXES):
+            pos, neg = neg * 0.5, pos  # '안 좋아' 는 부정, '안 힘들어' 는 약한 긍정
+        weight = 1.5 if previous in _INTENSIFIERS else 1.0
+        positive += pos * weight
+        negative += neg * weight
+    positive += 0.6 * len(_LAUGH.findall(text))
+    negative += 0.8 * len(_CRY.findall(text))
+    return positive, negative, len(words)
+
+
+def _to_percentages(values: list[float]) -> list[int]:
+    # 합이 정확히 100 이 되도록 소수점 이하가 큰 항목부터 1씩 더함 (최대 나머지 방식)
+    total = sum(values) or 1.0
+    raw = [v * 100 / total for v in values]
+    result = [int(v) for v in raw]
+    for i in sorted(range(len(raw)), key=lambda i: raw[i] - result[i], reverse=True)[:100 - sum(result)]:
+        result[i] += 1
+    return result
+
+
+class EmotionScorer:
+    """
+    어휘 사전 기반 감정 백분율 계산기 (LLM 감정 분석 단계와 같은 {"좋음", "평범함", "나쁨"} 형식)
+
+    Args:
+        neutral_base: 감정 단어가 없을 때의 기본 평범함 점수
+        neutral_per_word: 어절 하나당 더해지는 평범함 점수 (긴 대화에서 감정 단어 몇 개로 극단적인 값이 나오지 않도록)
+    """
+
+    def __init__(self, neutral_base: float = 1.0, neutral_per_word: float = 0.04):
+        self.neutral_base = neutral_base
+        self.neutral_per_word = neutral_per_word
+
+    def score(self, *texts: str) -> dict[str, int]:
+        """여러 텍스트(예: 대화 내용, 일기 감정표현)를 합쳐서 감정 백분율을 계산합니다."""
+        positive = negative = 0.0
+        words = 0
+        for text in texts:
+            if text:
+                p, n, w = emotion_scores(text)
+                positive, negative, words = positive + p, negative + n, words + w
+        neutral = self.neutral_base + self.neutral_per_word * words
+        good, normal, bad = _to_percentages([positive, neutral, negative])
+        return {"좋음": good, "평범함": normal, "나쁨": bad}
+
+
+class LocalAnalyzer:
+    """
+    감정 점수 계산기와 키워드 추출기를 묶은 것 (main.py 에서 워커 프로세스마다 하나만 사용)
+    - 다른 워커가 문서 빈도 파일을 다시 만들면 다음 키워드 추출 때 새 파일을 읽음
+
+    Args:
+        df_path: 문서 빈도 JSON 파일 경로 (없으면 단어 빈도만으로 키워드 순위 계산)
+    """
+
+    def __init__(self, df_path: str | None = None):
+        self.df_path = df_path
+        self.emotions = EmotionScorer()
+        self._keywords = KeywordExtractor()
+        self._df_mtime: float | None = None
+        self._load_if_changed()
+
+    def _load_if_changed(self) -> None:
+        # 다른 워커 프로세스가 문서 빈도 파일을 다시 만들었으면 새 파일을 읽음 (수정 시각으로 확인)
+        try:
+            mtime = os.stat(self.df_path).st_mtime if self.df_path else None
+        except OSError:
+            return
+        if mtime is None or mtime == self._df_mtime:
+            return
+        self._df_mtime = mtime
+        try:
+            self._keywords = KeywordExtractor(DocumentFrequencies.load(self.df_path))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ 키워드 문서 빈도 파일을 읽지 못했습니다: {e}")
+
+    @property
+    def keywords(self) -> KeywordExtractor:
+        self._load_if_changed()
+        return self._keywords
+
+    def rebuild(self, documents: Iterable[str], min_df: int = 2) -> dict:
+        """과거 대화 문서들로 문서 빈도를 다시 계산해서 저장하고 바로 적용합니다."""
+        frequencies = DocumentFrequencies.build(documents, min_df)
+        if self.df_path:
+            frequencies.save(self.df_path)
+            self._df_mtime = os.stat(self.df_path).st_mtime
+        self._keywords = KeywordExtractor(frequencies)
+        return self.stats()
+
+    def stats(self) -> dict:
+        frequencies = self.keywords.frequencies
+        return {"df_path": self.df_path, "documents": frequencies.docs, "terms": len(frequencies.df)}
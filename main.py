@@ -1,26 +1,224 @@
 import os       # - os: 파일 경로 등 시스템 관련 작업
 import re       # - re: 정규표현식(채팅 필터링 등)
-import json     # - json: OpenAI 응답 파싱용
 from datetime import datetime       # - datetime: 오늘 날짜 포맷용
-from fastapi import FastAPI, UploadFile, File, HTTPException        # - FastAPI: 웹 프레임워크 - UploadFile, File: 파일 업로드 처리 - HTTPException: 에러 응답 반환 시 사용
+from typing import Any, Callable, Iterable, Literal          # - Literal: 요청 옵션 값 제한용 / Callable: 스트리밍 콜백 타입
+from contextlib import AsyncExitStack, asynccontextmanager      # - 스트리밍 응답이 끝날 때까지 실행 슬롯을 잡아두기 위해 사용 / 서버 시작·종료 처리
+import asyncio  # - asyncio: LLM 동시 호출 수 제한용 세마포어
+import time     # - time: 모델 경로별 호출 지연시간 측정
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request        # - FastAPI: 웹 프레임워크 - UploadFile, File: 파일 업로드 처리 - HTTPException: 에러 응답 반환 시 사용
+from fastapi.concurrency import run_in_threadpool   # 파일 파싱처럼 CPU를 쓰는 작업을 스레드풀에서 실행 (이벤트 루프 블로킹 방지)
 from pydantic import BaseModel      # Pydantic 모델 선언용 (입력 데이터 구조 정의에 필요)
 from dotenv import load_dotenv      # .env 환경 변수 파일 로드를 위한 라이브러리
-from openai import OpenAI       # OpenAI API를 사용하기 위한 클라이언트
+from openai import AsyncOpenAI       # OpenAI API를 사용하기 위한 비동기 클라이언트
 # -- CORS 허용 (크로스 도메인 통신 허용) -- #
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pipeline import Stage, run_stages     # 일기 생성 단계들을 의존성 그래프로 실행
+from streaming import format_sse, SectionStreamParser   # SSE 이벤트 포맷 / 스트리밍 일기 섹션 파서
+from kakao_parser import iter_file_blocks, collect_recent_messages, collect_messages_by_day, collect_messages_by_date   # 카카오톡 내보내기 파싱 엔진
+from chat_store import ChatStore, fingerprint_day   # 업로드한 대화를 날짜 인덱스 / 날짜 블록 지문과 함께 저장 (chat_id 로 재사용)
+from day_results import DayResultStore   # 날짜 블록 지문이 같은 날짜의 이벤트 분석 / 일기 결과 재사용
+from diary_store import DiaryStore, has_day_key   # 생성한 일기 저장 / 날짜·감정·키워드·본문 검색 (SQLite FTS5)
+from rollups import RollupStore, ALL_ROOMS, diary_fact, event_fact   # 달력 / 감정 추이용 일·주·월 집계
+from jobs import JobStore, JobRunner, FINISHED_STATES   # 여러 날짜 일기를 한꺼번에 만드는 백그라운드 작업 큐 (SQLite)
+from concurrency import (   # 동시성 제한 / 과부하 시 요청 거절 / 워커 프로세스끼리 나눠 쓰는 속도 제한 / 지연 생성
+    AdmissionController, OverloadedError, RateLimiter, SharedRateLimiter, ForkSafe, env_int, env_float,
+)
+from prompt_budget import PromptBudget, tokens_saved   # 대화 입력 토큰 예산 / 긴 대화 map-reduce 요약
+from metrics import (   # /metrics 엔드포인트용 지표 (Prometheus 텍스트 형식)
+    MetricsMiddleware, registry as metrics_registry, current_endpoint, track_llm_call, record_cache_hit,
+    record_stale_cache, record_resilience_event, record_json_failure, record_json_repairs, record_route,
+    record_output_quality, observe_stage_timings, track_chat_parse, Gauge, llm_circuit_state, last_model,
+    record_singleflight, record_day_results,
+)
+from model_router import ModelRouter   # 단계별 모델 등급 선택 (입력 크기 / 부하 / 남은 시간에 따라 더 싼 모델로 전환)
+from resilience import (   # OpenAI 호출 시간 제한 / hedging / 재시도 / 회로 차단기
+    ResilientCaller, DeadlineExceededError, request_deadline, is_upstream_failure,
+)
+from similarity import mean_pairwise_similarity   # 일관성 테스트용 텍스트 유사도 (글자 n-gram, 일괄 계산)
+from llm_cache import LLMCache, make_cache_key, bypass_cache, is_cache_bypassed   # OpenAI 응답 캐시 (메모리 LRU + SQLite)
+from json_output import JSON_MODES, JSONOutputError, extract_json, object_schema, response_format   # 단계별 출력 스키마 / 관대한 JSON 파서
+from local_nlp import LocalAnalyzer   # OpenAI 호출 없이 계산하는 감정 분석 / 키워드 추출 (analysis="local")
+from http_pool import HttpPool   # OpenAI 호출용 HTTP 연결 풀 (연결 수 / keep-alive / HTTP/2 / 미리 열어두기)
+from singleflight import SingleFlight   # 동시에 들어온 같은 요청 / 같은 LLM 호출을 한 번만 실행
 
 
 # .env 파일의 경로를 절대 경로로 명시
 # - uvicorn처럼 별도 프로세스에서 실행할 때 상대경로 문제 방지 안했을때 집에서 됐던게 학교에선 안됐음..
 dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
 load_dotenv(dotenv_path)        # 위에서 지정한 경로의 .env 파일을 로드 (환경 변수 설정)
-print("✅ API 키 확인:", os.getenv("OPENAI_API_KEY"))   # 환경 변수가 제대로 로드되었는지 확인용 (디버깅) - .env 에 api 키 있는데 안불러와져서 확인차 작성
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))    # - 인증 실패 시 에러 발생 가능하므로 os.getenv()가 None이면 예외 처리 필요
+# 서버 데이터(캐시 DB 등)를 저장할 폴더
+DATA_DIR = os.getenv("DIARY_DATA_DIR", os.path.join(os.path.dirname(__file__), "data"))
+
+# 모든 LLM 호출에 쓰는 비동기 클라이언트 (단계 / 날짜별 분석 병렬 실행)
+# - 재시도는 llm_resilience 가 담당하므로 SDK 자체 재시도는 끔 (재시도가 겹쳐서 지연시간이 늘어나지 않도록)
+# - import 할 때 만들지 않고 워커 프로세스마다 처음 호출할 때 만듦 (ForkSafe, fork 된 워커끼리 커넥션 풀을 공유하지 않음)
+# - HTTP 연결 풀은 LLM 동시 호출 제한(LLM_MAX_CONCURRENCY)에 맞춤 (LLM_HTTP_* 설정은 http_pool.py 참고)
+LLM_MAX_CONCURRENCY = env_int("LLM_MAX_CONCURRENCY", 8)
+llm_http_pool = HttpPool.from_env(LLM_MAX_CONCURRENCY)
+
+def build_openai_client() -> AsyncOpenAI:
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0, http_client=llm_http_pool.build_client())
+
+async_client = ForkSafe(build_openai_client)
+
+# 서버 시작 시 OpenAI 연결을 미리 열어둠 (배포 직후 첫 요청들이 TCP + TLS 연결 준비 시간을 내지 않도록)
+# - 이 워커의 클라이언트도 여기서 만들어짐. 테스트용 가짜 클라이언트처럼 base_url 이 없으면 건너뜀
+async def prewarm_openai_connections() -> None:
+    base_url = getattr(async_client, "base_url", None)
+    if base_url is None:
+        return
+    headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"}
+    started = time.perf_counter()
+    opened = await llm_http_pool.prewarm(str(base_url), headers)
+    if opened:
+        print(f"🔌 OpenAI 연결 {opened}개를 미리 열었습니다 ({(time.perf_counter() - started) * 1000:.0f}ms)")
+    llm_http_pool.start_background(str(base_url), headers)
+
+# 서버 시작 시 백그라운드 작업 워커를 띄우고, 종료 시 정리
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # API 키는 값을 출력하지 않고 설정 여부만 확인
+    if os.getenv("OPENAI_API_KEY"):
+        print(f"✅ OPENAI_API_KEY 설정됨 (워커 pid {os.getpid()})")
+    else:
+        print("⚠️ OPENAI_API_KEY 가 설정되지 않았습니다. OpenAI 호출이 실패합니다")
+    await prewarm_openai_connections()
+    requeued = job_runner.start()
+    if requeued:
+        print(f"🧵 이전 실행에서 끝나지 않은 작업 항목 {requeued}개를 다시 대기열에 넣었습니다")
+    yield
+    await job_runner.stop()
+    # 연결 풀을 닫고, 다시 시작하면(같은 프로세스에서 lifespan 재실행) 클라이언트를 새로 만들도록 버림
+    await llm_http_pool.stop()
+    if isinstance(async_client, ForkSafe):
+        async_client.reset()
 
 # FastAPI 애플리케이션 인스턴스 생성
-app = FastAPI()  # - 이후 라우터(@app.get, @app.post 등)에서 사용함
+app = FastAPI(lifespan=lifespan)  # - 이후 라우터(@app.get, @app.post 등)에서 사용함
+
+# 앱 팩토리 (여러 워커 프로세스로 실행할 때의 진입점)
+# - uvicorn main:create_app --factory --workers 4
+# - gunicorn "main:create_app()" -k uvicorn.workers.UvicornWorker -w 4 (--preload 사용 가능)
+# - 모듈 import 는 설정만 읽고, OpenAI 클라이언트 / SQLite 연결 / 문서 빈도 파일은 각 워커가 처음 쓸 때 만듦
+# - 응답 캐시(디스크) / OpenAI 분당 요청 수 예산 / 작업 큐는 DATA_DIR 의 SQLite 파일로 워커끼리 나눠 씀
+def create_app() -> FastAPI:
+    return app
+
+# 동시성 설정 (환경 변수로 조절 가능)
+# - LLM_MAX_CONCURRENCY: 서버 전체에서 동시에 보낼 수 있는 OpenAI 요청 수
+# - MAX_ACTIVE_PIPELINES: 동시에 실행되는 일기 생성/일관성 테스트 요청 수
+# - MAX_QUEUED_PIPELINES: 실행을 기다릴 수 있는 요청 수 (초과 시 503 응답)
+# - PIPELINE_QUEUE_TIMEOUT: 대기열에서 기다리는 최대 시간(초)
+# - LLM_RPM / LLM_RPM_BURST: OpenAI 분당 요청 수 제한 (0 이면 제한 없음) / 한꺼번에 보낼 수 있는 요청 수
+# - EVENT_ANALYSIS_CONCURRENCY: 날짜별 이벤트 분석 요청 하나가 동시에 분석하는 날짜 수
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+# - LLM_RATE_LIMIT_DB: 워커 프로세스끼리 분당 요청 수 예산을 나눠 쓰는 SQLite 파일 ("off" 이면 프로세스마다 따로 제한)
+_rate_limit_db = os.getenv("LLM_RATE_LIMIT_DB", os.path.join(DATA_DIR, "rate_limit.sqlite3"))
+if _rate_limit_db.lower() == "off":
+    llm_rate_limiter = RateLimiter(env_float("LLM_RPM", 0), env_int("LLM_RPM_BURST", 0) or None)
+else:
+    llm_rate_limiter = SharedRateLimiter(_rate_limit_db, env_float("LLM_RPM", 0), env_int("LLM_RPM_BURST", 0) or None)
+EVENT_ANALYSIS_CONCURRENCY = env_int("EVENT_ANALYSIS_CONCURRENCY", 4)
+pipeline_admission = AdmissionController(
+    max_active=env_int("MAX_ACTIVE_PIPELINES", 4),
+    max_queued=env_int("MAX_QUEUED_PIPELINES", 16),
+    queue_timeout=env_float("PIPELINE_QUEUE_TIMEOUT", 30.0),
+)
+
+# OpenAI 호출 안정성 설정 (resilience.py 참고)
+# - LLM_REQUEST_BUDGET: 일기 생성 요청 하나가 OpenAI 호출에 쓸 수 있는 전체 시간(초). 단계별 제한 시간은 남은 예산을 넘지 않음
+# - LLM_STAGE_TIMEOUT(_<단계>) / LLM_MAX_RETRIES / LLM_HEDGE* / LLM_BREAKER_*: 단계 제한 시간 / 재시도 / hedging / 회로 차단기
+LLM_REQUEST_BUDGET = env_float("LLM_REQUEST_BUDGET", 120.0)
+llm_resilience = ResilientCaller.from_env(
+    ["summary_chunk", "summary", "conflict", "diary", "emotion", "keyword", "fused", "event"],
+    on_event=record_resilience_event,
+)
+
+# 단계별 모델 라우팅 정책 (model_router.py 참고)
+# - MODEL_ROUTING / MODEL_TIER_<단계> / MODEL_ROUTING_FILE 로 코드 수정 없이 변경
+def pipeline_load() -> float:
+    load = pipeline_admission.stats()
+    return (load["active"] + load["queued"]) / (load["max_active"] + load["max_queued"])
+
+model_router = ModelRouter.from_env(load_fn=pipeline_load)
+
+# LLM 응답 형식 요청 방식 (json_output.py 참고)
+# - LLM_JSON_MODE: schema(기본, 단계별 JSON 스키마로 제한) / json_object(JSON 모드) / off(프롬프트 지시만 사용)
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "schema")
+if LLM_JSON_MODE not in JSON_MODES:
+    print(f"⚠️ LLM_JSON_MODE '{LLM_JSON_MODE}' 를 알 수 없어 schema 를 사용합니다")
+    LLM_JSON_MODE = "schema"
+
+# OpenAI 응답 캐시 설정
+# - LLM_CACHE_MAX_ENTRIES: 메모리 캐시 최대 항목 수
+# - LLM_CACHE_TTL: 캐시 유효 시간(초, 기본 7일)
+# - LLM_CACHE_DB: 디스크 캐시 파일 경로 ("off" 이면 메모리 캐시만 사용)
+# - LLM_CACHE_DISK_MAX_ENTRIES: 디스크 캐시 최대 항목 수
+# - LLM_CACHE_DISABLED_STAGES: 캐시를 쓰지 않을 단계 (쉼표 구분, 예: "diary,keyword")
+# - LLM_CACHE_MAX_TEMPERATURE: 이 값보다 temperature 가 높은 호출은 다양한 응답을 원한다고 보고 캐시하지 않음
+# - 메모리 캐시는 워커마다 따로, 디스크 캐시는 같은 파일을 쓰는 워커끼리 공유 (한 워커가 받은 응답을 다른 워커도 재사용)
+_cache_db = os.getenv("LLM_CACHE_DB", os.path.join(DATA_DIR, "llm_cache.sqlite3"))
+llm_cache = ForkSafe(lambda: LLMCache(
+    max_entries=env_int("LLM_CACHE_MAX_ENTRIES", 512),
+    ttl=env_float("LLM_CACHE_TTL", 7 * 24 * 3600),
+    db_path=None if _cache_db.lower() == "off" else _cache_db,
+    disk_max_entries=env_int("LLM_CACHE_DISK_MAX_ENTRIES", 20000),
+))
+CACHE_DISABLED_STAGES = {s.strip() for s in os.getenv("LLM_CACHE_DISABLED_STAGES", "").split(",") if s.strip()}
+CACHE_MAX_TEMPERATURE = env_float("LLM_CACHE_MAX_TEMPERATURE", 0.5)
+
+# 동시에 들어온 같은 작업 합치기 (singleflight.py 참고)
+# - diary_flight: 정규화한 DiaryRequest 가 같은 일기 생성 요청 (앱 재시도 / 두 번 누르기)
+# - llm_flight: 캐시 키가 같은 LLM 호출 (캐시할 수 있는 호출만, 다른 요청의 같은 단계도 합쳐짐)
+# - 캐시를 건너뛰는 호출(일관성 테스트 등)은 매번 새 응답이 필요하므로 합치지 않음
+diary_flight = SingleFlight("request", on_event=record_singleflight)
+llm_flight = SingleFlight("llm", on_event=record_singleflight)
+
+# 프롬프트에 넣는 대화 내용의 토큰 예산 (예산을 넘는 긴 대화는 청크별로 요약해서 압축)
+# - PROMPT_CHAT_TOKEN_BUDGET / PROMPT_BUDGET_<단계> / PROMPT_CHUNK_TOKENS / PROMPT_CHUNK_CONCURRENCY (prompt_budget.py 참고)
+CHAT_INPUT_STAGES = ["summary", "conflict", "diary", "emotion", "fused"]
+prompt_budget = PromptBudget.from_env(CHAT_INPUT_STAGES)
+
+# 업로드한 대화를 한 번만 파싱해서 저장해두는 저장소 (chat_id 로 재사용)
+chat_store = ForkSafe(lambda: ChatStore(os.getenv("CHAT_STORE_DB", os.path.join(DATA_DIR, "chats.sqlite3"))))
+
+# 날짜별 처리 결과 저장소 (day_results.py 참고)
+# - 매일 다시 내보낸 대화에서 바뀌지 않은 날짜는 이벤트 분석 / 일기 생성을 다시 하지 않고 저장된 결과를 사용
+day_results = ForkSafe(lambda: DayResultStore(os.getenv("DAY_RESULTS_DB", os.path.join(DATA_DIR, "day_results.sqlite3"))))
+
+# 생성한 일기 저장소 (사용자 + 대화방 + 날짜마다 최신 일기 하나, GET /diaries 로 LLM 호출 없이 조회)
+diary_store = ForkSafe(lambda: DiaryStore(os.getenv("DIARY_STORE_DB", os.path.join(DATA_DIR, "diaries.sqlite3"))))
+
+# 일·주·월 집계 저장소 (일기 / 이벤트 분석이 끝날 때마다 바뀐 만큼만 반영, GET /rollups 로 조회)
+rollup_store = ForkSafe(lambda: RollupStore(os.getenv("ROLLUP_DB", os.path.join(DATA_DIR, "rollups.sqlite3"))))
+
+# 로컬 감정 분석 / 키워드 추출기 (analysis="local" 요청에서 사용)
+# - KEYWORD_DF_PATH: 키워드 TF-IDF 용 문서 빈도 파일 (POST /local-analysis/rebuild 로 저장된 대화에서 다시 계산)
+local_analyzer = ForkSafe(lambda: LocalAnalyzer(os.getenv("KEYWORD_DF_PATH", os.path.join(DATA_DIR, "keyword_df.json"))))
+
+# 백그라운드 작업 저장소 (서버가 재시작되어도 남아 있음)
+# - JOB_WORKERS: 동시에 처리하는 작업 항목(날짜) 수 (워커 프로세스마다)
+# - JOB_WORKER_TIMEOUT: 이 시간(초) 동안 하트비트가 없는 워커 프로세스의 실행 중 항목은 다른 워커가 다시 처리
+# - JOB_EVENTS_POLL_INTERVAL: 작업 진행 SSE 가 저장소를 다시 확인하는 간격(초, 다른 워커 프로세스가 처리한 항목 반영)
+job_store = ForkSafe(lambda: JobStore(os.getenv("JOB_STORE_DB", os.path.join(DATA_DIR, "jobs.sqlite3"))))
+JOB_EVENTS_POLL_INTERVAL = env_float("JOB_EVENTS_POLL_INTERVAL", 5.0)
+
+# 과부하로 거절된 요청은 503 + Retry-After 헤더로 응답
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# 요청 시간 예산 안에 OpenAI 응답을 받지 못하면 504 로 응답
+@app.exception_handler(DeadlineExceededError)
+async def deadline_handler(request: Request, exc: DeadlineExceededError):
+    return ORJSONResponse(status_code=504, content={"detail": str(exc)})
 
 #  요청 모델 정의
 # FastAPI에서 사용자의 요청 데이터를 구조화하기 위해 Pydantic 모델을 사용
@@ -29,6 +227,8 @@ class DiaryRequest(BaseModel):
     search_log: str | None = "없음"         # 선택적인 검색 기록 (기본값: "없음")
     user_prompt: str | None = None          # 사용자 정의 프롬프트 (선택적)
     use_prompt: bool = True                 # 프롬프트 사용 여부 (기본값: True)
+    mode: Literal["pipeline", "fused"] = "pipeline"   # pipeline: 단계별 여러 번 호출 / fused: 한 번의 호출로 전체 생성
+    analysis: Literal["llm", "local"] = "llm"         # 감정 분석 / 키워드 추출 방식 (local: OpenAI 호출 없이 계산, pipeline 모드에서만 적용)
 
 #  오늘 날짜를 카카오톡 날짜 포맷에 맞게(예: 2025년 6월 17일) 반환하는 함수
 def get_today_str_kakao():
@@ -37,34 +237,24 @@ def get_today_str_kakao():
 
 #  카카오톡 txt 파일에서 대화 내용만 추출하는 함수
 # - 날짜 기준이 아닌 전체 텍스트 중 유효한 대화 메시지를 필터링함
-def extract_today_chat(text: str, _: str = "") -> str:          
-    lines = text.splitlines()         # 텍스트를 줄 단위로 나눔
-    chat = []                         # 유효한 메시지를 저장할 리스트
-
-    #  DD/MM/YY HH:MM, 이름 : 메시지 (카카오톡 내보내기 형식)
-    #  정규 표현식 정의: 'DD/MM/YY HH:MM, 이름 : 메시지' 패턴 추출용
-    msg = re.compile(r"^\d{2}/\d{2}/\d{2}\s+\d{1,2}:\d{2},\s+(.*?)\s*:\s*(.*)")
-
-    for ln in lines:
-        ln = ln.strip()     # 각 줄의 앞뒤 공백 제거
-        matching = msg.match(ln)       # 정규표현식과 매칭 시도
-        if matching:        
-            msg_txt = matching.group(2).strip()     # 대화 내용만 추출 (이름/시간 제외)
-            # 시스템 메시지나 불필요한 항목 필터링
-            # 예: [사진], 이모티콘, 입장/퇴장 알림 등은 제외
-            if not any(k in msg_txt for k in ["[사진]", "이모티콘", "님이 입장", "님이 나갔"]):
-                chat.append(msg_txt)    # 유효한 메시지만 리스트에 추가하기
-
-    return "\n".join(chat[-30:]) # 최근 메시지 30개만 추출하여 반환하기 (추후 변동 예정)
+# - text 로 파일 전체 문자열 또는 줄 단위 이터러블(iter_file_blocks / iter_file_lines)을 받을 수 있음
+# - 실제 파싱은 kakao_parser 의 공용 파싱 엔진이 담당 (DD/MM/YY HH:MM, 이름 : 메시지 형식)
+def extract_today_chat(text: str | Iterable[str], _: str = "") -> str:          
+    # 시스템 메시지나 불필요한 항목([사진], 이모티콘, 입장/퇴장 알림 등)은 제외
+    with track_chat_parse("recent") as parsed:
+        chat = collect_recent_messages(text, limit=30)
+        parsed["messages"] = len(chat)
+    return "\n".join(chat) # 최근 메시지 30개만 추출하여 반환하기 (추후 변동 예정)
 
 # 카카오톡 대화를 날짜별로 구분하여 추출하는 함수
-def extract_chat_by_date(text: str, target_date: str | None = None) -> dict:
+def extract_chat_by_date(text: str | Iterable[str], target_date: str | None = None) -> dict:
     """
     카카오톡 대화를 날짜별로 구분하여 추출합니다.
     
     Args:
-        text: 카카오톡 txt 파일 내용
+        text: 카카오톡 txt 파일 내용 (문자열 전체 또는 줄 단위 이터러블)
         target_date: 특정 날짜 (예: "20일", "19일"). None이면 모든 날짜 반환
+            - 지정하면 해당 날짜의 메시지만 메모리에 보관함
     
     Returns:
         dict: {
@@ -73,37 +263,9 @@ def extract_chat_by_date(text: str, target_date: str | None = None) -> dict:
             ...
         }
     """
-    lines = text.splitlines()
-    chat_by_date = {}  # 날짜별 대화 저장
-    current_date = None
-    
-    # 날짜 패턴: "2025년 1월 20일" 또는 "1월 20일" 형식
-    date_pattern = re.compile(r"(\d{4}년\s*)?(\d{1,2}월\s*\d{1,2}일)")
-    # 메시지 패턴: DD/MM/YY HH:MM, 이름 : 메시지
-    msg_pattern = re.compile(r"^\d{2}/\d{2}/\d{2}\s+\d{1,2}:\d{2},\s+(.*?)\s*:\s*(.*)")
-    
-    for line in lines:
-        line = line.strip()
-        
-        # 날짜 라인인지 확인
-        date_match = date_pattern.search(line)
-        if date_match:
-            # 날짜 추출 (예: "20일" 형태로 변환)
-            date_str = date_match.group(2)  # "1월 20일"
-            day_match = re.search(r"(\d{1,2})일", date_str)
-            if day_match:
-                current_date = day_match.group(1) + "일"
-                if current_date not in chat_by_date:
-                    chat_by_date[current_date] = []
-            continue
-        
-        # 메시지 라인인지 확인
-        msg_match = msg_pattern.match(line)
-        if msg_match and current_date:
-            msg_txt = msg_match.group(2).strip()
-            # 시스템 메시지 필터링
-            if not any(k in msg_txt for k in ["[사진]", "이모티콘", "님이 입장", "님이 나갔"]):
-                chat_by_date[current_date].append(msg_txt)
+    with track_chat_parse("by_date") as parsed:
+        chat_by_date = collect_messages_by_day(text, target_date)
+        parsed["messages"] = sum(len(messages) for messages in chat_by_date.values())
     
     # 특정 날짜만 요청한 경우
     if target_date:
@@ -127,100 +289,326 @@ def get_chat_for_date(chat_by_date: dict, target_date: str) -> str:
         return "\n".join(chat_by_date[target_date])
     return ""
 
+# 날짜별 이벤트 분석 프롬프트를 만드는 함수
+def build_event_prompt(date: str, messages: list[str]) -> str:
+    chat_text = "\n".join(messages)
+
+    # 이벤트 분석 프롬프트 (Few-Shot 예시 추가)
+    return f"""
+    아래 카카오톡 대화에서 어떤 주요 이벤트나 일이 있었는지 분석해주세요.
+
+    ### 분석 규칙
+    1. 대화 내용을 기반으로 사실에 입각하여 분석합니다.
+    2. 주요 이벤트는 3-5개 키워드나 짧은 구문으로 요약합니다.
+    3. 전체적인 감정 분위기는 "긍정", "부정", "중립" 중 하나로 명확히 판단합니다.
+
+    ### 예시
+    ---
+    #### 입력
+    - 대화 내용: "오늘 팀 프로젝트 회의 길어져서 힘들었어. 저녁은 치킨 먹고 힘냄. 내일은 발표 준비해야지."
+
+    #### 출력
+    {{
+        "date": "해당 날짜",
+        "events": ["팀 프로젝트 회의", "저녁 치킨", "발표 준비"],
+        "summary": "팀 프로젝트 회의가 길어져 피로감을 느꼈으나, 저녁으로 치킨을 먹으며 기운을 회복했습니다. 다음 날 있을 발표 준비에 대한 계획을 세웠습니다.",
+        "emotion": "중립"
+    }}
+    ---
+    
+    ### 실제 분석
+    이제 아래 대화 내용을 바탕으로 위 규칙과 예시를 따라 분석해주세요.
+
+    #### 입력
+    - 대화 내용: {chat_text}
+
+    #### 출력 (이 JSON 형식만 생성하세요)
+    {{
+        "date": "{date}",
+        "events": [],
+        "summary": "",
+        "emotion": ""
+    }}
+    """
+
+# 분석에 실패한 날짜에 넣는 기본 결과 (다른 날짜 분석에는 영향 없음)
+def _failed_event_result(date: str) -> dict:
+    return {
+        "date": date,
+        "events": [],
+        "summary": "분석 실패",
+        "emotion": "알 수 없음"
+    }
+
+# 하루치 대화의 이벤트를 분석하는 함수 (실패해도 예외 대신 기본 결과 반환)
+async def analyze_events_for_date(date: str, messages: list[str]) -> dict:
+    try:
+        content = await call_llm(
+            "event",
+            messages=[{"role": "user", "content": build_event_prompt(date, messages)}],
+            temperature=0.2, # 일관성을 위해 temperature 낮춤
+            **json_output_params("event")
+        )
+        if content is None:
+            raise ValueError("API 응답이 비어있습니다")
+
+        result = parse_llm_json("event", content, defaults={"date": date})
+        result["date"] = result["date"] or date
+        return result
+
+    except Exception as e:
+        print(f"📅 {date} 이벤트 분석 중 오류: {e}")
+        return _failed_event_result(date)
+
+# 날짜별 이벤트 분석을 동시에 실행하고, 끝나는 순서대로 결과를 돌려주는 함수
+async def iter_events_by_date(chat_by_date: dict, max_concurrency: int | None = None):
+    """
+    각 날짜별 이벤트 분석을 동시에 실행하고 끝나는 대로 (날짜, 결과)를 돌려줍니다.
+    - 한 요청이 동시에 보내는 분석 수는 max_concurrency 로 제한 (서버 전체 제한은 llm_semaphore / llm_rate_limiter)
+    - 메시지가 없는 날짜는 건너뜀
+
+    Args:
+        chat_by_date: 날짜별 대화 딕셔너리
+        max_concurrency: 동시에 분석할 날짜 수 (None 이면 EVENT_ANALYSIS_CONCURRENCY)
+    """
+    limit = asyncio.Semaphore(max(1, max_concurrency or EVENT_ANALYSIS_CONCURRENCY))
+
+    async def run_one(date: str, messages: list[str]) -> tuple[str, dict]:
+        async with limit:
+            return date, await analyze_events_for_date(date, messages)
+
+    tasks = [asyncio.create_task(run_one(date, messages)) for date, messages in chat_by_date.items() if messages]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 소비하는 쪽이 중간에 멈추면(클라이언트 연결 종료 등) 남은 분석 취소
+        for task in tasks:
+            task.cancel()
+
 # 날짜별 이벤트 분석 함수
-def analyze_events_by_date(chat_by_date: dict) -> dict:
+async def analyze_events_by_date(chat_by_date: dict, max_concurrency: int | None = None) -> dict:
     """
-    각 날짜별로 이벤트를 분석합니다.
+    각 날짜별로 이벤트를 분석합니다. (날짜들을 동시에 분석)
     
     Args:
         chat_by_date: 날짜별 대화 딕셔너리
+        max_concurrency: 동시에 분석할 날짜 수
     
     Returns:
-        dict: 날짜별 이벤트 분석 결과
+        dict: 날짜별 이벤트 분석 결과 (chat_by_date 의 날짜 순서)
     """
     events_by_date = {}
-    
-    for date, messages in chat_by_date.items():
-        if not messages:  # 메시지가 없으면 건너뛰기
-            continue
-            
-        chat_text = "\n".join(messages)
-        
-        # 이벤트 분석 프롬프트 (Few-Shot 예시 추가)
-        event_analysis_prompt = f"""
-        아래 카카오톡 대화에서 어떤 주요 이벤트나 일이 있었는지 분석해주세요.
-
-        ### 분석 규칙
-        1. 대화 내용을 기반으로 사실에 입각하여 분석합니다.
-        2. 주요 이벤트는 3-5개 키워드나 짧은 구문으로 요약합니다.
-        3. 전체적인 감정 분위기는 "긍정", "부정", "중립" 중 하나로 명확히 판단합니다.
-
-        ### 예시
-        ---
-        #### 입력
-        - 대화 내용: "오늘 팀 프로젝트 회의 길어져서 힘들었어. 저녁은 치킨 먹고 힘냄. 내일은 발표 준비해야지."
-
-        #### 출력
-        {{
-            "date": "해당 날짜",
-            "events": ["팀 프로젝트 회의", "저녁 치킨", "발표 준비"],
-            "summary": "팀 프로젝트 회의가 길어져 피로감을 느꼈으나, 저녁으로 치킨을 먹으며 기운을 회복했습니다. 다음 날 있을 발표 준비에 대한 계획을 세웠습니다.",
-            "emotion": "중립"
-        }}
-        ---
-        
-        ### 실제 분석
-        이제 아래 대화 내용을 바탕으로 위 규칙과 예시를 따라 분석해주세요.
-
-        #### 입력
-        - 대화 내용: {chat_text}
-
-        #### 출력 (이 JSON 형식만 생성하세요)
-        {{
-            "date": "{date}",
-            "events": [],
-            "summary": "",
-            "emotion": ""
-        }}
-        """
-        
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o",  # 더 강력한 모델로 변경
-                messages=[{"role": "user", "content": event_analysis_prompt}],
-                temperature=0.2 # 일관성을 위해 temperature 낮춤
-            )
-            
-            content = response.choices[0].message.content
-            if content is None:
-                raise ValueError("API 응답이 비어있습니다")
+    async for date, result in iter_events_by_date(chat_by_date, max_concurrency):
+        events_by_date[date] = result
+    return {date: events_by_date[date] for date in chat_by_date if date in events_by_date}
+
+# 이 호출의 응답을 캐시해도 되는지 판단하는 함수
+def _is_cacheable(stage: str, params: dict) -> bool:
+    if is_cache_bypassed() or stage in CACHE_DISABLED_STAGES:
+        return False
+    temperature = params.get("temperature")
+    return temperature is None or temperature <= CACHE_MAX_TEMPERATURE
+
+# 단계별 라우팅 정책으로 호출할 모델을 정하는 함수 (호출 함수들 공통)
+async def route_llm_params(stage: str, params: dict):
+    params, route = await model_router.aapply(stage, params)
+    last_model.set(route.model)  # JSON 파싱 실패 지표의 모델 라벨
+    record_route(route.stage, route.model, route.reason)
+    return params, route
+
+# 응답이 요청한 형식(JSON 키, 값 범위 등)에 맞았는지 기록 (경로별 품질 비교)
+# - json_error: JSON 자체를 파싱하지 못한 경우 (파싱 실패 지표에도 기록)
+def record_parse_result(stage: str, ok: bool, json_error: bool = False):
+    model_router.record_quality(stage, ok)
+    record_output_quality(stage, ok)
+    if json_error:
+        record_json_failure(stage)
+
+# 단계의 출력 스키마로 response_format 인자를 만드는 함수 (LLM_JSON_MODE 가 off 면 빈 dict)
+def json_output_params(stage: str, schema: dict | None = None) -> dict:
+    fmt = response_format(stage, schema or STAGE_SCHEMAS[stage], LLM_JSON_MODE)
+    return {"response_format": fmt} if fmt else {}
+
+# 모든 단계가 함께 쓰는 LLM 응답 파서
+def parse_llm_json(stage: str, content: str, schema: dict | None = None, defaults: dict | None = None,
+                   check: Callable[[Any], bool] | None = None) -> Any:
+    """
+    응답에서 JSON 을 꺼내 단계의 출력 스키마에 맞춰 보정합니다. (코드 펜스 / 앞뒤 문장 / 잘린 응답 처리)
+    - 보정 종류는 /metrics 에, 스키마에 맞았는지(+ check)는 경로별 응답 품질에 기록
 
-            try:
-                if "```json" in content:
-                    content = content.split("```json")[1].split("```")[0].strip()
-                result = json.loads(content)
-            except json.JSONDecodeError as e:
-                print(f"--- ❌ 날짜({date}) 이벤트 JSON 파싱 오류 ---")
-                print(f"오류: {e}")
-                print(f"원본 API 응답:\n```\n{content}\n```")
-                print("--------------------")
-                raise HTTPException(status_code=500, detail=f"날짜({date}) 이벤트 API 응답 파싱 실패: {e}")
-            
-            events_by_date[date] = result
-            
+    Args:
+        stage: 단계 이름 (STAGE_SCHEMAS 의 키)
+        schema: 단계 기본 스키마 대신 쓸 스키마 (예: fused 의 충돌 감지 포함 여부)
+        defaults: 빠지거나 잘못된 최상위 키에 넣을 기본값
+        check: 스키마 외의 품질 조건 (예: 감정 백분율 합계)
+
+    Raises:
+        JSONOutputError: 응답에서 JSON 을 전혀 찾지 못한 경우
+    """
+    try:
+        parsed = extract_json(content, schema or STAGE_SCHEMAS[stage], defaults)
+    except JSONOutputError:
+        record_parse_result(stage, False, json_error=True)
+        print(f"--- ❌ '{stage}' 응답 JSON 파싱 실패 ---")
+        print(f"원본 API 응답:\n```\n{content}\n```")
+        print("--------------------")
+        raise
+    record_json_repairs(stage, parsed.repairs)
+    record_parse_result(stage, parsed.conforms and (check is None or check(parsed.value)))
+    return parsed.value
+
+# OpenAI 채팅 완성 API 호출 공통 함수
+# - 모든 단계가 이 함수를 통해 비동기 클라이언트를 호출하므로 이벤트 루프를 막지 않음
+# - 같은 모델/메시지/파라미터로 이미 받은 응답이 있으면 API를 호출하지 않고 캐시에서 반환
+async def call_llm(stage: str, **params) -> str | None:
+    """
+    비동기 OpenAI 클라이언트로 채팅 완성 API를 호출하고 응답 텍스트를 반환합니다.
+
+    Args:
+        stage: 호출하는 파이프라인 단계 이름 (예: "summary", "diary")
+        **params: chat.completions.create 에 그대로 전달할 인자 (messages, temperature 등)
+            model 을 생략하면 단계별 라우팅 정책(model_router)이 모델을 고름
+
+    Returns:
+        str | None: 첫 번째 선택지의 응답 텍스트
+    """
+    params, route = await route_llm_params(stage, params)
+    cache_key = None
+    if _is_cacheable(stage, params):
+        cache_key = make_cache_key(params)
+        cached = await llm_cache.aget(cache_key)
+        if cached is not None:
+            record_cache_hit(stage, params["model"])
+            return cached
+    else:
+        llm_cache.record_bypass()
+
+    async def attempt():
+        async with llm_semaphore:  # 동시에 나가는 OpenAI 요청 수 제한
+            await llm_rate_limiter.acquire()  # 분당 요청 수 제한
+            with track_llm_call(stage, params["model"]) as call:  # 호출 시간 / 토큰 / 비용 기록 (/metrics)
+                response = await async_client.chat.completions.create(**params)
+                call.record_usage(getattr(response, "usage", None))
+                return response
+
+    async def fetch() -> str | None:
+        started = time.perf_counter()
+        try:
+            # 시간 제한 / hedging / 재시도 / 회로 차단기 적용
+            response = await llm_resilience.call(stage, attempt, breaker_key=params["model"])
+            model_router.record_call(route, time.perf_counter() - started, True)
         except Exception as e:
-            print(f"📅 {date} 이벤트 분석 중 오류: {e}")
-            events_by_date[date] = {
-                "date": date,
-                "events": [],
-                "summary": "분석 실패",
-                "emotion": "알 수 없음"
-            }
-    
-    return events_by_date
+            model_router.record_call(route, time.perf_counter() - started, False)
+            # OpenAI 장애로 응답을 못 받으면 만료된 캐시 응답이라도 있으면 그걸로 대신함
+            stale = await llm_cache.aget(cache_key, allow_stale=True) if cache_key is not None and is_upstream_failure(e) else None
+            if stale is None:
+                raise
+            print(f"⚠️ '{stage}' 단계 OpenAI 호출 실패로 이전 캐시 응답을 사용합니다: {e}")
+            record_stale_cache(stage, params["model"])
+            return stale
+        content = response.choices[0].message.content
+
+        # 빈 응답은 캐시하지 않음 (다음 호출에서 다시 시도)
+        if cache_key is not None and content:
+            await llm_cache.aset(cache_key, content)
+        return content
+
+    if cache_key is None:
+        return await fetch()
+    # 같은 호출이 이미 진행 중이면 새로 보내지 않고 그 응답을 함께 씀
+    return await llm_flight.do(cache_key, fetch, stage)
+
+# 한 번의 요청으로 응답 후보를 n 개 받아오는 호출 함수 (일관성 테스트의 다중 샘플 모드용)
+# - 서로 다른 응답을 얻는 것이 목적이므로 캐시를 사용하지 않음
+async def call_llm_samples(stage: str, n: int, **params) -> list[str | None]:
+    params, route = await route_llm_params(stage, params)
+    llm_cache.record_bypass()
+
+    async def attempt():
+        async with llm_semaphore:
+            await llm_rate_limiter.acquire()
+            with track_llm_call(stage, params["model"]) as call:
+                response = await async_client.chat.completions.create(**params, n=n)
+                call.record_usage(getattr(response, "usage", None))
+                return response
+
+    # n 개를 한꺼번에 받는 호출은 단일 응답보다 오래 걸리고 중복 비용도 크므로 hedging 하지 않음
+    response = await llm_resilience.call(stage, attempt, breaker_key=params["model"], hedge=False)
+    choices = sorted(response.choices, key=lambda choice: choice.index)
+    return [choice.message.content for choice in choices]
+
+# 응답을 토큰 단위로 받아오는 스트리밍 버전의 호출 함수 (SSE 엔드포인트용)
+async def call_llm_stream(stage: str, on_delta: Callable[[str], Any], **params) -> str | None:
+    """
+    stream=True 로 채팅 완성 API를 호출하고, 텍스트 조각이 올 때마다 on_delta 를 호출합니다.
+    캐시에 있는 응답이면 전체 텍스트를 한 번에 on_delta 로 전달합니다.
+
+    Returns:
+        str | None: 전체 응답 텍스트
+    """
+    params, route = await route_llm_params(stage, params)
+    cache_key = None
+    if _is_cacheable(stage, params):
+        cache_key = make_cache_key(params)
+        cached = await llm_cache.aget(cache_key)
+        if cached is not None:
+            record_cache_hit(stage, params["model"])
+            on_delta(cached)
+            return cached
+    else:
+        llm_cache.record_bypass()
+
+    parts = []
+    streamed = False   # 이 호출이 직접 스트리밍했는지 (진행 중인 같은 호출에 합쳐졌으면 False)
+
+    async def attempt():
+        nonlocal streamed
+        streamed = True
+        async with llm_semaphore:
+            await llm_rate_limiter.acquire()
+            with track_llm_call(stage, params["model"]) as call:
+                # 마지막 청크로 토큰 사용량을 받음 (include_usage)
+                stream = await async_client.chat.completions.create(
+                    **params, stream=True, stream_options={"include_usage": True}
+                )
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        call.record_usage(chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        on_delta(delta)
+
+    # 스트리밍은 같은 요청을 두 번 보내면 텍스트 조각이 섞이므로 hedging 하지 않고,
+    # 이미 클라이언트에 일부를 보냈으면 재시도하지 않음
+    async def fetch() -> str | None:
+        started = time.perf_counter()
+        try:
+            await llm_resilience.call(stage, attempt, breaker_key=params["model"], hedge=False,
+                                      can_retry=lambda: not parts)
+        except Exception:
+            model_router.record_call(route, time.perf_counter() - started, False)
+            raise
+        model_router.record_call(route, time.perf_counter() - started, True)
+        content = "".join(parts) or None
+
+        if cache_key is not None and content:
+            await llm_cache.aset(cache_key, content)
+        return content
+
+    if cache_key is None:
+        return await fetch()
+    # 같은 호출이 이미 진행 중이면(스트리밍 / 일반 호출 모두) 끝난 뒤 전체 텍스트를 한 번에 전달 (캐시 적중과 같음)
+    content = await llm_flight.do(cache_key, fetch, stage)
+    if not streamed and content:
+        on_delta(content)
+    return content
 
 # 프롬프트와 대화 내용의 충돌을 감지하는 함수
-def detect_prompt_conflict(user_prompt: str, kakao_text: str) -> dict:
+async def detect_prompt_conflict(user_prompt: str, kakao_text: str) -> dict:
     """
     사용자 프롬프트와 카카오톡 대화 내용 간의 충돌을 감지합니다.
     
@@ -265,17 +653,16 @@ def detect_prompt_conflict(user_prompt: str, kakao_text: str) -> dict:
     """
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": conflict_detection_prompt}]
+        content = await call_llm(
+            "conflict",
+            messages=[{"role": "user", "content": conflict_detection_prompt}],
+            **json_output_params("conflict")
         )
         
-        content = response.choices[0].message.content
         if content is None:
             raise ValueError("API 응답이 비어있습니다")
             
-        result = json.loads(content)
-        return result
+        return parse_llm_json("conflict", content, defaults={"conflict_type": "none"})
     except Exception as e:
         print(f"충돌 감지 중 오류: {e}")
         return {
@@ -285,374 +672,1251 @@ def detect_prompt_conflict(user_prompt: str, kakao_text: str) -> dict:
             "suggestion": "충돌 감지 실패"
         }
 
-# 프롬프트 처리 로직을 개선한 일기 생성 함수
-def generate_diary_with_prompt_handling(data: DiaryRequest) -> dict:
+# 1단계: 요약 생성 (더 구체적인 프롬프트)
+def build_summary_params(data: DiaryRequest) -> dict:
+    summary_prompt = f"""
+    아래 카카오톡 대화를 분석하여 객관적이고 일관된 요약을 작성하세요.
+
+    대화 내용:
+    {data.kakao_text}
+
+    요약 작성 규칙:
+    1. 감정 표현 없이 사실만 기술
+    2. 주요 주제 1-2개 중심으로 요약
+    3. 2-3문장으로 제한
+    4. 구체적인 사건이나 활동 위주로 작성
+
+    다음 JSON 형식으로만 응답하세요:
+    {{
+      "summary": "구체적인 사건이나 활동을 중심으로 한 객관적 요약"
+    }}
     """
-    프롬프트 처리 로직이 포함된 개선된 일기 생성 함수
+
+    return dict(
+        messages=[{"role": "user", "content": summary_prompt}],
+        temperature=0.2,  # 일관성을 위해 temperature 더 낮춤
+        **json_output_params("summary")
+    )
+
+async def generate_summary(data: DiaryRequest) -> str:
+    summary_content = await call_llm("summary", **build_summary_params(data))
+    
+    if summary_content is None:
+        raise ValueError("요약 API 응답이 비어있습니다")
+
+    return parse_summary_content(summary_content)
+
+# 요약 API 응답에서 요약 문장을 꺼내는 함수 (JSON 이 아니면 응답 텍스트를 그대로 요약으로 사용)
+def parse_summary_content(summary_content: str, stage: str = "summary") -> str:
+    try:
+        summary = parse_llm_json(stage, summary_content)["summary"]
+    except JSONOutputError:
+        summary = ""
+    return summary or summary_content or "요약 생성 실패"
+
+# 3단계: 감성 일기 생성 (Few-Shot 예시 추가)
+def build_diary_prompt(data: DiaryRequest, summary: str, conflict_info: dict | None) -> str:
+    return f"""
+    당신은 카카오톡 대화를 분석하여, 주어진 규칙과 예시에 따라 일관된 감성 일기를 작성하는 전문가입니다.
+
+    ### 작성 규칙
+    1. 대화 내용을 객관적으로 분석하여 일관된 해석을 제공해야 합니다.
+    2. 감정은 대화의 맥락과 말투에서 추론하되, 과도한 추측은 지양해야 합니다.
+    3. 각 섹션은 명확한 역할과 구조를 가져야 하며, 2-3 문장으로 작성해야 합니다.
+    4. 사용자 의도가 있다면 최우선으로 고려하되, 대화 내용과의 일관성을 유지해야 합니다.
+
+    ### 예시 (이 구조와 스타일을 반드시 따르세요)
+    ---
+    #### 입력
+    - 대화 내용: "친구랑 영화보러 갔어. 완전 재밌었음! 근데 팝콘 너무 비싸더라 ㅠㅠ"
+    - 요약: "친구와 함께 영화를 관람했으며, 영화는 재미있었지만 팝콘 가격에 대한 아쉬움을 표현함."
+    - 사용자 의도: 없음
+    - 검색 기록: "주변 영화관"
+
+    #### 출력
+    {{
+      "상황설명": "친구와 함께 영화관에 방문하여 영화를 관람했습니다. 영화 자체는 매우 재미있게 즐겼지만, 매점에서 판매하는 팝콘의 가격이 예상보다 비싸다고 느꼈습니다.",
+      "감정표현": "영화에 대한 즐거움과 긍정적인 감정이 주를 이루고 있습니다. 동시에, 팝콘 가격에 대해서는 아쉬움과 약간의 불만 섞인 감정이 드러납니다.",
+      "공감과인정": "영화를 보며 즐거운 시간을 보내셨군요! 재미있는 영화는 하루를 특별하게 만들어주죠. 하지만 비싼 팝콘 가격에 아쉬움을 느끼는 마음도 충분히 이해됩니다.",
+      "따뜻한위로": "즐거운 경험에 작은 아쉬움이 더해져 속상하셨겠어요. 그래도 영화가 재미있었다니 정말 다행이에요. 그 즐거운 기억에 더 집중해보는 건 어떨까요?",
+      "실용적제안": "다음에는 영화관에 가기 전에 미리 간식을 준비하거나, 통신사 할인 등 팝콘을 저렴하게 구매할 수 있는 팁을 찾아보는 것도 좋은 방법이 될 수 있습니다."
+    }}
+    ---
+
+    ### 실제 작성
+    이제 아래 정보를 바탕으로 위 규칙과 예시를 따라 실제 일기를 작성해주세요.
+
+    #### 입력
+    - 대화 내용: {data.kakao_text}
+    - 요약: {summary}
+    - 사용자 의도: {data.user_prompt if data.use_prompt and data.user_prompt else "없음"}
+    - 검색 기록: {data.search_log}
+    {f"- 충돌 감지: {conflict_info['conflict_type']} (신뢰도: {conflict_info['confidence']:.2f})" if conflict_info and conflict_info['has_conflict'] else ""}
+
+    #### 출력 (이 JSON 형식만 생성하세요)
+    {{
+        "상황설명": "",
+        "감정표현": "",
+        "공감과인정": "",
+        "따뜻한위로": "",
+        "실용적제안": ""
+    }}
     """
+
+# 일기 생성 API 응답에서 JSON 본문을 파싱하는 함수
+def parse_diary_content(diary_content: str, stage: str = "diary") -> dict:
     try:
-        # 1단계: 요약 생성 (더 구체적인 프롬프트)
-        summary_prompt = f"""
-        아래 카카오톡 대화를 분석하여 객관적이고 일관된 요약을 작성하세요.
-
-        대화 내용:
-        {data.kakao_text}
-
-        요약 작성 규칙:
-        1. 감정 표현 없이 사실만 기술
-        2. 주요 주제 1-2개 중심으로 요약
-        3. 2-3문장으로 제한
-        4. 구체적인 사건이나 활동 위주로 작성
-
-        다음 JSON 형식으로만 응답하세요:
-        {{
-          "summary": "구체적인 사건이나 활동을 중심으로 한 객관적 요약"
-        }}
-        """
-
-        summary_response = client.chat.completions.create(
-            model="gpt-4o",  # 더 강력한 모델로 변경
-            messages=[{"role": "user", "content": summary_prompt}],
-            temperature=0.2  # 일관성을 위해 temperature 더 낮춤
+        return parse_llm_json(stage, diary_content)
+    except JSONOutputError as e:
+        raise HTTPException(status_code=500, detail=f"API 응답 파싱 실패: {e}")
+
+def build_diary_params(data: DiaryRequest, summary: str, conflict_info: dict | None) -> dict:
+    return dict(
+        messages=[
+            {"role": "user", "content": build_diary_prompt(data, summary, conflict_info)}
+        ],
+        temperature=0.2,  # 일관성을 위해 temperature 더 낮춤
+        max_tokens=1500,
+        **json_output_params("diary")
+    )
+
+async def generate_diary_sections(data: DiaryRequest, summary: str, conflict_info: dict | None,
+                                  on_delta: Callable[[str], Any] | None = None) -> dict:
+    params = build_diary_params(data, summary, conflict_info)
+    # on_delta 가 있으면 스트리밍으로 받아 텍스트 조각을 바로 전달 (SSE 엔드포인트)
+    if on_delta is not None:
+        diary_content = await call_llm_stream("diary", on_delta, **params)
+    else:
+        diary_content = await call_llm("diary", **params)
+
+    if diary_content is None:
+        raise ValueError("일기 생성 API 응답이 비어있습니다")
+
+    return parse_diary_content(diary_content)
+
+# 4단계: 감정 분석
+async def analyze_emotions(data: DiaryRequest, diary: dict) -> dict:
+    emotion_prompt = f"""
+    아래 카카오톡 대화와 일기 내용을 분석하여 감정 상태를 백분율로 평가해주세요.
+
+    대화 내용:
+    {data.kakao_text}
+
+    일기 내용:
+    {diary.get('감정표현', '')}
+
+    다음 JSON 형식으로만 응답하세요:
+    {{
+      "좋음": 0-100,
+      "평범함": 0-100,
+      "나쁨": 0-100
+    }}
+
+    평가 기준:
+    - 좋음: 긍정적이고 기쁜 감정이 주를 이룸
+    - 평범함: 중립적이거나 일상적인 감정
+    - 나쁨: 부정적이거나 슬픈 감정이 주를 이룸
+    - 세 값의 합은 100이 되어야 함
+    """
+
+    try:
+        emotion_content = await call_llm(
+            "emotion",
+            messages=[{"role": "user", "content": emotion_prompt}],
+            temperature=0.1,
+            **json_output_params("emotion")
         )
         
-        summary_content = summary_response.choices[0].message.content
-        if summary_content is None:
-            raise ValueError("요약 API 응답이 비어있습니다")
+        if emotion_content:
+            # 세 항목의 합이 100 근처인지도 품질 조건으로 확인
+            return parse_llm_json("emotion", emotion_content, check=lambda e: 95 <= sum(e.values()) <= 105)
+        return dict(DEFAULT_EMOTIONS)
+    except Exception as e:
+        print(f"감정 분석 실패: {e}")
+        return dict(DEFAULT_EMOTIONS)
+
+# 5단계: 키워드 추출
+async def extract_keywords(diary: dict) -> list:
+    keyword_prompt = f"""
+    아래 일기 내용에서 중요한 키워드를 추출해주세요.
+
+    일기 내용:
+    {diary.get('상황설명', '')} {diary.get('감정표현', '')} {diary.get('공감과인정', '')} {diary.get('따뜻한위로', '')} {diary.get('실용적제안', '')}
+
+    다음 JSON 형식으로만 응답하세요:
+    {{
+      "keywords": ["키워드1", "키워드2", "키워드3", "키워드4", "키워드5"]
+    }}
+
+    추출 규칙:
+    1. 명사 위주로 추출 (사람, 장소, 활동, 감정 등)
+    2. 3-8개의 키워드 추출
+    3. 한글 키워드만 사용
+    4. 구체적이고 의미있는 단어 선택
+    5. 중복되지 않는 키워드 선택
+    """
+
+    try:
+        keyword_content = await call_llm(
+            "keyword",
+            messages=[{"role": "user", "content": keyword_prompt}],
+            temperature=0.1,
+            **json_output_params("keyword")
+        )
         
-        try:
-            # AI 응답에서 순수 JSON만 추출
-            if "```json" in summary_content:
-                summary_content = summary_content.split("```json")[1].split("```")[0].strip()
-            
-            if not summary_content.startswith('{'):
-                # 응답이 JSON 형식이 아니면, AI가 요약만 텍스트로 보냈다고 가정
-                summary = summary_content
-            else:
-                summary = json.loads(summary_content)["summary"]
-
-        except json.JSONDecodeError as e:
-            print("--- ❌ 요약 JSON 파싱 오류 ---")
-            print(f"오류: {e}")
-            print("원본 요약 API 응답:")
-            print(f"```\n{summary_content}\n```")
-            print("--------------------")
-            # 파싱 실패 시, 원본 텍스트를 요약으로 사용
-            summary = summary_content if summary_content else "요약 생성 실패"
-        except (KeyError, IndexError):
-             # "summary" 키가 없는 경우, 원본 텍스트를 요약으로 사용
-            summary = summary_content
+        if keyword_content:
+            keywords_data = parse_llm_json("keyword", keyword_content, check=lambda d: 1 <= len(d["keywords"]) <= 10)
+            return keywords_data["keywords"]
+        return []
+    except Exception as e:
+        print(f"키워드 추출 실패: {e}")
+        return []
+
+# 4-5단계 로컬 버전: OpenAI 호출 없이 어휘 사전 / TF-IDF 로 계산 (수 ms 이내)
+def analyze_emotions_local(data: DiaryRequest, diary: dict) -> dict:
+    return local_analyzer.emotions.score(data.kakao_text, diary.get('감정표현', ''))
+
+def extract_keywords_local(diary: dict) -> list:
+    return local_analyzer.keywords.extract(" ".join(diary.get(section, "") for section in DIARY_SECTIONS))
+
+# 긴 대화의 청크 하나를 요약하는 프롬프트 (map 단계)
+def build_chunk_summary_prompt(chunk: str, index: int, total: int) -> str:
+    return f"""
+    아래는 하루 동안의 카카오톡 대화 중 {index + 1}/{total} 번째 부분입니다.
+    다른 부분의 요약과 이어 붙여서 일기 작성에 사용하므로, 이 부분에서 있었던 일을 시간 순서대로 정리해주세요.
 
+    대화 내용:
+    {chunk}
+
+    정리 규칙:
+    1. 구체적인 사건, 활동, 약속, 등장 인물 위주로 3-6문장으로 작성
+    2. 대화에 드러난 감정이나 말투(기쁨, 피곤함, 짜증 등)는 짧게 함께 기록
+    3. 대화에 없는 내용은 추측하지 않음
+
+    다음 JSON 형식으로만 응답하세요:
+    {{
+      "summary": "이 부분의 정리 내용"
+    }}
+    """
+
+async def summarize_chat_chunk(chunk: str, index: int, total: int) -> str:
+    content = await call_llm(
+        "summary_chunk",
+        messages=[{"role": "user", "content": build_chunk_summary_prompt(chunk, index, total)}],
+        temperature=0.2,
+        **json_output_params("summary_chunk")
+    )
+    if not content:
+        raise ValueError(f"대화 청크 {index + 1}/{total} 요약 API 응답이 비어있습니다")
+    return parse_summary_content(content, "summary_chunk")
+
+# 대화 내용이 단계별 토큰 예산을 넘으면 청크별 요약(map-reduce)으로 압축한 요청을 만드는 함수
+# - 예산 안이면 LLM 호출 없이 원래 요청을 그대로 반환
+async def condense_chat(data: DiaryRequest, stages: list[str]) -> tuple[DiaryRequest, dict]:
+    kakao_text, report = await prompt_budget.fit(data.kakao_text, stages, summarize_chat_chunk)
+    report["stages"] = stages
+    report["tokens_saved"] = tokens_saved(report, len(stages))
+    if report["condensed"]:
+        print(f"✂️ 대화 압축: {report['raw_tokens']} → {report['prompt_tokens']} 토큰 "
+              f"(청크 {report['chunks']}개, 절약 {report['tokens_saved']} 토큰)")
+        data = data.model_copy(update={"kakao_text": kakao_text})
+    return data, report
+
+# 일기 생성 파이프라인의 단계 그래프를 정의하는 함수
+# - 요약과 충돌 감지는 원본 대화만 필요하므로 동시에 실행
+# - 감정 분석과 키워드 추출은 일기 생성이 끝난 뒤 동시에 실행
+#
+# - 대화가 토큰 예산을 넘으면 condense 단계에서 먼저 압축하고, 이후 단계는 압축된 대화를 사용
+#
+#              ┌── summary ──┐               ┌── emotion
+#   condense ──┤             ├── diary ──────┤
+#              └── conflict ─┘               └── keyword
+def build_diary_stages(data: DiaryRequest, on_diary_delta: Callable[[str], Any] | None = None) -> list[Stage]:
+    use_conflict = bool(data.user_prompt and data.use_prompt)
+    use_local = data.analysis == "local"
+    chat_stages = ["summary", "conflict", "diary", "emotion"] if use_conflict else ["summary", "diary", "emotion"]
+    if use_local:
+        chat_stages.remove("emotion")  # 로컬 감정 분석은 프롬프트 토큰 예산과 상관없음
+
+    async def conflict_stage(r):
         # 2단계: 프롬프트 충돌 감지 (프롬프트가 있는 경우)
-        conflict_info = None
-        if data.user_prompt and data.use_prompt:
-            conflict_info = detect_prompt_conflict(data.user_prompt, data.kakao_text)
-            print(f"🔍 충돌 감지 결과: {conflict_info}")
-
-        # 3단계: 감성 일기 생성 (Few-Shot 예시 추가)
-        diary_prompt = f"""
-        당신은 카카오톡 대화를 분석하여, 주어진 규칙과 예시에 따라 일관된 감성 일기를 작성하는 전문가입니다.
-
-        ### 작성 규칙
-        1. 대화 내용을 객관적으로 분석하여 일관된 해석을 제공해야 합니다.
-        2. 감정은 대화의 맥락과 말투에서 추론하되, 과도한 추측은 지양해야 합니다.
-        3. 각 섹션은 명확한 역할과 구조를 가져야 하며, 2-3 문장으로 작성해야 합니다.
-        4. 사용자 의도가 있다면 최우선으로 고려하되, 대화 내용과의 일관성을 유지해야 합니다.
-
-        ### 예시 (이 구조와 스타일을 반드시 따르세요)
-        ---
-        #### 입력
-        - 대화 내용: "친구랑 영화보러 갔어. 완전 재밌었음! 근데 팝콘 너무 비싸더라 ㅠㅠ"
-        - 요약: "친구와 함께 영화를 관람했으며, 영화는 재미있었지만 팝콘 가격에 대한 아쉬움을 표현함."
-        - 사용자 의도: 없음
-        - 검색 기록: "주변 영화관"
-
-        #### 출력
-        {{
-          "상황설명": "친구와 함께 영화관에 방문하여 영화를 관람했습니다. 영화 자체는 매우 재미있게 즐겼지만, 매점에서 판매하는 팝콘의 가격이 예상보다 비싸다고 느꼈습니다.",
-          "감정표현": "영화에 대한 즐거움과 긍정적인 감정이 주를 이루고 있습니다. 동시에, 팝콘 가격에 대해서는 아쉬움과 약간의 불만 섞인 감정이 드러납니다.",
-          "공감과인정": "영화를 보며 즐거운 시간을 보내셨군요! 재미있는 영화는 하루를 특별하게 만들어주죠. 하지만 비싼 팝콘 가격에 아쉬움을 느끼는 마음도 충분히 이해됩니다.",
-          "따뜻한위로": "즐거운 경험에 작은 아쉬움이 더해져 속상하셨겠어요. 그래도 영화가 재미있었다니 정말 다행이에요. 그 즐거운 기억에 더 집중해보는 건 어떨까요?",
-          "실용적제안": "다음에는 영화관에 가기 전에 미리 간식을 준비하거나, 통신사 할인 등 팝콘을 저렴하게 구매할 수 있는 팁을 찾아보는 것도 좋은 방법이 될 수 있습니다."
-        }}
-        ---
-
-        ### 실제 작성
-        이제 아래 정보를 바탕으로 위 규칙과 예시를 따라 실제 일기를 작성해주세요.
-
-        #### 입력
-        - 대화 내용: {data.kakao_text}
-        - 요약: {summary}
-        - 사용자 의도: {data.user_prompt if data.use_prompt and data.user_prompt else "없음"}
-        - 검색 기록: {data.search_log}
-        {f"- 충돌 감지: {conflict_info['conflict_type']} (신뢰도: {conflict_info['confidence']:.2f})" if conflict_info and conflict_info['has_conflict'] else ""}
-
-        #### 출력 (이 JSON 형식만 생성하세요)
-        {{
-            "상황설명": "",
-            "감정표현": "",
-            "공감과인정": "",
-            "따뜻한위로": "",
-            "실용적제안": ""
-        }}
-        """
-
-        diary_response = client.chat.completions.create(
-            model="gpt-4o",  # 더 강력한 모델로 변경
-            messages=[
-                {"role": "user", "content": diary_prompt}
-            ],
-            temperature=0.2,  # 일관성을 위해 temperature 더 낮춤
-            max_tokens=1500
-        )
+        if not use_conflict:
+            return None
+        condensed, _ = r["condense"]
+        conflict_info = await detect_prompt_conflict(condensed.user_prompt, condensed.kakao_text)
+        print(f"🔍 충돌 감지 결과: {conflict_info}")
+        return conflict_info
+
+    return [
+        Stage("condense", lambda _: condense_chat(data, chat_stages)),
+        Stage("summary", lambda r: generate_summary(r["condense"][0]), deps=("condense",)),
+        Stage("conflict", conflict_stage, deps=("condense",)),
+        Stage("diary", lambda r: generate_diary_sections(r["condense"][0], r["summary"], r["conflict"], on_diary_delta),
+              deps=("condense", "summary", "conflict")),
+        Stage("emotion", lambda r: (run_in_threadpool(analyze_emotions_local, data, r["diary"]) if use_local
+                                    else analyze_emotions(r["condense"][0], r["diary"])), deps=("condense", "diary")),
+        Stage("keyword", lambda r: (run_in_threadpool(extract_keywords_local, r["diary"]) if use_local
+                                    else extract_keywords(r["diary"])), deps=("diary",)),
+    ]
 
-        diary_content = diary_response.choices[0].message.content
-        if diary_content is None:
-            raise ValueError("일기 생성 API 응답이 비어있습니다")
+# 단계별 결과를 기존 응답 형태(일기 섹션 + summary/emotions/conflict_info/keywords)로 합치는 함수
+def assemble_diary(results: dict) -> dict:
+    diary = dict(results["diary"])
+    diary["summary"] = results["summary"]
+    diary["emotions"] = results["emotion"]
+    # 충돌 정보 추가
+    if results["conflict"]:
+        diary["conflict_info"] = results["conflict"]
+    diary["keywords"] = results["keyword"]
+    diary["token_budget"] = results["condense"][1]
+    return diary
 
-        try:
-            # AI 응답에서 순수 JSON만 추출 (가끔 ```json ... ``` 형식으로 감싸서 옴)
-            if "```json" in diary_content:
-                diary_content = diary_content.split("```json")[1].split("```")[0].strip()
-            
-            # 중괄호가 누락된 경우를 대비한 처리
-            if not diary_content.startswith('{'):
-                diary_content = '{' + diary_content
-            if not diary_content.endswith('}'):
-                # 가장 마지막 '}'를 찾아 그 이후를 자름
-                last_brace_index = diary_content.rfind('}')
-                if last_brace_index != -1:
-                    diary_content = diary_content[:last_brace_index+1]
-
-            diary = json.loads(diary_content)
-        except json.JSONDecodeError as e:
-            print("--- ❌ JSON 파싱 오류 ---")
-            print(f"오류: {e}")
-            print("원본 API 응답:")
-            print(f"```\n{diary_content}\n```")
-            print("--------------------")
-            raise HTTPException(status_code=500, detail=f"API 응답 파싱 실패: {e}")
+# 프롬프트 처리 로직을 개선한 일기 생성 함수
+async def generate_diary_with_prompt_handling(data: DiaryRequest,
+                                             on_stage_done: Callable[[str, Any], Any] | None = None,
+                                             on_diary_delta: Callable[[str], Any] | None = None) -> dict:
+    """
+    프롬프트 처리 로직이 포함된 개선된 일기 생성 함수
+    - 단계 그래프(build_diary_stages)를 실행하고 단계별 소요 시간을 stage_timings 로 함께 반환
+    - on_stage_done / on_diary_delta 를 넘기면 단계 완료와 일기 텍스트 조각을 실시간으로 전달받을 수 있음 (SSE 스트리밍용)
+    """
+    try:
+        with request_deadline(LLM_REQUEST_BUDGET):  # 모든 단계가 같은 시간 예산을 나눠 씀
+            results, timings = await run_stages(build_diary_stages(data, on_diary_delta), on_stage_done)
+        observe_stage_timings(timings)
+        diary = assemble_diary(results)
+        diary["stage_timings"] = timings
+        return diary
 
-        diary["summary"] = summary
-        
-        # 4단계: 감정 분석 추가
-        emotion_prompt = f"""
-        아래 카카오톡 대화와 일기 내용을 분석하여 감정 상태를 백분율로 평가해주세요.
-
-        대화 내용:
-        {data.kakao_text}
-
-        일기 내용:
-        {diary.get('감정표현', '')}
-
-        다음 JSON 형식으로만 응답하세요:
-        {{
-          "좋음": 0-100,
-          "평범함": 0-100,
-          "나쁨": 0-100
-        }}
-
-        평가 기준:
-        - 좋음: 긍정적이고 기쁜 감정이 주를 이룸
-        - 평범함: 중립적이거나 일상적인 감정
-        - 나쁨: 부정적이거나 슬픈 감정이 주를 이룸
-        - 세 값의 합은 100이 되어야 함
-        """
+    except (HTTPException, OverloadedError, DeadlineExceededError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        try:
-            emotion_response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": emotion_prompt}],
-                temperature=0.1
-            )
-            
-            emotion_content = emotion_response.choices[0].message.content
-            if emotion_content:
-                if "```json" in emotion_content:
-                    emotion_content = emotion_content.split("```json")[1].split("```")[0].strip()
-                
-                emotions = json.loads(emotion_content)
-                diary["emotions"] = emotions
-            else:
-                diary["emotions"] = {"좋음": 33, "평범함": 34, "나쁨": 33}
-        except Exception as e:
-            print(f"감정 분석 실패: {e}")
-            diary["emotions"] = {"좋음": 33, "평범함": 34, "나쁨": 33}
-        
-        # 충돌 정보 추가
-        if conflict_info:
-            diary["conflict_info"] = conflict_info
-
-        # 5단계: 키워드 추출 추가
-        keyword_prompt = f"""
-        아래 일기 내용에서 중요한 키워드를 추출해주세요.
-
-        일기 내용:
-        {diary.get('상황설명', '')} {diary.get('감정표현', '')} {diary.get('공감과인정', '')} {diary.get('따뜻한위로', '')} {diary.get('실용적제안', '')}
-
-        다음 JSON 형식으로만 응답하세요:
-        {{
-          "keywords": ["키워드1", "키워드2", "키워드3", "키워드4", "키워드5"]
-        }}
-
-        추출 규칙:
-        1. 명사 위주로 추출 (사람, 장소, 활동, 감정 등)
-        2. 3-8개의 키워드 추출
-        3. 한글 키워드만 사용
-        4. 구체적이고 의미있는 단어 선택
-        5. 중복되지 않는 키워드 선택
-        """
+# 일기 섹션 이름 (응답 JSON 키 순서)
+DIARY_SECTIONS = ["상황설명", "감정표현", "공감과인정", "따뜻한위로", "실용적제안"]
+
+# 감정 분석에 실패했을 때의 기본값
+DEFAULT_EMOTIONS = {"좋음": 33, "평범함": 34, "나쁨": 33}
+
+# 단계별 출력 JSON 스키마
+# - response_format 으로 요청하고(LLM_JSON_MODE), 응답도 같은 스키마로 파싱 / 보정 (parse_llm_json)
+# - enum 은 마지막 값이 보정 기본값
+EMOTION_SCHEMA = object_schema({label: {"type": "integer"} for label in DEFAULT_EMOTIONS})
+CONFLICT_SCHEMA = object_schema({
+    "has_conflict": {"type": "boolean"},
+    "conflict_type": {"type": "string", "enum": ["감정_충돌", "상황_충돌", "의도_충돌", "none"]},
+    "confidence": {"type": "number"},
+    "suggestion": {"type": "string"},
+})
+SUMMARY_SCHEMA = object_schema({"summary": {"type": "string"}})
+STAGE_SCHEMAS = {
+    "event": object_schema({
+        "date": {"type": "string"},
+        "events": {"type": "array", "items": {"type": "string"}},
+        "summary": {"type": "string"},
+        "emotion": {"type": "string", "enum": ["긍정", "부정", "중립"]},
+    }),
+    "conflict": CONFLICT_SCHEMA,
+    "summary": SUMMARY_SCHEMA,
+    "summary_chunk": SUMMARY_SCHEMA,
+    "diary": object_schema({section: {"type": "string"} for section in DIARY_SECTIONS}),
+    "emotion": EMOTION_SCHEMA,
+    "keyword": object_schema({"keywords": {"type": "array", "items": {"type": "string"}}}),
+}
+
+# 단일 호출(fused) 모드의 출력 JSON 스키마
+# - 요약, 일기 다섯 섹션, 감정 백분율, 키워드(, 충돌 감지)를 한 번의 응답으로 받음
+def build_fused_schema(use_conflict: bool) -> dict:
+    properties = {
+        "summary": {"type": "string"},
+        **{section: {"type": "string"} for section in DIARY_SECTIONS},
+        "emotions": EMOTION_SCHEMA,
+        "keywords": {"type": "array", "items": {"type": "string"}},
+    }
+    if use_conflict:
+        properties["conflict_info"] = CONFLICT_SCHEMA
+    return object_schema(properties)
+
+def build_fused_prompt(data: DiaryRequest, use_conflict: bool) -> str:
+    conflict_rule = """
+    5. conflict_info: 사용자 의도와 대화 내용이 충돌하는지 판단합니다.
+       - 감정_충돌: 의도의 감정과 대화의 감정이 반대 / 상황_충돌: 상황이 다름 / 의도_충돌: 맥락이 맞지 않음 / none: 충돌 없음
+       - confidence 는 0.0-1.0, suggestion 에는 해결 방안이나 설명을 씁니다.""" if use_conflict else ""
+    return f"""
+    당신은 카카오톡 대화를 분석하여 요약, 감성 일기, 감정 분석, 키워드를 한 번에 작성하는 전문가입니다.
+
+    ### 작성 규칙
+    1. summary: 감정 표현 없이 사실만, 주요 주제 1-2개 중심으로 2-3문장으로 요약합니다.
+    2. 일기 섹션(상황설명, 감정표현, 공감과인정, 따뜻한위로, 실용적제안): 대화 내용을 객관적으로 분석하여 각 2-3문장으로 작성합니다.
+       감정은 대화의 맥락과 말투에서 추론하되 과도한 추측은 지양하고, 사용자 의도가 있다면 대화 내용과의 일관성을 유지하며 최우선으로 고려합니다.
+    3. emotions: 좋음(긍정적이고 기쁜 감정) / 평범함(중립적이거나 일상적인 감정) / 나쁨(부정적이거나 슬픈 감정)을 백분율로 평가하며 세 값의 합은 100입니다.
+    4. keywords: 일기 내용에서 명사 위주(사람, 장소, 활동, 감정 등)로 중복 없이 3-8개의 한글 키워드를 추출합니다.{conflict_rule}
+    응답은 위 항목들을 키로 하는 JSON 객체로만 작성합니다.
+
+    ### 예시
+    - 대화 내용: "친구랑 영화보러 갔어. 완전 재밌었음! 근데 팝콘 너무 비싸더라 ㅠㅠ"
+    - 상황설명: "친구와 함께 영화관에 방문하여 영화를 관람했습니다. 영화 자체는 매우 재미있게 즐겼지만, 매점에서 판매하는 팝콘의 가격이 예상보다 비싸다고 느꼈습니다."
+    - 따뜻한위로: "즐거운 경험에 작은 아쉬움이 더해져 속상하셨겠어요. 그래도 영화가 재미있었다니 정말 다행이에요. 그 즐거운 기억에 더 집중해보는 건 어떨까요?"
+
+    ### 입력
+    - 대화 내용: {data.kakao_text}
+    - 사용자 의도: {data.user_prompt if use_conflict else "없음"}
+    - 검색 기록: {data.search_log}
+    """
 
+# 단일 호출(fused) 모드 일기 생성 함수
+async def generate_diary_fused(data: DiaryRequest) -> dict:
+    """
+    요약 / 일기 / 감정 / 키워드를 JSON 스키마로 제한된 한 번의 API 호출로 생성합니다.
+    - 반환 형태는 generate_diary_with_prompt_handling 과 같음 (섹션 + summary/emotions/conflict_info/keywords/stage_timings)
+    """
+    use_conflict = bool(data.user_prompt and data.use_prompt)
+
+    async def fused_stage(r):
+        condensed, _ = r["condense"]
+        content = await call_llm(
+            "fused",
+            messages=[{"role": "user", "content": build_fused_prompt(condensed, use_conflict)}],
+            temperature=0.2,
+            max_tokens=2000,
+            **json_output_params("fused", build_fused_schema(use_conflict)),
+        )
+        if content is None:
+            raise ValueError("일기 생성 API 응답이 비어있습니다")
         try:
-            keyword_response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": keyword_prompt}],
-                temperature=0.1
-            )
-            
-            keyword_content = keyword_response.choices[0].message.content
-            if keyword_content:
-                if "```json" in keyword_content:
-                    keyword_content = keyword_content.split("```json")[1].split("```")[0].strip()
-                
-                keywords_data = json.loads(keyword_content)
-                diary["keywords"] = keywords_data.get("keywords", [])
-            else:
-                diary["keywords"] = []
-        except Exception as e:
-            print(f"키워드 추출 실패: {e}")
-            diary["keywords"] = []
+            return parse_llm_json("fused", content, build_fused_schema(use_conflict), defaults={"emotions": DEFAULT_EMOTIONS})
+        except JSONOutputError as e:
+            raise HTTPException(status_code=500, detail=f"API 응답 파싱 실패: {e}")
 
+    try:
+        with request_deadline(LLM_REQUEST_BUDGET):
+            results, timings = await run_stages([
+                Stage("condense", lambda _: condense_chat(data, ["fused"])),
+                Stage("fused", fused_stage, deps=("condense",)),
+            ])
+        observe_stage_timings(timings)
+        fused = results["fused"]
+
+        # 다단계 모드와 같은 키 순서로 응답 구성
+        diary = {section: fused.get(section, "") for section in DIARY_SECTIONS}
+        diary["summary"] = fused.get("summary", "")
+        diary["emotions"] = fused.get("emotions") or dict(DEFAULT_EMOTIONS)
+        if use_conflict:
+            diary["conflict_info"] = fused.get("conflict_info")
+        diary["keywords"] = fused.get("keywords", [])
+        diary["token_budget"] = results["condense"][1]
+        diary["stage_timings"] = timings
         return diary
 
+    except (HTTPException, OverloadedError, DeadlineExceededError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 요청의 mode 값에 따라 다단계(pipeline) 또는 단일 호출(fused) 방식으로 일기 생성
+async def generate_diary_by_mode(data: DiaryRequest) -> dict:
+    if data.mode == "fused":
+        return await generate_diary_fused(data)
+    return await generate_diary_with_prompt_handling(data)
+
+# 같은 일기 요청인지 판단하는 키 (줄바꿈 형식 / 줄 끝 공백 / 앞뒤 빈 줄만 다른 대화는 같은 요청으로 봄)
+def diary_request_key(data: DiaryRequest) -> str:
+    fields = data.model_dump()
+    fields["kakao_text"] = "\n".join(line.rstrip() for line in data.kakao_text.strip().splitlines())
+    for name in ("search_log", "user_prompt"):
+        if fields[name] is not None:
+            fields[name] = fields[name].strip()
+    return make_cache_key(fields)
+
+# 실행 슬롯을 잡고 일기를 생성하되, 같은 요청이 이미 실행 중이면 그 결과를 함께 쓰는 함수
+# - 합쳐진 요청은 실행 슬롯을 쓰지 않음 (재시도가 몰려도 대기열을 채우지 않음)
+async def generate_diary_coalesced(data: DiaryRequest) -> dict:
+    async def run() -> dict:
+        async with pipeline_admission.slot():
+            return await generate_diary_by_mode(data)
+
+    if is_cache_bypassed():
+        return await run()
+    return await diary_flight.do(diary_request_key(data), run, data.mode)
+
+# 일기 저장소에 넣을 날짜("YYYY-MM-DD")를 정하는 함수
+# - "2025-01-20" 형식은 그대로 / 기존 "20일" 형식은 오늘 이전의 가장 가까운 그 일(day) / 날짜가 없으면 오늘
+def diary_date(target_date: str | None) -> str:
+    today = datetime.now().date()
+    if target_date and re.fullmatch(r"\d{4}-\d{2}-\d{2}", target_date):
+        return target_date
+    if target_date and target_date.endswith("일") and target_date[:-1].isdigit():
+        day, year, month = int(target_date[:-1]), today.year, today.month
+        for _ in range(12):
+            if day <= today.day or (year, month) != (today.year, today.month):
+                try:
+                    return today.replace(year=year, month=month, day=day).isoformat()
+                except ValueError:
+                    pass   # 그 달에 없는 날짜 (예: 2월 30일) 면 이전 달
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return today.isoformat()
+
+# 일기의 집계 기록 키 (사용자 + 대화방 + 날짜마다 하나인 일기는 "" → 다시 만들면 이전 값을 대체, 나머지는 일기마다 따로)
+def diary_rollup_item(user_id: str | None, chat_id: str | None, diary_id: int) -> str:
+    return "" if has_day_key(user_id, chat_id) else str(diary_id)
+
+# 생성한 일기를 일기 저장소에 저장하고 diary_id 를 붙이는 함수 (저장에 실패해도 일기 응답은 그대로)
+# - 같은 날짜의 일·주·월 집계도 함께 갱신
+# - 사용자 ID 와 chat_id 가 모두 있을 때만 같은 대화방 / 날짜의 이전 일기를 대체하고, 아니면 새 일기로 추가
+async def save_diary(diary: dict, user_id: str | None, chat_id: str | None = None,
+                     target_date: str | None = None) -> None:
+    def save() -> int:
+        room_id = chat_store.room_of(chat_id) if chat_id else ""
+        date = diary_date(target_date)
+        diary_id = diary_store.save(diary, user_id or "", room_id, chat_id, date)
+        rollup_store.record("diary", user_id or "", room_id, date, diary_fact(diary),
+                            diary_rollup_item(user_id, chat_id, diary_id))
+        return diary_id
+
+    try:
+        diary["diary_id"] = await run_in_threadpool(save)
+    except Exception as e:
+        print(f"📔 일기 저장 중 오류: {e}")
+
 # ✅ 2. 요약 + 감정 분석 포함된 감성 일기 생성
 @app.post("/generate-diary")
-def generate_diary(data: DiaryRequest):
+async def generate_diary(data: DiaryRequest, user_id: str | None = None):
     """
     개선된 프롬프트 처리 로직을 사용하는 감성 일기 생성 엔드포인트
+    - 같은 내용의 요청이 동시에 들어오면 한 번만 생성해서 함께 응답
+    - 만든 일기는 오늘 날짜의 새 일기로 일기 저장소에 저장 (diary_id, 붙여넣은 텍스트라 같은 날의 다른 일기를 덮어쓰지 않음)
     """
-    diary = generate_diary_with_prompt_handling(data)
+    diary = await generate_diary_coalesced(data)
+    await save_diary(diary, user_id)
     return ORJSONResponse(content=diary)
     
+# 저장된 대화(chat_id)에서 특정 날짜의 대화 내용을 꺼내는 함수
+# - target_date: "2025-01-20" 형식 또는 기존 "20일" 형식 (None 이면 가장 최근 날짜)
+def load_stored_chat_text(chat_id: str, target_date: str | None) -> tuple[str, str]:
+    try:
+        date = chat_store.resolve_date(chat_id, target_date)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"chat_id '{chat_id}' 에 해당하는 대화가 없습니다.")
+    if date is None:
+        raise HTTPException(status_code=400, detail="유효한 날짜가 없습니다.")
+
+    kakao_text = "\n".join(chat_store.get_messages(chat_id, date))
+    if not kakao_text.strip():
+        raise HTTPException(status_code=400, detail=f"{date}에 유효한 대화가 없습니다.")
+    return kakao_text, date
+
+# 업로드된 카카오톡 파일에서 일기 생성에 쓸 대화 내용을 꺼내는 함수
+# - /auto-diary, /auto-diary/stream, /consistency-test 에서 공통으로 사용
+async def load_kakao_text(file: UploadFile | None, use_date_analysis: bool, target_date: str | None,
+                          chat_id: str | None = None) -> tuple[str, str | None]:
+    """
+    업로드 파일을 읽어 날짜별 분석 여부에 맞게 대화 내용을 추출합니다.
+    - chat_id 가 있으면 파일 대신 /chats 로 미리 올려둔 대화에서 해당 날짜 메시지를 바로 꺼냄
+
+    Returns:
+        tuple: (대화 내용, 실제로 사용한 날짜 - 날짜별 분석이 아니면 None)
+    """
+    if chat_id:
+        return await run_in_threadpool(load_stored_chat_text, chat_id, target_date)
+    if file is None:
+        raise HTTPException(status_code=400, detail="file 또는 chat_id 중 하나는 필요합니다.")
+
+    # 파일 전체를 한 번에 읽어 디코딩하지 않고, 청크 단위로 읽으면서 바로 파싱 (대용량 파일 메모리 절약)
+    await file.seek(0)
+    lines = iter_file_blocks(file.file)
+
+    if use_date_analysis:
+        # 날짜별 분석 모드
+        chat_by_date = await run_in_threadpool(extract_chat_by_date, lines, target_date)
+        
+        if not chat_by_date:
+            raise HTTPException(status_code=400, detail="날짜별 대화가 감지되지 않았습니다.")
+        
+        # 특정 날짜가 지정되지 않았으면 가장 최근 날짜 사용
+        if target_date is None:
+            available_dates = list(chat_by_date.keys())
+            if available_dates:
+                target_date = available_dates[-1]  # 가장 최근 날짜
+            else:
+                raise HTTPException(status_code=400, detail="유효한 날짜가 없습니다.")
+        
+        # 해당 날짜의 대화 내용
+        if target_date is not None:
+            kakao_text = get_chat_for_date(chat_by_date, target_date)
+        else:
+            raise HTTPException(status_code=400, detail="유효한 날짜가 없습니다.")
+        
+        if not kakao_text.strip():
+            raise HTTPException(status_code=400, detail=f"{target_date}에 유효한 대화가 없습니다.")
+            
+    else:
+        # 기존 방식 (최근 30줄)
+        kakao_text = await run_in_threadpool(extract_today_chat, lines)
+        target_date = None
+
+    if not kakao_text.strip():
+        raise HTTPException(status_code=400, detail="카카오톡 대화가 감지되지 않았습니다.")
+
+    return kakao_text, target_date
+
 @app.post("/auto-diary")
 async def auto_diary(
-    file: UploadFile = File(...), 
+    file: UploadFile | None = File(None), 
     search_log: str = "없음",
     user_prompt: str | None = None,
     use_prompt: bool = True,
     use_date_analysis: bool = False,  # 날짜별 분석 사용 여부
-    target_date: str | None = None    # 특정 날짜 (use_date_analysis가 True일 때)
+    target_date: str | None = None,   # 특정 날짜 (use_date_analysis가 True일 때, chat_id 사용 시 "2025-01-20" 형식도 가능)
+    mode: Literal["pipeline", "fused"] = "pipeline",   # 일기 생성 방식 (fused: 한 번의 호출로 생성)
+    analysis: Literal["llm", "local"] = "llm",         # 감정 분석 / 키워드 추출 방식 (local: OpenAI 호출 없이 계산)
+    chat_id: str | None = None,       # /chats 로 미리 올려둔 대화 ID (파일 대신 사용)
+    user_id: str | None = None        # 일기 저장소에서 일기를 구분하는 사용자 ID
 ):
     """
     카카오톡 파일 업로드와 프롬프트 처리를 통합한 자동 일기 생성 엔드포인트
     날짜별 분석 옵션 추가
     """
     try:
-        content = (await file.read()).decode("utf-8", errors="ignore")
-
-        if use_date_analysis:
-            # 날짜별 분석 모드
-            chat_by_date = extract_chat_by_date(content, target_date)
-            
-            if not chat_by_date:
-                raise HTTPException(status_code=400, detail="날짜별 대화가 감지되지 않았습니다.")
-            
-            # 특정 날짜가 지정되지 않았으면 가장 최근 날짜 사용
-            if target_date is None:
-                available_dates = list(chat_by_date.keys())
-                if available_dates:
-                    target_date = available_dates[-1]  # 가장 최근 날짜
-                else:
-                    raise HTTPException(status_code=400, detail="유효한 날짜가 없습니다.")
-            
-            # 해당 날짜의 대화 내용
-            if target_date is not None:
-                kakao_text = get_chat_for_date(chat_by_date, target_date)
-            else:
-                raise HTTPException(status_code=400, detail="유효한 날짜가 없습니다.")
-            
-            if not kakao_text.strip():
-                raise HTTPException(status_code=400, detail=f"{target_date}에 유효한 대화가 없습니다.")
-                
-        else:
-            # 기존 방식 (최근 30줄)
-            kakao_text = extract_today_chat(content)
-            target_date = None
-
-        if not kakao_text.strip():
-            raise HTTPException(status_code=400, detail="카카오톡 대화가 감지되지 않았습니다.")
+        kakao_text, target_date = await load_kakao_text(file, use_date_analysis, target_date, chat_id)
 
         # DiaryRequest 객체 생성하여 통합 처리
         diary_request = DiaryRequest(
             kakao_text=kakao_text,
             search_log=search_log,
             user_prompt=user_prompt,
-            use_prompt=use_prompt
+            use_prompt=use_prompt,
+            mode=mode,
+            analysis=analysis
         )
 
-        # 개선된 프롬프트 처리 로직으로 일기 생성
-        diary = generate_diary_with_prompt_handling(diary_request)
+        # 개선된 프롬프트 처리 로직으로 일기 생성 (동시 실행 수를 넘으면 대기열에서 기다리거나 503으로 거절)
+        # - 같은 대화 / 옵션의 요청이 이미 실행 중이면 그 결과를 함께 씀
+        diary = await generate_diary_coalesced(diary_request)
         diary["kakao_text"] = kakao_text
         
         # 날짜 정보 추가
         if target_date:
             diary["target_date"] = target_date
 
+        await save_diary(diary, user_id, chat_id, target_date)
         return ORJSONResponse(content=diary)
 
+    except (HTTPException, OverloadedError, DeadlineExceededError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 단계가 끝날 때마다 결과를 바로 보내주는 SSE 스트리밍 버전의 자동 일기 생성 엔드포인트
+@app.post("/auto-diary/stream")
+async def auto_diary_stream(
+    file: UploadFile | None = File(None),
+    search_log: str = "없음",
+    user_prompt: str | None = None,
+    use_prompt: bool = True,
+    use_date_analysis: bool = False,
+    target_date: str | None = None,
+    analysis: Literal["llm", "local"] = "llm",
+    chat_id: str | None = None,
+    user_id: str | None = None
+):
+    """
+    /auto-diary 와 같은 입력을 받아 text/event-stream 으로 진행 상황을 보냅니다.
+
+    이벤트 순서:
+        summary → (conflict) → section_delta / section (일기 섹션별, 토큰이 도착하는 대로)
+        → emotions / keywords → done (마지막 이벤트, /auto-diary 응답과 같은 내용)
+        오류가 나면 error 이벤트를 보내고 종료
+    """
+    kakao_text, target_date = await load_kakao_text(file, use_date_analysis, target_date, chat_id)
+    diary_request = DiaryRequest(
+        kakao_text=kakao_text,
+        search_log=search_log,
+        user_prompt=user_prompt,
+        use_prompt=use_prompt,
+        analysis=analysis
+    )
+
+    # 스트림이 끝날 때까지 실행 슬롯을 유지 (과부하면 스트림 시작 전에 503)
+    slot = AsyncExitStack()
+    await slot.enter_async_context(pipeline_admission.slot())
+
+    queue: asyncio.Queue = asyncio.Queue()
+    section_parser = SectionStreamParser(DIARY_SECTIONS)
+
+    def on_diary_delta(delta: str):
+        for event, payload in section_parser.feed(delta):
+            queue.put_nowait((event, payload))
+
+    def on_stage_done(stage: str, result):
+        if stage == "summary":
+            queue.put_nowait(("summary", {"summary": result}))
+        elif stage == "conflict" and result:
+            queue.put_nowait(("conflict", result))
+        elif stage == "diary":
+            for event, payload in section_parser.finish(result):
+                queue.put_nowait((event, payload))
+        elif stage == "emotion":
+            queue.put_nowait(("emotions", result))
+        elif stage == "keyword":
+            queue.put_nowait(("keywords", {"keywords": result}))
+
+    async def produce():
+        try:
+            diary = await generate_diary_with_prompt_handling(diary_request, on_stage_done, on_diary_delta)
+            diary["kakao_text"] = kakao_text
+            if target_date:
+                diary["target_date"] = target_date
+            await save_diary(diary, user_id, chat_id, target_date)
+            queue.put_nowait(("done", diary))
+        except HTTPException as e:
+            queue.put_nowait(("error", {"detail": e.detail}))
+        except Exception as e:
+            queue.put_nowait(("error", {"detail": str(e)}))
+
+    async def event_stream():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                event, payload = await queue.get()
+                yield format_sse(event, payload)
+                if event in ("done", "error"):
+                    break
+        finally:
+            # 클라이언트가 연결을 끊으면 남은 단계 취소
+            task.cancel()
+            await slot.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(slot.aclose),  # 스트림이 시작되지 못한 경우에도 슬롯 반환
+    )
+
+# 카카오톡 파일을 한 번만 올려서 파싱/저장하고 chat_id 를 받는 엔드포인트
+@app.post("/chats")
+async def upload_chat(file: UploadFile = File(...), previous_chat_id: str | None = None):
+    """
+    대화 파일을 파싱해서 날짜별로 저장하고 chat_id 와 날짜 목록을 반환합니다.
+    - 같은 내용의 파일을 다시 올리면 다시 파싱하지 않고 기존 chat_id 를 반환 (reused: true)
+    - 이후 /auto-diary, /consistency-test 에 chat_id + target_date("2025-01-20")로 요청하면 파일을 다시 보낼 필요 없음
+    - changes: 이전에 올린 같은 대화방 파일(previous_chat_id, 없으면 날짜 블록이 가장 많이 겹치는 대화)과 비교한
+      새 날짜 / 바뀐 날짜 / 그대로인 날짜 (그대로인 날짜는 /event-timeline, /jobs 에서 저장된 결과를 씀)
+    """
+    await file.seek(0)
+    with track_chat_parse("store") as parsed:
+        result = await run_in_threadpool(chat_store.ingest_file, file.file, file.filename, previous_chat_id)
+        parsed["messages"] = result["message_count"]
+    if not result["dates"]:
+        raise HTTPException(status_code=400, detail="날짜별 대화가 감지되지 않았습니다.")
+    return ORJSONResponse(content=result)
+
+# 저장된 대화의 날짜 목록 조회 엔드포인트
+@app.get("/chats/{chat_id}/dates")
+async def chat_dates(chat_id: str):
+    """
+    저장된 대화에 있는 날짜와 날짜별 메시지 수를 반환합니다. (LLM 호출 없음)
+    """
+    try:
+        info = await run_in_threadpool(chat_store.describe, chat_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"chat_id '{chat_id}' 에 해당하는 대화가 없습니다.")
+    return ORJSONResponse(content={"chat_id": chat_id, "dates": info["dates"], "message_count": info["message_count"]})
+
+# 저장된 대화 삭제 엔드포인트
+@app.delete("/chats/{chat_id}")
+async def delete_chat(chat_id: str):
+    deleted = await run_in_threadpool(chat_store.delete, chat_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"chat_id '{chat_id}' 에 해당하는 대화가 없습니다.")
+    return ORJSONResponse(content={"chat_id": chat_id, "deleted": True})
+
+# 여러 날짜의 대화를 {"2025-01-20": [메시지, ...]} 형태로 꺼내는 함수 (업로드 파일 또는 저장된 chat_id)
+async def load_chat_by_date(file: UploadFile | None, chat_id: str | None,
+                            start_date: str | None, end_date: str | None) -> dict:
+    if chat_id:
+        try:
+            dates = await run_in_threadpool(chat_store.list_dates, chat_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"chat_id '{chat_id}' 에 해당하는 대화가 없습니다.")
+        dates = [d for d in dates if (not start_date or d >= start_date) and (not end_date or d <= end_date)]
+        chat_by_date = await run_in_threadpool(chat_store.get_messages_by_date, chat_id, dates)
+    elif file is not None:
+        await file.seek(0)
+        with track_chat_parse("timeline") as parsed:
+            chat_by_date = await run_in_threadpool(collect_messages_by_date, iter_file_blocks(file.file), start_date, end_date)
+            parsed["messages"] = sum(len(messages) for messages in chat_by_date.values())
+    else:
+        raise HTTPException(status_code=400, detail="file 또는 chat_id 중 하나는 필요합니다.")
+
+    if not any(chat_by_date.values()):
+        raise HTTPException(status_code=400, detail="분석할 날짜별 대화가 없습니다.")
+    return chat_by_date
+
+# 이벤트 분석할 날짜와 저장된 분석 결과를 쓸 날짜를 나누는 함수
+# - 저장된 대화(chat_id)는 저장할 때 계산한 지문만 먼저 읽고, 새로 분석할 날짜의 메시지만 꺼냄
+# - 업로드 파일은 전체를 파싱한 뒤 날짜마다 지문을 계산
+async def load_event_days(file: UploadFile | None, chat_id: str | None, start_date: str | None,
+                          end_date: str | None, reuse: bool = True) -> tuple[dict, dict, dict]:
+    """
+    Returns:
+        tuple: (분석할 날짜별 대화 {날짜: [메시지]}, 저장된 결과 {날짜: 결과}, 날짜별 지문 {날짜: 지문})
+    """
+    if chat_id:
+        try:
+            info = await run_in_threadpool(chat_store.describe, chat_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"chat_id '{chat_id}' 에 해당하는 대화가 없습니다.")
+        fingerprints = {
+            d["date"]: d["fingerprint"] for d in info["dates"]
+            if d["message_count"] and (not start_date or d["date"] >= start_date) and (not end_date or d["date"] <= end_date)
+        }
+        if not fingerprints:
+            raise HTTPException(status_code=400, detail="분석할 날짜별 대화가 없습니다.")
+        stored = await run_in_threadpool(day_results.get_many, "event", fingerprints) if reuse else {}
+        pending = [date for date in fingerprints if date not in stored]
+        chat_by_date = await run_in_threadpool(chat_store.get_messages_by_date, chat_id, pending) if pending else {}
+    else:
+        chat_by_date = await load_chat_by_date(file, None, start_date, end_date)
+        fingerprints = {date: fingerprint_day(date, messages) for date, messages in chat_by_date.items() if messages}
+        stored = await run_in_threadpool(day_results.get_many, "event", fingerprints) if reuse else {}
+        chat_by_date = {date: chat_by_date[date] for date in fingerprints if date not in stored}
+
+    record_day_results("event", len(stored), len(chat_by_date))
+    return chat_by_date, stored, fingerprints
+
+# 새로 분석한 날짜의 이벤트 결과를 저장하는 함수 (분석에 실패한 날짜는 다음 요청에서 다시 분석)
+def save_event_results(fingerprints: dict, events_by_date: dict) -> None:
+    analyzed = {date: result for date, result in events_by_date.items() if result != _failed_event_result(date)}
+    if analyzed:
+        day_results.put_many("event", fingerprints, analyzed)
+
+# 이벤트 분석 결과를 일·주·월 집계에 반영하는 함수 (저장된 결과를 쓴 날짜도 반영, 바뀌지 않은 날짜는 집계가 그대로)
+# - 사용자 ID 와 chat_id 가 모두 있으면 대화방 / 날짜마다 하나 (다시 분석하면 이전 값을 대체)
+# - 아니면 누구의 어느 대화인지 알 수 없어 날짜 블록 지문마다 따로 기록 (다른 업로드끼리는 더하고, 같은 내용을 다시 올리면 대체)
+def record_event_rollups(user_id: str | None, chat_id: str | None, events_by_date: dict, fingerprints: dict) -> None:
+    room_id = chat_store.room_of(chat_id) if chat_id else ""
+    keyed = has_day_key(user_id, chat_id)
+    for date, result in events_by_date.items():
+        if result != _failed_event_result(date):
+            rollup_store.record("event", user_id or "", room_id, date, event_fact(result),
+                                "" if keyed else fingerprints[date])
+
+# 여러 날짜의 주요 이벤트를 한 번에 분석하는 타임라인 엔드포인트
+@app.post("/event-timeline")
+async def event_timeline(
+    file: UploadFile | None = File(None),
+    chat_id: str | None = None,
+    start_date: str | None = None,   # "2025-01-18" 형식 (None 이면 처음부터)
+    end_date: str | None = None,     # "2025-01-20" 형식 (None 이면 끝까지)
+    reuse: bool = True,              # False 면 저장된 결과를 쓰지 않고 모든 날짜를 다시 분석
+    user_id: str | None = None       # 일·주·월 집계에서 결과를 구분하는 사용자 ID
+):
+    """
+    대화에 있는 날짜별 주요 이벤트/요약/감정을 분석해서 날짜 순서대로 반환합니다.
+    - 날짜들을 동시에 분석하며 (EVENT_ANALYSIS_CONCURRENCY), 실패한 날짜는 "분석 실패" 결과로 채워짐
+    - 이전에 분석한 날짜 블록과 내용이 같은 날짜는 저장된 결과를 사용 (reused_dates)
+    """
+    chat_by_date, events_by_date, fingerprints = await load_event_days(file, chat_id, start_date, end_date, reuse)
+    reused_dates = sorted(events_by_date)
+    if chat_by_date:
+        async with pipeline_admission.slot():
+            analyzed = await analyze_events_by_date(chat_by_date)
+        await run_in_threadpool(save_event_results, fingerprints, analyzed)
+        events_by_date.update(analyzed)
+    events_by_date = {date: events_by_date[date] for date in sorted(events_by_date)}
+    await run_in_threadpool(record_event_rollups, user_id, chat_id, events_by_date, fingerprints)
+    return ORJSONResponse(content={
+        "chat_id": chat_id,
+        "timeline": list(events_by_date.values()),
+        "dates": list(events_by_date.keys()),
+        "reused_dates": reused_dates,
+    })
+
+# 분석이 끝나는 날짜부터 바로 보내주는 SSE 스트리밍 버전의 타임라인 엔드포인트
+@app.post("/event-timeline/stream")
+async def event_timeline_stream(
+    file: UploadFile | None = File(None),
+    chat_id: str | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    reuse: bool = True,
+    user_id: str | None = None
+):
+    """
+    /event-timeline 과 같은 입력을 받아 text/event-stream 으로 보냅니다.
+
+    이벤트 순서:
+        day (저장된 결과를 쓰는 날짜 먼저 "reused": true, 이후 날짜 하나의 분석이 끝날 때마다 완료 순서)
+        → done ({"dates": 날짜 순서 목록, "reused_dates": 저장된 결과를 쓴 날짜})
+    """
+    chat_by_date, stored, fingerprints = await load_event_days(file, chat_id, start_date, end_date, reuse)
+
+    slot = AsyncExitStack()
+    if chat_by_date:
+        await slot.enter_async_context(pipeline_admission.slot())
+
+    async def event_stream():
+        try:
+            finished = []
+            await run_in_threadpool(record_event_rollups, user_id, chat_id, stored, fingerprints)
+            for date in sorted(stored):
+                finished.append(date)
+                yield format_sse("day", {"date": date, "result": stored[date], "reused": True})
+            async for date, result in iter_events_by_date(chat_by_date):
+                finished.append(date)
+                await run_in_threadpool(save_event_results, fingerprints, {date: result})
+                await run_in_threadpool(record_event_rollups, user_id, chat_id, {date: result}, fingerprints)
+                yield format_sse("day", {"date": date, "result": result, "reused": False})
+            yield format_sse("done", {"dates": sorted(finished), "reused_dates": sorted(stored)})
+        finally:
+            await slot.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(slot.aclose),  # 스트림이 시작되지 못한 경우에도 슬롯 반환
+    )
+
+# 백그라운드 작업에서 날짜 하나의 일기를 만드는 함수 (JobRunner 워커가 호출)
+# - 만든 일기는 날짜 블록 지문 + 옵션으로 저장해서 다음에 같은 날짜 블록이 오면 다시 만들지 않음
+async def run_diary_job_item(chat_id: str, date: str, options: dict) -> dict:
+    current_endpoint.set("job")  # 지표에서 백그라운드 작업 호출을 구분
+    kakao_text, date = await run_in_threadpool(load_stored_chat_text, chat_id, date)
+    request_options = {name: value for name, value in options.items() if name != "user_id"}
+    diary = await generate_diary_by_mode(DiaryRequest(kakao_text=kakao_text, **request_options))
+    diary["target_date"] = date
+    await save_diary(diary, options.get("user_id"), chat_id, date)
+    fingerprints = await run_in_threadpool(chat_store.fingerprints, chat_id, [date])
+    await run_in_threadpool(day_results.put_many, "diary", fingerprints, {date: diary}, make_cache_key(options))
+    return diary
+
+job_runner = JobRunner(
+    job_store, run_diary_job_item,
+    workers=env_int("JOB_WORKERS", 2), stale_after=env_float("JOB_WORKER_TIMEOUT", 30.0),
+)
+
+# 여러 날짜의 일기를 한꺼번에 만드는 백그라운드 작업 등록 엔드포인트
+@app.post("/jobs")
+async def create_diary_job(
+    file: UploadFile | None = File(None),
+    chat_id: str | None = None,
+    start_date: str | None = None,   # "2025-01-18" 형식 (None 이면 처음부터)
+    end_date: str | None = None,     # "2025-01-20" 형식 (None 이면 끝까지)
+    search_log: str = "없음",
+    user_prompt: str | None = None,
+    use_prompt: bool = True,
+    mode: Literal["pipeline", "fused"] = "pipeline",
+    analysis: Literal["llm", "local"] = "llm",
+    reuse: bool = True,   # False 면 저장된 일기를 쓰지 않고 모든 날짜를 다시 생성
+    user_id: str | None = None
+):
+    """
+    범위 안의 날짜마다 일기를 만드는 작업을 등록하고 바로 job_id 를 반환합니다.
+    - 파일을 올리면 /chats 처럼 먼저 저장한 뒤 chat_id 로 작업을 만듦 (서버가 재시작되어도 이어서 처리)
+    - 같은 옵션으로 이미 일기를 만든 날짜 블록(이전에 올린 파일에도 있던 날짜)은 저장된 일기로 바로 완료 (reused_dates)
+    - 진행 상황은 GET /jobs/{job_id} 로 조회하거나 GET /jobs/{job_id}/events (SSE) 로 구독
+    """
+    if chat_id is None:
+        if file is None:
+            raise HTTPException(status_code=400, detail="file 또는 chat_id 중 하나는 필요합니다.")
+        await file.seek(0)
+        chat_id = (await run_in_threadpool(chat_store.ingest_file, file.file, file.filename))["chat_id"]
+
+    try:
+        info = await run_in_threadpool(chat_store.describe, chat_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"chat_id '{chat_id}' 에 해당하는 대화가 없습니다.")
+    fingerprints = {
+        d["date"]: d["fingerprint"] for d in info["dates"]
+        if d["message_count"] and (not start_date or d["date"] >= start_date) and (not end_date or d["date"] <= end_date)
+    }
+    if not fingerprints:
+        raise HTTPException(status_code=400, detail="범위 안에 대화가 있는 날짜가 없습니다.")
+
+    options = {"search_log": search_log, "user_prompt": user_prompt, "use_prompt": use_prompt, "mode": mode,
+               "analysis": analysis, "user_id": user_id}
+    stored = await run_in_threadpool(day_results.get_many, "diary", fingerprints, make_cache_key(options)) if reuse else {}
+    pending = [date for date in fingerprints if date not in stored]
+    record_day_results("diary", len(stored), len(pending))
+    job_id = await run_in_threadpool(job_store.create_job, chat_id, pending, options, stored)
+    if pending:
+        job_runner.notify()
+    return ORJSONResponse(status_code=202, content={
+        "job_id": job_id, "chat_id": chat_id, "dates": list(fingerprints), "reused_dates": sorted(stored),
+    })
+
+# 작업 상태 / 날짜별 결과 조회 엔드포인트
+@app.get("/jobs/{job_id}")
+async def get_diary_job(job_id: str, include_results: bool = True):
+    job = await run_in_threadpool(job_store.get, job_id, include_results)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"job_id '{job_id}' 에 해당하는 작업이 없습니다.")
+    return ORJSONResponse(content=job)
+
+# 작업 진행 상황을 SSE 로 구독하는 엔드포인트
+@app.get("/jobs/{job_id}/events")
+async def diary_job_events(job_id: str):
+    """
+    이벤트 순서:
+        snapshot (현재 상태, 결과 제외) → item_started / item (날짜별 시작 / 결과) → done
+        이미 끝난 작업이면 snapshot 다음에 바로 done
+        다른 워커 프로세스가 처리 중인 작업은 JOB_EVENTS_POLL_INTERVAL 마다 바뀐 snapshot 으로 진행 상황 전달
+    """
+    queue = job_runner.subscribe(job_id)   # 조회와 구독 사이에 끝나는 항목을 놓치지 않도록 먼저 구독
+    job = await run_in_threadpool(job_store.get, job_id, False)
+    if job is None:
+        job_runner.unsubscribe(job_id, queue)
+        raise HTTPException(status_code=404, detail=f"job_id '{job_id}' 에 해당하는 작업이 없습니다.")
+
+    async def event_stream():
+        try:
+            yield format_sse("snapshot", job)
+            if job["status"] in FINISHED_STATES:
+                yield format_sse("done", {"job_id": job_id, "status": job["status"]})
+                return
+            progress = job["progress"]
+            while True:
+                try:
+                    event, payload = await asyncio.wait_for(queue.get(), timeout=JOB_EVENTS_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    # 다른 워커 프로세스가 처리한 항목은 이 프로세스로 이벤트가 오지 않으므로 저장소에서 다시 확인
+                    current = await run_in_threadpool(job_store.get, job_id, False)
+                    if current is None:
+                        break
+                    if current["progress"] != progress:
+                        progress = current["progress"]
+                        yield format_sse("snapshot", current)
+                    if current["status"] in FINISHED_STATES:
+                        yield format_sse("done", {"job_id": job_id, "status": current["status"]})
+                        break
+                    continue
+                yield format_sse(event, payload)
+                if event == "done":
+                    break
+        finally:
+            job_runner.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# 작업 취소 엔드포인트 (아직 시작하지 않은 날짜만 취소됨)
+@app.delete("/jobs/{job_id}")
+async def cancel_diary_job(job_id: str):
+    if not await job_runner.cancel(job_id):
+        raise HTTPException(status_code=404, detail=f"job_id '{job_id}' 에 해당하는 진행 중인 작업이 없습니다.")
+    return ORJSONResponse(content={"job_id": job_id, "cancelled": True})
+
+# 저장된 일기 조회 엔드포인트 (LLM 호출 없음)
+@app.get("/diaries")
+async def list_diaries(
+    user_id: str | None = None,
+    chat_id: str | None = None,      # 대화 파일 ID (같은 대화방을 다시 내보낸 파일의 일기도 함께 조회)
+    start_date: str | None = None,   # "2025-01-01" 형식 (양 끝 포함)
+    end_date: str | None = None,
+    month: str | None = None,        # "2025-01" 형식 (start_date / end_date 대신 한 달 범위)
+    emotion: Literal["좋음", "평범함", "나쁨"] | None = None,   # 대표 감정 (감정 비율이 가장 큰 라벨)
+    keyword: str | None = None,      # 일기 키워드와 정확히 같은 값
+    q: str | None = None,            # 본문 검색어 (공백으로 나눈 검색어가 모두 들어간 일기)
+    limit: int = 50,
+    offset: int = 0,
+    include_results: bool = False
+):
+    """
+    조건에 맞는 저장된 일기를 최근 날짜부터 반환합니다.
+    - 예: 이번 달 나쁨이 대표 감정인 날 → ?month=2025-01&emotion=나쁨 / 발표 이야기가 있는 일기 → ?q=발표
+    """
+    if month:
+        if not re.fullmatch(r"\d{4}-\d{2}", month):
+            raise HTTPException(status_code=400, detail="month 는 'YYYY-MM' 형식이어야 합니다.")
+        start_date, end_date = f"{month}-01", f"{month}-31"
+    room_id = None
+    if chat_id:
+        try:
+            room_id = await run_in_threadpool(chat_store.room_of, chat_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"chat_id '{chat_id}' 에 해당하는 대화가 없습니다.")
+    started = time.perf_counter()
+    result = await run_in_threadpool(
+        diary_store.query, user_id, room_id, start_date, end_date, emotion, keyword, q,
+        max(1, min(limit, 500)), max(0, offset), include_results,
+    )
+    result["query_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return ORJSONResponse(content=result)
+
+# 저장된 일기 하나 조회 엔드포인트 (일기 결과 전체 포함)
+@app.get("/diaries/{diary_id}")
+async def get_diary(diary_id: int):
+    diary = await run_in_threadpool(diary_store.get, diary_id)
+    if diary is None:
+        raise HTTPException(status_code=404, detail=f"diary_id '{diary_id}' 에 해당하는 일기가 없습니다.")
+    return ORJSONResponse(content=diary)
+
+# 저장된 일기 삭제 엔드포인트
+@app.delete("/diaries/{diary_id}")
+async def delete_diary(diary_id: int):
+    def delete() -> bool:
+        diary = diary_store.get(diary_id)
+        if diary is None or not diary_store.delete(diary_id):
+            return False
+        rollup_store.record("diary", diary["user_id"], diary["room_id"], diary["date"], None,
+                            diary_rollup_item(diary["user_id"], diary["chat_id"], diary_id))
+        return True
+
+    if not await run_in_threadpool(delete):
+        raise HTTPException(status_code=404, detail=f"diary_id '{diary_id}' 에 해당하는 일기가 없습니다.")
+    return ORJSONResponse(content={"diary_id": diary_id, "deleted": True})
+
+# 달력 / 감정 추이 화면용 기간 집계 조회 엔드포인트 (미리 계산한 집계만 읽음, LLM 호출 없음)
+@app.get("/rollups")
+async def get_rollups(
+    period: Literal["day", "week", "month"] = "day",
+    user_id: str | None = None,
+    chat_id: str | None = None,      # 대화 파일 ID (그 대화방만, 없으면 사용자의 모든 대화방)
+    start_date: str | None = None,   # "2025-01-01" 형식 (그 날짜가 속한 주 / 달부터)
+    end_date: str | None = None,
+    top_k: int = 5                   # 구간마다 돌려줄 키워드 수
+):
+    """
+    구간(일 / 주 / 월)마다 평균 감정 비율, 많이 나온 키워드, 이벤트 수를 오래된 구간부터 반환합니다.
+    - 기록이 없는 구간은 빠짐 / 주 구간 키는 그 주 월요일 날짜, 월 구간 키는 "YYYY-MM"
+    """
+    for value in (start_date, end_date):
+        if value and not re.fullmatch(r"\d{4}-\d{2}-\d{2}", value):
+            raise HTTPException(status_code=400, detail="start_date / end_date 는 'YYYY-MM-DD' 형식이어야 합니다.")
+    room_id = ALL_ROOMS
+    if chat_id:
+        try:
+            room_id = await run_in_threadpool(chat_store.room_of, chat_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"chat_id '{chat_id}' 에 해당하는 대화가 없습니다.")
+    buckets = await run_in_threadpool(
+        rollup_store.get_range, user_id or "", room_id, period, start_date, end_date, max(0, min(top_k, 50))
+    )
+    return ORJSONResponse(content={"period": period, "buckets": buckets})
+
+# 저장된 일기로 일기 집계를 다시 계산하는 엔드포인트 (집계가 생기기 전에 저장된 일기 반영 / 집계가 어긋났을 때)
+@app.post("/rollups/rebuild")
+async def rebuild_rollups():
+    def rebuild() -> dict:
+        diaries = rollup_store.rebuild_diaries(
+            (user_id, room_id, date, diary_rollup_item(user_id, chat_id, diary_id), result)
+            for diary_id, user_id, room_id, chat_id, date, result in diary_store.iter_results()
+        )
+        return {"diaries": diaries, **rollup_store.stats()}
+
+    return ORJSONResponse(content=await run_in_threadpool(rebuild))
+
 # 일관성 테스트를 위한 함수들
-def run_consistency_test(kakao_text: str, test_count: int = 5) -> dict:
+# - CONSISTENCY_MAX_CONCURRENCY: 일관성 테스트 하나가 동시에 실행하는 회차 수
+# - CONSISTENCY_SIMILARITY_METRIC: 섹션별 유사도 계산 방식 (jaccard / cosine)
+CONSISTENCY_MAX_CONCURRENCY = env_int("CONSISTENCY_MAX_CONCURRENCY", 3)
+SIMILARITY_METRIC = "cosine" if os.getenv("CONSISTENCY_SIMILARITY_METRIC", "").lower() == "cosine" else "jaccard"
+
+# 일관성 테스트용 요청 (프롬프트 없이 순수 대화만으로 테스트)
+def build_consistency_request(kakao_text: str) -> DiaryRequest:
+    return DiaryRequest(
+        kakao_text=kakao_text,
+        search_log="일관성 테스트용",
+        user_prompt=None,
+        use_prompt=False
+    )
+
+# 회차 하나의 결과를 일관성 분석에 쓰는 형태로 바꾸는 함수
+def to_trial_result(test_number: int, summary: str, diary: dict) -> dict:
+    return {
+        "test_number": test_number,
+        "summary": summary,
+        "situation": diary.get("상황설명", ""),
+        "emotion": diary.get("감정표현", ""),
+        "comfort": diary.get("따뜻한위로", ""),
+        "suggestion": diary.get("실용적제안", ""),
+        "empathy": diary.get("공감과인정", "")
+    }
+
+# 회차마다 전체 파이프라인을 독립적으로 실행하고, 끝나는 순서대로 결과를 돌려주는 함수
+async def iter_concurrent_trials(kakao_text: str, test_count: int):
+    limit = asyncio.Semaphore(max(1, CONSISTENCY_MAX_CONCURRENCY))
+
+    async def run_trial(test_number: int) -> dict:
+        async with limit:
+            # 매 회차마다 실제로 새 응답을 받아야 일관성을 측정할 수 있으므로 캐시를 사용하지 않음
+            try:
+                with bypass_cache():
+                    result = await generate_diary_with_prompt_handling(build_consistency_request(kakao_text))
+                print(f"✅ 테스트 {test_number}/{test_count} 완료")
+                return to_trial_result(test_number, result.get("summary", ""), result)
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                print(f"❌ 테스트 {test_number} 실패: {detail}")
+                return {"test_number": test_number, "error": str(detail)}
+
+    tasks = [asyncio.create_task(run_trial(i + 1)) for i in range(test_count)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# 요약 / 일기를 각각 한 번의 요청(n=test_count)으로 여러 개 받아오는 함수
+# - 요약 n개로 요약 일관성을, 첫 번째 요약을 공유한 일기 n개로 일기 섹션 일관성을 측정
+# - 일관성 분석에 쓰이지 않는 감정 분석 / 키워드 추출은 실행하지 않음 (프롬프트가 없으므로 충돌 감지도 없음)
+async def iter_multi_sample_trials(kakao_text: str, test_count: int):
+    data = build_consistency_request(kakao_text)
+    try:
+        summaries = [
+            parse_summary_content(content) if content else "요약 생성 실패"
+            for content in await call_llm_samples("summary", test_count, **build_summary_params(data))
+        ]
+        diary_contents = await call_llm_samples(
+            "diary", test_count, **build_diary_params(data, summaries[0], None)
+        )
+    except Exception as e:
+        print(f"❌ 다중 샘플 테스트 실패: {e}")
+        for i in range(test_count):
+            yield {"test_number": i + 1, "error": str(e)}
+        return
+
+    for i, content in enumerate(diary_contents):
+        try:
+            if not content:
+                raise ValueError("일기 생성 API 응답이 비어있습니다")
+            yield to_trial_result(i + 1, summaries[i] if i < len(summaries) else summaries[0],
+                                  parse_diary_content(content))
+        except Exception as e:
+            yield {"test_number": i + 1, "error": str(getattr(e, "detail", None) or e)}
+
+# 실행 방식에 맞는 회차 결과 이터레이터를 고르는 함수
+def iter_consistency_trials(kakao_text: str, test_count: int,
+                            strategy: Literal["concurrent", "multi_sample"] = "concurrent"):
+    print(f"🔄 일관성 테스트 시작: {test_count}회 실행 ({strategy})")
+    if strategy == "multi_sample":
+        return iter_multi_sample_trials(kakao_text, test_count)
+    return iter_concurrent_trials(kakao_text, test_count)
+
+async def run_consistency_test(kakao_text: str, test_count: int = 5,
+                               strategy: Literal["concurrent", "multi_sample"] = "concurrent") -> dict:
     """
     동일한 입력에 대해 여러 번 테스트하여 일관성을 검증합니다.
     
     Args:
         kakao_text: 테스트할 카카오톡 대화 내용
         test_count: 테스트 횟수 (기본값: 5)
+        strategy: 실행 방식
+            - concurrent: 회차마다 전체 파이프라인을 실행 (CONSISTENCY_MAX_CONCURRENCY 개씩 동시에)
+            - multi_sample: 요약 / 일기를 n=test_count 로 한 번씩만 요청 (호출 2번)
     
     Returns:
         dict: 일관성 테스트 결과
     """
-    results = []
-    
-    print(f"🔄 일관성 테스트 시작: {test_count}회 실행")
-    
-    for i in range(test_count):
-        try:
-            # DiaryRequest 객체 생성
-            diary_request = DiaryRequest(
-                kakao_text=kakao_text,
-                search_log="일관성 테스트용",
-                user_prompt=None,
-                use_prompt=False  # 프롬프트 없이 순수 대화만으로 테스트
-            )
-            
-            # 일기 생성
-            result = generate_diary_with_prompt_handling(diary_request)
-            results.append({
-                "test_number": i + 1,
-                "summary": result.get("summary", ""),
-                "situation": result.get("상황설명", ""),
-                "emotion": result.get("감정표현", ""),
-                "comfort": result.get("따뜻한위로", ""),
-                "suggestion": result.get("실용적제안", ""),
-                "empathy": result.get("공감과인정", "")
-            })
-            
-            print(f"✅ 테스트 {i+1}/{test_count} 완료")
-            
-        except Exception as e:
-            print(f"❌ 테스트 {i+1} 실패: {e}")
-            results.append({
-                "test_number": i + 1,
-                "error": str(e)
-            })
-    
+    results = [trial async for trial in iter_consistency_trials(kakao_text, test_count, strategy)]
+    results.sort(key=lambda r: r["test_number"])
     return analyze_consistency(results)
 
 def analyze_consistency(results: list) -> dict:
@@ -752,6 +2016,8 @@ def analyze_consistency(results: list) -> dict:
 def calculate_text_similarity(texts: list) -> float:
     """
     텍스트 리스트 간의 유사도를 계산합니다.
+    - 한국어에 맞게 글자 2-gram 집합의 Jaccard 유사도를 모든 쌍에 대해 한 번에 계산 (similarity 모듈)
+    - 텍스트가 많으면 (MINHASH_MIN_TEXTS 이상) MinHash 로 근사
     
     Args:
         texts: 비교할 텍스트 리스트
@@ -759,39 +2025,29 @@ def calculate_text_similarity(texts: list) -> float:
     Returns:
         float: 유사도 점수 (0.0 ~ 1.0)
     """
-    if len(texts) < 2:
-        return 1.0
-    
-    # 간단한 키워드 기반 유사도 계산
-    similarities = []
-    
-    for i in range(len(texts)):
-        for j in range(i + 1, len(texts)):
-            text1 = texts[i].lower()
-            text2 = texts[j].lower()
-            
-            # 공통 키워드 수 계산
-            words1 = set(text1.split())
-            words2 = set(text2.split())
-            
-            if len(words1) == 0 or len(words2) == 0:
-                similarity = 0.0
-            else:
-                common_words = words1.intersection(words2)
-                total_words = words1.union(words2)
-                similarity = len(common_words) / len(total_words)
-            
-            similarities.append(similarity)
-    
-    return sum(similarities) / len(similarities) if similarities else 0.0
+    return mean_pairwise_similarity(texts, metric=SIMILARITY_METRIC)
+
+# 일관성 테스트 응답에 넣는 입력 정보
+def build_consistency_input_info(kakao_text: str, target_date: str | None, use_date_analysis: bool,
+                                 chat_id: str | None, test_count: int, strategy: str) -> dict:
+    return {
+        "target_date": target_date,
+        "use_date_analysis": use_date_analysis or bool(chat_id),
+        "chat_id": chat_id,
+        "text_length": len(kakao_text),
+        "test_count": test_count,
+        "strategy": strategy
+    }
 
 # 일관성 테스트 엔드포인트
 @app.post("/consistency-test")
 async def consistency_test_endpoint(
-    file: UploadFile = File(...),
+    file: UploadFile | None = File(None),
     test_count: int = 5,
     target_date: str | None = None,
-    use_date_analysis: bool = False
+    use_date_analysis: bool = False,
+    chat_id: str | None = None,
+    strategy: Literal["concurrent", "multi_sample"] = "concurrent"
 ):
     """
     일관성 테스트를 수행하는 엔드포인트
@@ -801,55 +2057,71 @@ async def consistency_test_endpoint(
         test_count: 테스트 횟수 (기본값: 5)
         target_date: 특정 날짜 (use_date_analysis가 True일 때)
         use_date_analysis: 날짜별 분석 사용 여부
+        chat_id: /chats 로 미리 올려둔 대화 ID (있으면 파일 대신 사용)
+        strategy: concurrent(회차별 전체 파이프라인, 동시 실행) / multi_sample(n=test_count 로 한 번에 샘플링)
     """
     try:
-        content = (await file.read()).decode("utf-8", errors="ignore")
-        
-        if use_date_analysis:
-            # 날짜별 분석 모드
-            chat_by_date = extract_chat_by_date(content, target_date)
-            
-            if not chat_by_date:
-                raise HTTPException(status_code=400, detail="날짜별 대화가 감지되지 않았습니다.")
-            
-            # 특정 날짜가 지정되지 않았으면 가장 최근 날짜 사용
-            if target_date is None:
-                available_dates = list(chat_by_date.keys())
-                if available_dates:
-                    target_date = available_dates[-1]
-                else:
-                    raise HTTPException(status_code=400, detail="유효한 날짜가 없습니다.")
-            
-            # 해당 날짜의 대화 내용
-            if target_date is not None:
-                kakao_text = get_chat_for_date(chat_by_date, target_date)
-            else:
-                raise HTTPException(status_code=400, detail="유효한 날짜가 없습니다.")
-                
-        else:
-            # 기존 방식 (최근 30줄)
-            kakao_text = extract_today_chat(content)
-            target_date = None
-        
-        if not kakao_text.strip():
-            raise HTTPException(status_code=400, detail="카카오톡 대화가 감지되지 않았습니다.")
+        kakao_text, target_date = await load_kakao_text(file, use_date_analysis, target_date, chat_id)
         
         # 일관성 테스트 실행
-        test_result = run_consistency_test(kakao_text, test_count)
+        async with pipeline_admission.slot():
+            test_result = await run_consistency_test(kakao_text, test_count, strategy)
         
         # 추가 정보 포함
-        test_result["input_info"] = {
-            "target_date": target_date,
-            "use_date_analysis": use_date_analysis,
-            "text_length": len(kakao_text),
-            "test_count": test_count
-        }
+        test_result["input_info"] = build_consistency_input_info(
+            kakao_text, target_date, use_date_analysis, chat_id, test_count, strategy
+        )
         
         return ORJSONResponse(content=test_result)
         
+    except (HTTPException, OverloadedError, DeadlineExceededError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 회차가 끝날 때마다 결과를 바로 보내주는 SSE 스트리밍 버전의 일관성 테스트 엔드포인트
+@app.post("/consistency-test/stream")
+async def consistency_test_stream(
+    file: UploadFile | None = File(None),
+    test_count: int = 5,
+    target_date: str | None = None,
+    use_date_analysis: bool = False,
+    chat_id: str | None = None,
+    strategy: Literal["concurrent", "multi_sample"] = "concurrent"
+):
+    """
+    /consistency-test 와 같은 입력을 받아 text/event-stream 으로 보냅니다.
+
+    이벤트 순서:
+        trial (회차 하나가 끝날 때마다, 완료 순서) → done (/consistency-test 응답과 같은 내용)
+    """
+    kakao_text, target_date = await load_kakao_text(file, use_date_analysis, target_date, chat_id)
+
+    slot = AsyncExitStack()
+    await slot.enter_async_context(pipeline_admission.slot())
+
+    async def event_stream():
+        try:
+            results = []
+            async for trial in iter_consistency_trials(kakao_text, test_count, strategy):
+                results.append(trial)
+                yield format_sse("trial", trial)
+            results.sort(key=lambda r: r["test_number"])
+            test_result = analyze_consistency(results)
+            test_result["input_info"] = build_consistency_input_info(
+                kakao_text, target_date, use_date_analysis, chat_id, test_count, strategy
+            )
+            yield format_sse("done", test_result)
+        finally:
+            await slot.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(slot.aclose),  # 스트림이 시작되지 못한 경우에도 슬롯 반환
+    )
+
 # 일관성 테스트 정보 제공 엔드포인트
 @app.get("/consistency-test-info")
 async def consistency_test_info():
@@ -864,7 +2136,8 @@ async def consistency_test_info():
             "file": "카카오톡 txt 파일",
             "test_count": "테스트 횟수 (기본값: 5)",
             "target_date": "특정 날짜 (예: '18일')",
-            "use_date_analysis": "날짜별 분석 사용 여부"
+            "use_date_analysis": "날짜별 분석 사용 여부",
+            "strategy": "concurrent(회차별 전체 파이프라인을 동시에 실행) / multi_sample(요약·일기를 n=test_count 로 한 번씩만 요청)"
         },
         "output": {
             "consistency_score": "일관성 점수 (0.0 ~ 1.0)",
@@ -874,11 +2147,25 @@ async def consistency_test_info():
         },
         "usage_tips": [
             "test_count는 3~10 사이로 설정하는 것을 권장합니다",
+            "/consistency-test/stream 을 쓰면 회차별 결과를 끝나는 대로 받을 수 있습니다",
             "일관성 점수가 0.6 이상이면 양호한 수준입니다",
             "낮은 일관성은 프롬프트 개선이 필요할 수 있습니다"
         ]
     })
 
+# OpenAI 응답 캐시 상태 확인 엔드포인트
+@app.get("/cache-stats")
+async def cache_stats():
+    """
+    캐시 적중/미스 횟수와 저장된 항목 수를 반환하는 엔드포인트
+    """
+    # 디스크 캐시 항목 수 조회(COUNT)는 스레드풀에서 실행
+    return ORJSONResponse(content={
+        **await run_in_threadpool(llm_cache.stats),
+        "disabled_stages": sorted(CACHE_DISABLED_STAGES),
+        "max_temperature": CACHE_MAX_TEMPERATURE,
+    })
+
 # 날짜별 분석 기능 테스트 엔드포인트
 @app.get("/test-date-analysis")
 async def test_date_analysis():
@@ -889,12 +2176,13 @@ async def test_date_analysis():
         "message": "날짜별 분석 기능이 성공적으로 구현되었습니다!",
         "features": {
             "extract_chat_by_date": "카카오톡 대화를 날짜별로 구분",
-            "analyze_events_by_date": "각 날짜별 이벤트 분석",
+            "analyze_events_by_date": "각 날짜별 이벤트 분석 (날짜들을 동시에 분석)",
             "diary_by_date": "특정 날짜의 감성 일기 생성"
         },
         "endpoints": {
             "/auto-diary": "메인 기능 - 파일 업로드 + 모든 옵션",
             "/generate-diary": "텍스트 기반 일기 생성",
+            "/event-timeline": "여러 날짜의 이벤트 타임라인",
             "/test-date-analysis": "기능 테스트용"
         },
         "usage": {
@@ -913,21 +2201,110 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 요청별 엔드포인트 라벨 / 응답 시간 / 진행 중 요청 수 기록
+app.add_middleware(MetricsMiddleware)
+
+# 요청 처리 상태 지표 (/metrics 를 읽을 때마다 현재 값으로 갱신)
+pipeline_active_gauge = metrics_registry.register(Gauge("diary_pipeline_active", "실행 중인 일기 생성 요청 수"))
+pipeline_queued_gauge = metrics_registry.register(Gauge("diary_pipeline_queued", "실행을 기다리는 일기 생성 요청 수"))
+pipeline_rejected_gauge = metrics_registry.register(Gauge("diary_pipeline_rejected", "과부하로 거절된 요청 수 (서버 시작 후 누적)"))
+
+# Prometheus 수집용 지표 엔드포인트
+@app.get("/metrics")
+async def metrics():
+    """
+    LLM 단계별 호출 시간 / 토큰 / 예상 비용 / JSON 파싱 실패, 대화 파싱 시간, 엔드포인트별 응답 시간을
+    Prometheus 텍스트 형식으로 반환합니다.
+    """
+    load = pipeline_admission.stats()
+    pipeline_active_gauge.set(load["active"])
+    pipeline_queued_gauge.set(load["queued"])
+    pipeline_rejected_gauge.set(load["rejected"])
+    for key, breaker in llm_resilience.stats()["breakers"].items():
+        llm_circuit_state.set({"closed": 0, "half_open": 0.5, "open": 1}[breaker["state"]], key=key)
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# 모델 라우팅 정책과 경로(단계, 모델)별 호출 수 / 지연시간 / 응답 품질 조회
+@app.get("/model-routes")
+async def model_routes():
+    """
+    단계별 모델 등급 정책과, 실제로 선택된 경로별 통계를 반환합니다.
+    - quality: 응답이 요청한 형식(JSON 키, 감정 합계 등)에 맞은 비율
+    - reasons: 그 모델이 선택된 이유별 횟수 (default / input_size / load / latency_budget)
+    """
+    return ORJSONResponse(content=model_router.stats())
+
+# 로컬 키워드 추출기(TF-IDF)의 문서 빈도를 저장된 대화로 다시 계산하는 엔드포인트
+@app.post("/local-analysis/rebuild")
+async def rebuild_local_analysis(min_df: int = 2):
+    """
+    /chats 로 저장된 모든 대화의 날짜별 대화를 문서 하나로 보고 문서 빈도를 계산해 KEYWORD_DF_PATH 에 저장합니다.
+    - 바로 적용되므로 이후 analysis="local" 요청부터 새 문서 빈도를 사용
+    """
+    def rebuild():
+        return local_analyzer.rebuild(("\n".join(messages) for _, _, messages in chat_store.iter_days()), min_df)
+
+    stats = await run_in_threadpool(rebuild)
+    print(f"🔤 키워드 문서 빈도 재계산: 문서 {stats['documents']}개 / 단어 {stats['terms']}개")
+    return ORJSONResponse(content=stats)
+
+# 저장소(SQLite) 상태 확인 엔드포인트
+# - 전체 행 수 집계라 행이 많거나 다른 워커가 쓰기 잠금을 잡고 있으면 오래 걸릴 수 있으므로 스레드풀에서 실행
+@app.get("/store-stats")
+async def store_stats():
+    """
+    작업 큐 / 날짜별 결과 / 일기 / 집계 저장소의 항목 수를 반환하는 엔드포인트
+    """
+    def collect() -> dict:
+        return {
+            "jobs": job_store.stats(),
+            "day_results": day_results.stats(),
+            "diaries": diary_store.stats(),
+            "rollups": rollup_store.stats(),
+        }
+
+    return ORJSONResponse(content=await run_in_threadpool(collect))
+
 # 루트 엔드포인트 추가 (Flutter 앱에서 서버 상태 확인용)
 @app.get("/")
 async def root():
     """
     서버 상태 확인용 루트 엔드포인트
+    - LLM 호출이나 입장 제어를 거치지 않으므로 일기 생성 요청이 몰려도 바로 응답함
+    - 메모리 카운터만 반환 (디스크를 읽는 저장소 통계는 /store-stats)
     """
     return ORJSONResponse(content={
         "message": "감성 일기 생성 API 서버가 정상적으로 실행 중입니다!",
         "status": "running",
         "version": "1.0.0",
+        "load": pipeline_admission.stats(),
+        "rate_limit": llm_rate_limiter.stats(),
+        "http_pool": llm_http_pool.stats(),
+        "coalescing": {"request": diary_flight.stats(), "llm": llm_flight.stats()},
+        "resilience": llm_resilience.stats(),
         "available_endpoints": {
             "generate-diary": "POST - 텍스트 기반 일기 생성",
             "auto-diary": "POST - 파일 업로드 기반 자동 일기 생성",
+            "auto-diary/stream": "POST - 자동 일기 생성 (SSE 스트리밍, 단계별 결과를 바로 전송)",
             "consistency-test": "POST - 일관성 테스트",
+            "consistency-test/stream": "POST - 일관성 테스트 (SSE 스트리밍, 끝난 회차부터 전송)",
             "consistency-test-info": "GET - 일관성 테스트 정보",
+            "cache-stats": "GET - OpenAI 응답 캐시 통계",
+            "store-stats": "GET - 저장소(작업 큐 / 날짜별 결과 / 일기 / 집계) 항목 수",
+            "metrics": "GET - Prometheus 지표 (단계별 지연시간 / 토큰 / 비용)",
+            "model-routes": "GET - 단계별 모델 라우팅 정책과 경로별 지연시간 / 품질 통계",
+            "local-analysis/rebuild": "POST - 저장된 대화로 로컬 키워드 추출용 문서 빈도 다시 계산",
+            "chats": "POST - 대화 파일 업로드 (한 번 파싱 후 chat_id 로 재사용, 이전 파일과 바뀐 날짜 비교)",
+            "chats/{chat_id}/dates": "GET - 저장된 대화의 날짜 목록",
+            "event-timeline": "POST - 여러 날짜의 이벤트 타임라인 (날짜별 동시 분석)",
+            "event-timeline/stream": "POST - 이벤트 타임라인 (SSE 스트리밍, 끝난 날짜부터 전송)",
+            "jobs": "POST - 여러 날짜 일기 생성 작업 등록 (백그라운드 처리)",
+            "jobs/{job_id}": "GET - 작업 진행 상황 / 날짜별 결과 조회",
+            "jobs/{job_id}/events": "GET - 작업 진행 상황 구독 (SSE)",
+            "diaries": "GET - 저장된 일기 조회 (사용자 / 대화방 / 날짜 / 대표 감정 / 키워드 / 본문 검색)",
+            "diaries/{diary_id}": "GET - 저장된 일기 하나 조회 / DELETE - 삭제",
+            "rollups": "GET - 일 / 주 / 월 구간별 평균 감정 비율 / 키워드 / 이벤트 수 (달력 / 추이 화면용)",
+            "rollups/rebuild": "POST - 저장된 일기로 집계 다시 계산",
             "test-date-analysis": "GET - 날짜별 분석 테스트 정보"
         },
         "features": {
@@ -0,0 +1,419 @@
+# Prometheus 텍스트 형식으로 서버 지표를 내보내는 모듈 (/metrics)
+# - 외부 라이브러리 없이 카운터 / 게이지 / 히스토그램만 간단히 구현
+# - LLM 단계별 호출 시간, 토큰 사용량, 예상 비용, JSON 파싱 실패 수, 대화 파싱 시간, 엔드포인트별 응답 시간을 기록
+# - OpenAI 연결 풀(http_pool.py)의 새 연결 / 재사용 수, 연결 준비 시간, 풀 대기 시간과 포화 횟수도 기록
+# - 어떤 엔드포인트에서 발생한 호출인지는 contextvar 로 전달 (미들웨어가 요청마다 설정)
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# 현재 요청의 엔드포인트 (라우트 경로, 예: "/auto-diary") / 마지막으로 호출한 모델 (JSON 파싱 실패 기록용)
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="none")
+last_model: ContextVar[str] = ContextVar("last_model", default="unknown")
+
+# 모델별 100만 토큰당 가격 (USD, 입력 / 출력) - LLM_MODEL_PRICES 환경 변수(JSON)로 덮어쓸 수 있음
+DEFAULT_MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+HTTP_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0, 128.0)
+PARSE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MESSAGE_BUCKETS = (0, 10, 30, 100, 300, 1000, 3000, 10000, 30000, 100000)
+CONNECT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key: tuple, value) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LLM_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_value(self, key: tuple, state) -> list[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, state["counts"]):
+            cumulative += count
+            le = 'le="' + _format_number(bound) + '"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+        labels = _format_labels(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {state['sum']:.6f}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+llm_call_seconds = registry.register(Histogram(
+    "diary_llm_call_duration_seconds", "OpenAI 호출 소요 시간 (캐시 적중 제외)",
+    ("stage", "model", "endpoint", "outcome"), LLM_BUCKETS))
+llm_calls = registry.register(Counter(
+    "diary_llm_calls_total", "LLM 단계 호출 수 (result: ok / error / cancelled / cache_hit / stale_cache)",
+    ("stage", "model", "endpoint", "result")))
+llm_tokens = registry.register(Counter(
+    "diary_llm_tokens_total", "response.usage 기준 토큰 사용량 (kind: prompt / completion)",
+    ("stage", "model", "endpoint", "kind")))
+llm_cost = registry.register(Counter(
+    "diary_llm_cost_usd_total", "모델 가격표 기준 예상 비용 (USD)",
+    ("stage", "model", "endpoint")))
+llm_in_flight = registry.register(Gauge(
+    "diary_llm_in_flight", "현재 진행 중인 OpenAI 호출 수", ("model",)))
+llm_resilience_events = registry.register(Counter(
+    "diary_llm_resilience_events_total", "재시도 / hedging / 시간 초과 / 회로 차단 이벤트 수",
+    ("stage", "event", "endpoint")))
+llm_circuit_state = registry.register(Gauge(
+    "diary_llm_circuit_open", "회로 차단기 상태 (0: closed, 0.5: half_open, 1: open)", ("key",)))
+llm_route_decisions = registry.register(Counter(
+    "diary_llm_route_decisions_total", "단계별 모델 선택 결과 (reason: default / input_size / load / latency_budget / explicit)",
+    ("stage", "model", "reason")))
+llm_output_quality = registry.register(Counter(
+    "diary_llm_output_quality_total", "응답이 요청한 형식에 맞았는지 (result: ok / bad)", ("stage", "model", "result")))
+json_parse_failures = registry.register(Counter(
+    "diary_json_parse_failures_total", "LLM 응답 JSON 파싱 실패 수", ("stage", "model", "endpoint")))
+json_repairs = registry.register(Counter(
+    "diary_json_repairs_total", "LLM 응답 JSON 을 보정해서 살린 수 (보정 종류별)", ("stage", "kind", "model")))
+stage_seconds = registry.register(Histogram(
+    "diary_pipeline_stage_duration_seconds", "파이프라인 단계 소요 시간 (대기 시간 포함)",
+    ("stage", "endpoint"), LLM_BUCKETS))
+chat_parse_seconds = registry.register(Histogram(
+    "diary_chat_parse_duration_seconds", "카카오톡 대화 파싱 시간", ("kind", "endpoint"), PARSE_BUCKETS))
+chat_messages = registry.register(Histogram(
+    "diary_chat_messages", "파싱 결과 메시지 수", ("kind", "endpoint"), MESSAGE_BUCKETS))
+http_seconds = registry.register(Histogram(
+    "diary_http_request_duration_seconds", "엔드포인트 응답 시간 (스트리밍은 마지막 데이터 전송까지)",
+    ("endpoint", "method", "status"), HTTP_BUCKETS))
+http_in_flight = registry.register(Gauge(
+    "diary_http_requests_in_flight", "현재 처리 중인 요청 수", ("endpoint",)))
+singleflight_calls = registry.register(Counter(
+    "diary_singleflight_total",
+    "같은 작업 합치기 결과 (scope: request / llm, result: leader 실행 / shared 실행 중인 작업 결과를 함께 씀)",
+    ("scope", "label", "result")))
+day_results_calls = registry.register(Counter(
+    "diary_day_results_total",
+    "날짜별 처리 결과 재사용 (kind: event / diary, result: reused 저장된 결과 사용 / processed 새로 처리)",
+    ("kind", "result")))
+llm_http_connections = registry.register(Counter(
+    "diary_llm_http_connections_total", "OpenAI 요청이 쓴 연결 (result: new / reused)", ("result",)))
+llm_http_connect_seconds = registry.register(Histogram(
+    "diary_llm_http_connect_duration_seconds", "OpenAI 새 연결 준비 시간 (TCP + TLS)", (), CONNECT_BUCKETS))
+llm_http_pool_wait_seconds = registry.register(Histogram(
+    "diary_llm_http_pool_wait_seconds", "OpenAI 요청이 연결 풀에서 연결을 얻기까지 기다린 시간", (), CONNECT_BUCKETS))
+llm_http_pool_saturated = registry.register(Counter(
+    "diary_llm_http_pool_saturated_total", "연결 풀의 연결이 모두 사용 중일 때 들어온 OpenAI 요청 수"))
+llm_http_pool_connections = registry.register(Gauge(
+    "diary_llm_http_pool_connections", "OpenAI 연결 풀의 연결 수 (state: active / idle / in_flight)", ("state",)))
+
+
+def _load_prices() -> dict[str, tuple[float, float]]:
+    prices = dict(DEFAULT_MODEL_PRICES)
+    raw = os.getenv("LLM_MODEL_PRICES")
+    if raw:
+        try:
+            prices.update({model: tuple(value) for model, value in json.loads(raw).items()})
+        except (ValueError, TypeError):
+            print("⚠️ LLM_MODEL_PRICES 형식이 잘못되어 기본 가격표를 사용합니다")
+    return prices
+
+
+MODEL_PRICES = _load_prices()
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    모델 가격표로 예상 비용(USD)을 계산합니다. (날짜가 붙은 모델 이름은 가장 긴 접두어로 찾음, 모르는 모델은 0)
+    """
+    price = MODEL_PRICES.get(model)
+    if price is None:
+        matches = [name for name in MODEL_PRICES if model.startswith(name)]
+        price = MODEL_PRICES[max(matches, key=len)] if matches else (0.0, 0.0)
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+class LLMCallRecorder:
+    """track_llm_call 안에서 응답의 usage 를 기록할 때 사용"""
+
+    def __init__(self, stage: str, model: str):
+        self.stage = stage
+        self.model = model
+
+    def record_usage(self, usage) -> None:
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        labels = {"stage": self.stage, "model": self.model, "endpoint": current_endpoint.get()}
+        llm_tokens.inc(prompt_tokens, kind="prompt", **labels)
+        llm_tokens.inc(completion_tokens, kind="completion", **labels)
+        llm_cost.inc(estimate_cost(self.model, prompt_tokens, completion_tokens), **labels)
+
+
+@contextmanager
+def track_llm_call(stage: str, model: str):
+    """
+    OpenAI 호출 하나의 소요 시간 / 결과 / 진행 중 수를 기록합니다.
+
+    사용 예:
+        with track_llm_call("summary", "gpt-4o") as call:
+            response = await client.chat.completions.create(...)
+            call.record_usage(response.usage)
+    """
+    last_model.set(model)
+    endpoint = current_endpoint.get()
+    llm_in_flight.inc(model=model)
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield LLMCallRecorder(stage, model)
+    except asyncio.CancelledError:
+        outcome = "cancelled"  # hedging 에서 진 요청 / 클라이언트 연결 끊김
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        llm_in_flight.dec(model=model)
+        llm_call_seconds.observe(time.perf_counter() - started, stage=stage, model=model, endpoint=endpoint, outcome=outcome)
+        llm_calls.inc(stage=stage, model=model, endpoint=endpoint, result=outcome)
+
+
+def record_cache_hit(stage: str, model: str) -> None:
+    last_model.set(model)
+    llm_calls.inc(stage=stage, model=model, endpoint=current_endpoint.get(), result="cache_hit")
+
+
+def record_stale_cache(stage: str, model: str) -> None:
+    """OpenAI 장애로 만료된 캐시 응답을 대신 사용했을 때 호출"""
+    llm_calls.inc(stage=stage, model=model, endpoint=current_endpoint.get(), result="stale_cache")
+
+
+def record_resilience_event(stage: str, event: str) -> None:
+    """ResilientCaller 의 on_event 로 사용 (retry / hedge / hedge_won / timeout / circuit_open)"""
+    llm_resilience_events.inc(stage=stage, event=event, endpoint=current_endpoint.get())
+
+
+def record_route(stage: str, model: str, reason: str) -> None:
+    llm_route_decisions.inc(stage=stage, model=model, reason=reason)
+
+
+def record_output_quality(stage: str, ok: bool) -> None:
+    """응답 형식 검사 결과 (모델은 같은 작업에서 마지막으로 호출한 모델)"""
+    llm_output_quality.inc(stage=stage, model=last_model.get(), result="ok" if ok else "bad")
+
+
+def record_json_failure(stage: str) -> None:
+    """LLM 응답 JSON 파싱에 실패했을 때 호출 (모델은 같은 작업에서 마지막으로 호출한 모델)"""
+    json_parse_failures.inc(stage=stage, model=last_model.get(), endpoint=current_endpoint.get())
+
+
+def record_json_repairs(stage: str, repairs: list[str]) -> None:
+    """LLM 응답 JSON 에 적용한 보정 종류들을 기록합니다. (json_output.extract_json 의 repairs)"""
+    for kind in repairs:
+        json_repairs.inc(stage=stage, kind=kind, model=last_model.get())
+
+
+def record_singleflight(scope: str, label: str, result: str) -> None:
+    """SingleFlight 의 on_event 로 사용 (shared 가 합쳐서 아낀 실행 수)"""
+    singleflight_calls.inc(scope=scope, label=label, result=result)
+
+
+def record_day_results(kind: str, reused: int, processed: int) -> None:
+    """날짜별 처리 결과를 저장된 결과로 대신한 날짜 수와 새로 처리한 날짜 수를 기록합니다."""
+    if reused:
+        day_results_calls.inc(reused, kind=kind, result="reused")
+    if processed:
+        day_results_calls.inc(processed, kind=kind, result="processed")
+
+
+def record_http_connection(new: bool, connect_seconds: float | None, pool_wait_seconds: float) -> None:
+    """OpenAI 요청 하나가 연결을 얻은 결과를 기록합니다. (http_pool 의 연결 추적 transport 가 호출)"""
+    llm_http_connections.inc(result="new" if new else "reused")
+    if connect_seconds is not None:
+        llm_http_connect_seconds.observe(connect_seconds)
+    llm_http_pool_wait_seconds.observe(pool_wait_seconds)
+
+
+def record_http_pool(in_flight: int, active: int, idle: int, saturated: bool = False) -> None:
+    """연결 풀 상태를 기록합니다. (요청 시작 / 끝날 때)"""
+    llm_http_pool_connections.set(in_flight, state="in_flight")
+    llm_http_pool_connections.set(active, state="active")
+    llm_http_pool_connections.set(idle, state="idle")
+    if saturated:
+        llm_http_pool_saturated.inc()
+
+
+def observe_stage_timings(timings: dict) -> None:
+    """run_stages 가 돌려준 단계별 타이밍을 기록합니다."""
+    endpoint = current_endpoint.get()
+    for stage, timing in timings.items():
+        if isinstance(timing, dict):
+            stage_seconds.observe(timing["duration_ms"] / 1000, stage=stage, endpoint=endpoint)
+
+
+@contextmanager
+def track_chat_parse(kind: str):
+    """
+    대화 파싱 시간을 기록합니다. 파싱 후 set_messages(개수)로 메시지 수도 함께 기록할 수 있음
+    """
+    endpoint = current_endpoint.get()
+    result = {"messages": None}
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        chat_parse_seconds.observe(time.perf_counter() - started, kind=kind, endpoint=endpoint)
+        if result["messages"] is not None:
+            chat_messages.observe(result["messages"], kind=kind, endpoint=endpoint)
+
+
+class MetricsMiddleware:
+    """
+    요청마다 엔드포인트(라우트 경로)를 찾아 current_endpoint 에 설정하고, 응답 시간과 진행 중 요청 수를 기록하는 ASGI 미들웨어
+    - 스트리밍 응답은 마지막 데이터를 보낼 때까지를 응답 시간으로 봄
+    - 등록되지 않은 경로는 "unmatched" 하나로 묶음 (라벨 값이 무한히 늘어나지 않도록)
+    """
+
+    def __init__(self, app, skip_paths: tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    def _endpoint(self, scope) -> str:
+        from starlette.routing import Match
+
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "unmatched")
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self._endpoint(scope)
+        token = current_endpoint.set(endpoint)
+        status = {"code": 500}
+        started = time.perf_counter()
+        finished = False
+        http_in_flight.inc(endpoint=endpoint)
+
+        def finish():
+            nonlocal finished
+            if not finished:
+                finished = True
+                http_in_flight.dec(endpoint=endpoint)
+                http_seconds.observe(time.perf_counter() - started, endpoint=endpoint,
+                                     method=scope["method"], status=str(status["code"]))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            current_endpoint.reset(token)
@@ -0,0 +1,288 @@
+# 파이프라인 단계별 모델 선택(라우팅) 모듈
+# - 각 단계는 기본 모델 등급(tier: large / small)을 선언하고, 등급별 실제 모델 이름은 설정으로 정함
+# - 입력이 너무 길거나, 서버 부하가 높거나, 요청 시간 예산이 얼마 안 남았으면 더 싸고 빠른 등급(fallback)으로 자동 전환
+# - 경로(단계, 모델)별 호출 수 / 지연시간 / 오류 / 응답 품질(파싱 성공률)을 기록해서 모델 간 비교 가능
+# - 정책은 코드 수정 없이 JSON 파일(MODEL_ROUTING_FILE) 또는 환경 변수(MODEL_ROUTING, MODEL_TIER_<단계>)로 변경
+#   파일은 수정되면 몇 초 안에 다시 읽음 (서버 재시작 불필요)
+# - 입력 크기 조건은 UTF-8 바이트 수로 먼저 확인하고(토큰은 최소 1바이트), 넘을 때만 토큰을 셈 (aapply 는 스레드에서)
+import asyncio
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable
+
+from prompt_budget import count_tokens
+from resilience import LatencyWindow, remaining_budget
+
+# 등급별 기본 모델
+DEFAULT_TIERS = {
+    "large": "gpt-4o",
+    "small": "gpt-4o-mini",
+}
+
+# 단계별 기본 정책
+# - tier: 기본 등급 / fallback: 조건에 걸리면 바꿀 등급
+# - max_input_tokens: 입력 토큰이 이보다 많으면 fallback (비용 절감)
+# - max_load: 서버 부하(0~1, 실행 중 + 대기 중 요청 / 최대치)가 이보다 높으면 fallback
+# - min_budget: 요청 시간 예산이 이보다(초) 적게 남았으면 fallback (더 빠른 모델로 마무리)
+# 감정 백분율 / 키워드 / 충돌 감지 / 청크 요약처럼 형식이 단순한 작업은 처음부터 small
+DEFAULT_STAGE_POLICIES = {
+    "summary": {"tier": "large", "fallback": "small", "max_load": 0.9, "min_budget": 20},
+    "summary_chunk": {"tier": "small"},
+    "conflict": {"tier": "small"},
+    "diary": {"tier": "large", "fallback": "small", "max_load": 0.9, "min_budget": 20},
+    "emotion": {"tier": "small"},
+    "keyword": {"tier": "small"},
+    "fused": {"tier": "large", "fallback": "small", "max_load": 0.9, "min_budget": 20},
+    "event": {"tier": "large", "fallback": "small", "max_input_tokens": 4000, "max_load": 0.75},
+}
+_POLICY_KEYS = ("tier", "fallback", "max_input_tokens", "max_load", "min_budget")
+
+# 현재 실행 흐름에서 마지막으로 선택된 경로 (응답 품질을 같은 경로에 기록하기 위해 사용)
+_last_route: ContextVar["Route | None"] = ContextVar("last_model_route", default=None)
+
+
+def _input_bytes(messages: list[dict]) -> int:
+    # 입력 토큰 수의 상한 (토큰은 최소 1바이트이고, 토크나이저가 없을 때의 추정치도 글자 수 이하)
+    return sum(len(str(m.get("content", "")).encode("utf-8")) for m in messages)
+
+
+def _count_input(messages: list[dict]) -> int:
+    return sum(count_tokens(str(m.get("content", ""))) for m in messages)
+
+
+@dataclass(frozen=True)
+class Route:
+    """
+    라우팅 결과
+
+    Args:
+        stage: 단계 이름
+        tier: 선택된 등급
+        model: 실제로 호출할 모델 이름
+        reason: 선택 이유 (default / input_size / load / latency_budget / explicit)
+    """
+    stage: str
+    tier: str
+    model: str
+    reason: str
+
+
+class _RouteStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.quality_ok = 0
+        self.quality_bad = 0
+        self.latency = LatencyWindow(500)
+        self.reasons: dict[str, int] = {}
+
+    def to_dict(self) -> dict:
+        judged = self.quality_ok + self.quality_bad
+        p50, p95 = self.latency.percentile(0.5), self.latency.percentile(0.95)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "quality": round(self.quality_ok / judged, 3) if judged else None,
+            "quality_samples": judged,
+            "latency_p50": round(p50, 3) if p50 is not None else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+            "reasons": dict(self.reasons),
+        }
+
+
+class ModelRouter:
+    """
+    단계별 정책에 따라 호출할 모델을 고르고, 경로별 지연시간 / 품질을 기록
+
+    Args:
+        tiers: {등급: 모델 이름}
+        stage_policies: {단계 이름: 정책} (DEFAULT_STAGE_POLICIES 참고)
+        load_fn: 현재 서버 부하(0~1)를 돌려주는 함수
+        config_path: 정책 JSON 파일 경로 (수정되면 다시 읽음)
+    """
+
+    _RELOAD_CHECK_INTERVAL = 5.0
+
+    def __init__(self, tiers: dict[str, str] | None = None, stage_policies: dict[str, dict] | None = None,
+                 load_fn: Callable[[], float] | None = None, config_path: str | None = None):
+        self.base_tiers = {**DEFAULT_TIERS, **(tiers or {})}
+        self.base_policies = {stage: dict(policy) for stage, policy in (stage_policies or DEFAULT_STAGE_POLICIES).items()}
+        self.load_fn = load_fn
+        self.config_path = config_path
+        self._config_mtime = None
+        self._next_reload_check = 0.0
+        self._lock = threading.Lock()
+        self._stats: dict[tuple[str, str], _RouteStats] = {}
+        self.tiers = dict(self.base_tiers)
+        self.policies = {stage: dict(policy) for stage, policy in self.base_policies.items()}
+        self._reload_file(force=True)
+
+    @classmethod
+    def from_env(cls, load_fn: Callable[[], float] | None = None) -> "ModelRouter":
+        """
+        환경 변수에서 정책을 읽습니다. (뒤에 오는 설정이 앞의 설정을 덮어씀)
+        - MODEL_ROUTING: {"tiers": {...}, "stages": {단계: 정책}} 형식의 JSON 문자열
+        - MODEL_TIER_<단계>: 단계의 기본 등급 (예: MODEL_TIER_DIARY=small)
+        - MODEL_ROUTING_FILE: 같은 형식의 JSON 파일 경로 (실행 중에 수정해도 반영)
+        """
+        tiers = dict(DEFAULT_TIERS)
+        policies = {stage: dict(policy) for stage, policy in DEFAULT_STAGE_POLICIES.items()}
+        raw = os.getenv("MODEL_ROUTING")
+        if raw:
+            try:
+                _merge_config(json.loads(raw), tiers, policies)
+            except (ValueError, TypeError, AttributeError):
+                print("⚠️ MODEL_ROUTING 형식이 잘못되어 기본 라우팅 정책을 사용합니다")
+        for stage in list(policies):
+            tier = os.getenv(f"MODEL_TIER_{stage.upper()}")
+            if tier:
+                policies[stage]["tier"] = tier
+        return cls(tiers, policies, load_fn, os.getenv("MODEL_ROUTING_FILE") or None)
+
+    def _reload_file(self, force: bool = False) -> None:
+        # 설정 파일이 바뀌었으면 기본 정책 위에 다시 합침 (형식이 잘못되면 이전 정책 유지)
+        if not self.config_path:
+            return
+        now = time.monotonic()
+        if not force and now < self._next_reload_check:
+            return
+        self._next_reload_check = now + self._RELOAD_CHECK_INTERVAL
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            return
+        if mtime == self._config_mtime:
+            return
+        try:
+            with open(self.config_path, encoding="utf-8") as f:
+                config = json.load(f)
+            tiers = dict(self.base_tiers)
+            policies = {stage: dict(policy) for stage, policy in self.base_policies.items()}
+            _merge_config(config, tiers, policies)
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"⚠️ 모델 라우팅 설정 파일을 읽지 못해 이전 정책을 유지합니다: {e}")
+            return
+        self._config_mtime = mtime
+        self.tiers, self.policies = tiers, policies
+        print(f"🔀 모델 라우팅 정책을 불러왔습니다: {self.config_path}")
+
+    def model_for(self, tier: str) -> str:
+        return self.tiers.get(tier) or self.tiers["large"]
+
+    def _input_limit(self, stage: str, messages: list[dict] | None) -> int | None:
+        # 입력 크기 조건을 확인해야 하면 기준 토큰 수 (fallback / max_input_tokens / 메시지가 없으면 None)
+        policy = self.policies.get(stage, {"tier": "large"})
+        fallback = policy.get("fallback")
+        if not fallback or fallback == policy.get("tier", "large") or not policy.get("max_input_tokens") or messages is None:
+            return None
+        return policy["max_input_tokens"]
+
+    def route(self, stage: str, messages: list[dict] | None = None, prompt_tokens: int | None = None) -> Route:
+        """
+        단계와 입력 메시지로 호출할 모델을 고릅니다.
+        - 정책에 없는 단계는 large 등급 사용
+        - fallback 조건은 입력 크기 → 서버 부하 → 남은 시간 예산 순서로 확인
+
+        Args:
+            prompt_tokens: 미리 센 입력 토큰 수 (None 이면 필요할 때 여기서 셈)
+        """
+        self._reload_file()
+        policy = self.policies.get(stage, {"tier": "large"})
+        tier, reason = policy.get("tier", "large"), "default"
+        fallback = policy.get("fallback")
+        if fallback and fallback != tier:
+            limit = self._input_limit(stage, messages)
+            if limit is not None:
+                if prompt_tokens is None:
+                    prompt_tokens = _input_bytes(messages)
+                    if prompt_tokens > limit:
+                        prompt_tokens = _count_input(messages)
+                if prompt_tokens > limit:
+                    tier, reason = fallback, "input_size"
+            if reason == "default" and policy.get("max_load") is not None and self.load_fn is not None:
+                if self.load_fn() > policy["max_load"]:
+                    tier, reason = fallback, "load"
+            if reason == "default" and policy.get("min_budget") is not None:
+                remaining = remaining_budget()
+                if remaining is not None and remaining < policy["min_budget"]:
+                    tier, reason = fallback, "latency_budget"
+        return Route(stage, tier, self.model_for(tier), reason)
+
+    def apply(self, stage: str, params: dict, prompt_tokens: int | None = None) -> tuple[dict, Route]:
+        """
+        chat.completions.create 인자에 모델을 채워 넣습니다.
+        - params 에 model 이 이미 있으면 그대로 사용 (explicit)
+        """
+        if params.get("model"):
+            route = Route(stage, "explicit", params["model"], "explicit")
+        else:
+            route = self.route(stage, params.get("messages"), prompt_tokens)
+            params = {**params, "model": route.model}
+        _last_route.set(route)
+        with self._lock:
+            stats = self._stats_for(route)
+            stats.reasons[route.reason] = stats.reasons.get(route.reason, 0) + 1
+        return params, route
+
+    async def aapply(self, stage: str, params: dict) -> tuple[dict, Route]:
+        """
+        apply 의 비동기 버전. 입력 크기 조건에 쓰는 토큰 수를 바이트 수로 판단할 수 없으면 스레드에서 셉니다.
+        """
+        prompt_tokens = None
+        limit = None if params.get("model") else self._input_limit(stage, params.get("messages"))
+        if limit is not None:
+            prompt_tokens = _input_bytes(params["messages"])
+            if prompt_tokens > limit:
+                prompt_tokens = await asyncio.to_thread(_count_input, params["messages"])
+        return self.apply(stage, params, prompt_tokens)
+
+    def _stats_for(self, route: Route) -> _RouteStats:
+        key = (route.stage, route.model)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = _RouteStats()
+        return stats
+
+    def record_call(self, route: Route, seconds: float, ok: bool) -> None:
+        """OpenAI 호출 1회의 결과 (캐시 적중은 기록하지 않음)"""
+        with self._lock:
+            stats = self._stats_for(route)
+            stats.calls += 1
+            if ok:
+                stats.latency.add(seconds)
+            else:
+                stats.errors += 1
+
+    def record_quality(self, stage: str, ok: bool) -> None:
+        """
+        응답 품질(형식에 맞게 파싱되었는지) 기록. 같은 실행 흐름에서 마지막으로 선택된 경로에 기록
+        """
+        route = _last_route.get()
+        if route is None or route.stage != stage:
+            return
+        with self._lock:
+            stats = self._stats_for(route)
+            if ok:
+                stats.quality_ok += 1
+            else:
+                stats.quality_bad += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = [
+                {"stage": stage, "model": model, **stats.to_dict()}
+                for (stage, model), stats in sorted(self._stats.items())
+            ]
+        return {"tiers": dict(self.tiers), "policies": {s: dict(p) for s, p in self.policies.items()}, "routes": routes}
+
+
+def _merge_config(config: dict, tiers: dict, policies: dict) -> None:
+    # {"tiers": {...}, "stages": {단계: {정책 키: 값}}} 를 기존 설정 위에 합침 (알 수 없는 키는 무시)
+    tiers.update({str(k): str(v) for k, v in (config.get("tiers") or {}).items()})
+    for stage, policy in (config.get("stages") or {}).items():
+        merged = policies.setdefault(stage, {"tier": "large"})
+        merged.update({k: v for k, v in policy.items() if k in _POLICY_KEYS})
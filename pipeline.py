@@ -0,0 +1,103 @@
+# 일기 생성 파이프라인의 단계(Stage)들을 의존성 그래프(DAG)로 실행하는 모듈
+# - 서로 의존하지 않는 단계(예: 요약 / 충돌 감지)는 동시에 실행해서 전체 지연시간을 임계 경로(critical path)로 줄임
+# - 각 단계의 시작 시점과 소요 시간을 기록해서 응답에 포함할 수 있게 함
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+
+@dataclass
+class Stage:
+    """
+    파이프라인의 한 단계를 정의합니다.
+
+    Args:
+        name: 단계 이름 (결과 딕셔너리의 키로 사용)
+        func: 의존 단계들의 결과 딕셔너리를 받아 실행되는 비동기 함수
+        deps: 먼저 끝나야 하는 단계 이름들
+    """
+    name: str
+    func: Callable[[dict], Awaitable[Any]]
+    deps: tuple[str, ...] = field(default_factory=tuple)
+
+
+def _check_graph(stages: list[Stage]) -> None:
+    # 중복 이름, 존재하지 않는 의존성, 순환 의존성을 실행 전에 검사
+    names = [s.name for s in stages]
+    if len(names) != len(set(names)):
+        raise ValueError(f"중복된 단계 이름이 있습니다: {names}")
+
+    by_name = {s.name: s for s in stages}
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"'{stage.name}' 단계의 의존 단계 '{dep}'가 정의되지 않았습니다")
+
+    visiting, done = set(), set()
+
+    def visit(name: str):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"순환 의존성이 있습니다: {name}")
+        visiting.add(name)
+        for dep in by_name[name].deps:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in names:
+        visit(name)
+
+
+async def run_stages(stages: list[Stage],
+                     on_stage_done: Callable[[str, Any], Any] | None = None) -> tuple[dict, dict]:
+    """
+    단계들을 의존성 순서에 맞춰 실행합니다. 의존성이 모두 끝난 단계는 바로 시작됩니다.
+
+    Args:
+        stages: 실행할 단계 목록
+        on_stage_done: 단계가 성공적으로 끝날 때마다 (단계 이름, 결과)로 호출되는 함수 (스트리밍 응답용)
+
+    Returns:
+        tuple: (단계별 결과 딕셔너리, 단계별 타이밍 딕셔너리)
+            타이밍 예시: {"summary": {"start_ms": 0.1, "duration_ms": 812.4}, ..., "total_ms": 2410.7}
+    """
+    _check_graph(stages)
+
+    results: dict[str, Any] = {}
+    timings: dict[str, Any] = {}
+    tasks: dict[str, asyncio.Task] = {}
+    pipeline_start = time.perf_counter()
+
+    async def run_one(stage: Stage):
+        # 의존 단계가 모두 끝날 때까지 대기 (실패한 의존 단계가 있으면 예외가 그대로 전파됨)
+        for dep in stage.deps:
+            await tasks[dep]
+        started = time.perf_counter()
+        inputs = {dep: results[dep] for dep in stage.deps}
+        try:
+            results[stage.name] = await stage.func(inputs)
+        finally:
+            timings[stage.name] = {
+                "start_ms": round((started - pipeline_start) * 1000, 1),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+        if on_stage_done is not None:
+            on_stage_done(stage.name, results[stage.name])
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.create_task(run_one(stage), name=f"stage:{stage.name}")
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        # 한 단계라도 실패하면 아직 실행 중인 나머지 단계는 취소
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+
+    timings["total_ms"] = round((time.perf_counter() - pipeline_start) * 1000, 1)
+    return results, timings
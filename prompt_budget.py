@@ -0,0 +1,199 @@
+# 프롬프트에 넣는 대화 내용의 토큰 예산을 관리하는 모듈
+# - 토큰 수를 로컬에서 계산 (tiktoken 이 있으면 실제 토크나이저, 없으면 글자 수 기반 추정)
+# - 단계별 입력 예산을 넘는 긴 대화는 줄 단위 청크로 나눠 동시에 요약(map)한 뒤 합쳐서(reduce) 압축
+# - 압축 전/후 토큰 수로 요청마다 절약한 입력 토큰 수를 계산
+# - 긴 대화의 토큰 계산 / 청크 나누기는 CPU 작업이라 스레드에서 실행 (이벤트 루프에서는 짧은 텍스트만 바로 계산)
+import asyncio
+import os
+from functools import lru_cache
+from typing import Awaitable, Callable
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken 은 선택 의존성 (없으면 추정치 사용)
+    tiktoken = None
+
+# 이벤트 루프에서 바로 토큰 수를 세는 최대 글자 수 (더 길면 스레드에서 계산해 다른 요청을 막지 않음)
+INLINE_COUNT_CHARS = 4096
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def estimate_tokens(text: str) -> int:
+    # 한글은 대략 글자당 1토큰, 영문/숫자/공백은 4글자당 1토큰 정도로 추정 (실제보다 약간 많게 잡힘)
+    hangul = sum(1 for ch in text if "가" <= ch <= "힣")
+    return hangul + (len(text) - hangul + 3) // 4
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    텍스트의 토큰 수를 로컬에서 계산합니다. (API 호출 없음)
+    """
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+async def count_tokens_async(text: str, model: str = "gpt-4o") -> int:
+    """
+    count_tokens 의 비동기 버전. INLINE_COUNT_CHARS 보다 긴 텍스트는 스레드에서 계산합니다.
+    """
+    if len(text) <= INLINE_COUNT_CHARS:
+        return count_tokens(text, model)
+    return await asyncio.to_thread(count_tokens, text, model)
+
+
+def split_by_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> list[str]:
+    """
+    줄 경계를 지키면서 각 청크가 max_tokens 이하가 되도록 나눕니다.
+    - 한 줄이 max_tokens 보다 길면 그 줄만 글자 수 비율로 잘라서 나눔
+    """
+    chunks, current, current_tokens = [], [], 0
+    for line in text.splitlines():
+        tokens = count_tokens(line, model) + 1  # 줄바꿈 포함
+        if tokens > max_tokens:
+            if current:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            step = max(1, len(line) * max_tokens // tokens)
+            chunks.extend(line[i:i + step] for i in range(0, len(line), step))
+            continue
+        if current_tokens + tokens > max_tokens and current:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    """
+    max_tokens 를 넘으면 최근(뒤쪽) 줄부터 예산 안에 들어가는 만큼만 남깁니다.
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    kept, used = [], 0
+    for line in reversed(text.splitlines()):
+        tokens = count_tokens(line, model) + 1
+        if used + tokens > max_tokens:
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(reversed(kept))
+
+
+class PromptBudget:
+    """
+    단계별 대화 입력 토큰 예산
+
+    Args:
+        default_budget: 예산을 따로 정하지 않은 단계의 대화 입력 예산 (토큰)
+        chunk_tokens: map 단계에서 한 번에 요약하는 청크 크기 (토큰)
+        stage_budgets: {단계 이름: 예산} (예: {"diary": 4000})
+        max_concurrency: 청크를 동시에 요약하는 최대 개수
+        max_rounds: 요약을 합친 결과가 여전히 예산을 넘을 때 다시 요약하는 최대 횟수
+    """
+
+    def __init__(self, default_budget: int, chunk_tokens: int, stage_budgets: dict[str, int] | None = None,
+                 max_concurrency: int = 4, max_rounds: int = 2):
+        self.default_budget = default_budget
+        self.chunk_tokens = max(100, chunk_tokens)
+        self.stage_budgets = stage_budgets or {}
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_rounds = max(1, max_rounds)
+
+    @classmethod
+    def from_env(cls, stages: list[str]) -> "PromptBudget":
+        """
+        환경 변수에서 예산을 읽습니다.
+        - PROMPT_CHAT_TOKEN_BUDGET: 기본 대화 입력 예산 (기본 6000)
+        - PROMPT_BUDGET_<단계>: 단계별 예산 (예: PROMPT_BUDGET_DIARY=4000)
+        - PROMPT_CHUNK_TOKENS: 청크 크기 (기본 3000)
+        - PROMPT_CHUNK_CONCURRENCY: 청크 동시 요약 수 (기본 4)
+        """
+        def read(name: str, default: int) -> int:
+            try:
+                return int(os.getenv(name, default))
+            except (TypeError, ValueError):
+                return default
+
+        default_budget = read("PROMPT_CHAT_TOKEN_BUDGET", 6000)
+        stage_budgets = {stage: read(f"PROMPT_BUDGET_{stage.upper()}", default_budget) for stage in stages}
+        return cls(
+            default_budget=default_budget,
+            chunk_tokens=read("PROMPT_CHUNK_TOKENS", 3000),
+            stage_budgets=stage_budgets,
+            max_concurrency=read("PROMPT_CHUNK_CONCURRENCY", 4),
+        )
+
+    def budget_for(self, stages: list[str]) -> int:
+        """대화 입력을 함께 쓰는 단계들 중 가장 작은 예산"""
+        return min((self.stage_budgets.get(stage, self.default_budget) for stage in stages),
+                   default=self.default_budget)
+
+    async def fit(self, text: str, stages: list[str],
+                  summarize_chunk: Callable[[str, int, int], Awaitable[str]], model: str = "gpt-4o") -> tuple[str, dict]:
+        """
+        대화 내용이 stages 의 예산 안에 들어가도록 압축합니다.
+        - 예산 안이면 그대로 반환 (LLM 호출 없음)
+        - 넘으면 청크로 나눠 summarize_chunk(청크, 번호, 전체 청크 수)를 동시에 실행하고 결과를 이어 붙임
+        - 이어 붙인 요약도 예산을 넘으면 같은 방식으로 다시 압축하고, max_rounds 후에도 넘으면 최근 내용 위주로 자름
+
+        Returns:
+            tuple: (압축된 대화 내용, 보고서 {"raw_tokens", "budget", "prompt_tokens", "condensed", "chunks", "map_input_tokens", "rounds"})
+        """
+        budget = self.budget_for(stages)
+        raw_tokens = await count_tokens_async(text, model)
+        report = {
+            "raw_tokens": raw_tokens,
+            "budget": budget,
+            "prompt_tokens": raw_tokens,
+            "condensed": False,
+            "chunks": 0,
+            "map_input_tokens": 0,
+            "rounds": 0,
+        }
+        if raw_tokens <= budget:
+            return text, report
+
+        limit = asyncio.Semaphore(self.max_concurrency)
+
+        async def summarize(chunk: str, index: int, total: int) -> str:
+            async with limit:
+                return await summarize_chunk(chunk, index, total)
+
+        current, current_tokens = text, raw_tokens
+        while current_tokens > budget and report["rounds"] < self.max_rounds:
+            chunks = await asyncio.to_thread(split_by_tokens, current, min(self.chunk_tokens, budget), model)
+            report["chunks"] += len(chunks)
+            report["map_input_tokens"] += current_tokens
+            report["rounds"] += 1
+            partials = await asyncio.gather(*(summarize(chunk, i, len(chunks)) for i, chunk in enumerate(chunks)))
+            current = "\n".join(p.strip() for p in partials if p and p.strip())
+            current_tokens = await count_tokens_async(current, model)
+
+        if current_tokens > budget:
+            current = await asyncio.to_thread(truncate_to_tokens, current, budget, model)
+            current_tokens = await count_tokens_async(current, model)
+        report["condensed"] = True
+        report["prompt_tokens"] = current_tokens
+        return current, report
+
+
+def tokens_saved(report: dict, stage_count: int) -> int:
+    """
+    압축으로 절약한 입력 토큰 수 (대화 내용을 쓰는 단계 수 × 줄어든 토큰 - map 단계에 쓴 입력 토큰)
+    """
+    if not report["condensed"]:
+        return 0
+    return stage_count * (report["raw_tokens"] - report["prompt_tokens"]) - report["map_input_tokens"]
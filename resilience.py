@@ -0,0 +1,414 @@
+# OpenAI 호출을 느리거나 불안정한 상황에서도 버티게 하는 모듈
+# - 요청 전체 시간 예산(deadline)을 컨텍스트에 두고, 단계별 호출 제한 시간 = min(단계 제한 시간, 남은 예산)
+# - 응답이 최근 p95 지연시간보다 늦으면 같은 요청을 한 번 더 보내고(hedging) 먼저 도착한 응답을 사용
+# - 429 / 5xx / 연결 오류 / 시간 초과는 지터를 섞은 지수 백오프로 재시도 (Retry-After 헤더가 있으면 따름)
+# - 실패가 연속으로 쌓이면 회로 차단기(circuit breaker)를 열어 일정 시간 동안 호출하지 않고 바로 실패 처리
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, TypeVar
+
+from openai import APIConnectionError, APIStatusError
+
+from concurrency import OverloadedError, env_float, env_int
+
+T = TypeVar("T")
+
+
+# 요청 시간 예산을 다 써서 더 이상 기다릴 수 없을 때 발생 (main.py 에서 504 응답으로 변환)
+class DeadlineExceededError(Exception):
+    pass
+
+
+# 회로 차단기가 열려 있어서 OpenAI 를 호출하지 않고 바로 실패할 때 발생 (과부하와 같이 503 + Retry-After)
+class CircuitOpenError(OverloadedError):
+    pass
+
+
+# 현재 요청이 끝나야 하는 시각 (time.monotonic 기준, None 이면 제한 없음)
+# - asyncio 태스크는 생성 시점의 컨텍스트를 복사하므로 파이프라인의 모든 단계에 같은 예산이 적용됨
+_deadline: ContextVar[float | None] = ContextVar("llm_request_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(seconds: float | None):
+    """
+    이 블록 안의 LLM 호출들이 seconds 안에 끝나도록 시간 예산을 설정합니다.
+    - 바깥에 이미 더 빠른 deadline 이 있으면 그쪽을 따름
+    - seconds 가 None 이거나 0 이하이면 예산을 새로 두지 않음
+    """
+    current = _deadline.get()
+    deadline = current
+    if seconds is not None and seconds > 0:
+        deadline = time.monotonic() + seconds
+        if current is not None:
+            deadline = min(current, deadline)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> float | None:
+    """현재 요청에 남은 시간(초). 예산이 없으면 None"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    다시 시도하면 성공할 수 있는 오류인지 판단합니다.
+    - 429(요청 한도 초과), 408/409, 5xx, 연결 오류, 시간 초과
+    - 사용 한도(insufficient_quota)를 다 쓴 429 는 재시도해도 소용없으므로 제외
+    """
+    if isinstance(exc, (APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        if getattr(exc, "code", None) == "insufficient_quota":
+            return False
+        return exc.status_code in (408, 409, 429) or exc.status_code >= 500
+    return False
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """OpenAI 쪽 문제로 응답을 못 받은 경우 (캐시된 응답으로 대신할 수 있는 오류)"""
+    return isinstance(exc, (CircuitOpenError, DeadlineExceededError)) or is_retryable(exc)
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    # 429 / 503 응답의 Retry-After(-ms) 헤더 값(초)
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class LatencyWindow:
+    """최근 성공한 호출들의 지연시간(초)을 보관하고 백분위수를 계산"""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """
+    연속 실패 수 기반 회로 차단기
+
+    - closed: 정상. 실패가 failure_threshold 번 연속되면 open
+    - open: reset_timeout 초 동안 호출하지 않고 CircuitOpenError 발생
+    - half_open: reset_timeout 이 지나면 시험 호출을 half_open_max_calls 개만 허용, 성공하면 closed / 실패하면 다시 open
+
+    Args:
+        failure_threshold: open 으로 바꾸는 연속 실패 수
+        reset_timeout: open 상태를 유지하는 시간(초)
+        half_open_max_calls: half_open 상태에서 동시에 허용하는 시험 호출 수
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+        self._probes = 0
+
+    def allow(self) -> None:
+        """호출 전에 확인. 막혀 있으면 CircuitOpenError 발생"""
+        if self.state == self.OPEN:
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout:
+                self.rejected += 1
+                retry_after = max(1, int(self.reset_timeout - waited + 0.999))
+                raise CircuitOpenError("OpenAI 응답이 불안정해 잠시 호출을 멈췄습니다. 잠시 후 다시 시도해주세요.",
+                                       retry_after=retry_after)
+            self.state = self.HALF_OPEN
+            self._probes = 0
+        if self.state == self.HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError("OpenAI 상태를 확인하는 중입니다. 잠시 후 다시 시도해주세요.", retry_after=1)
+            self._probes += 1
+
+    def record(self, ok: bool | None) -> None:
+        """
+        allow() 로 시작한 호출의 결과를 기록합니다.
+
+        Args:
+            ok: True 성공 / False OpenAI 쪽 실패 / None 판단 불가 (취소, 잘못된 요청 등)
+        """
+        if self.state == self.HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+        if ok is None:
+            return
+        if ok:
+            self.state = self.CLOSED
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opens += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "opens": self.opens, "rejected": self.rejected}
+
+
+class ResilientCaller:
+    """
+    시간 제한 / hedging / 재시도 / 회로 차단기를 적용해서 비동기 호출을 실행
+
+    Args:
+        enabled: False 이면 attempt 를 그대로 한 번 실행 (비교용)
+        stage_timeout: 단계 호출 1회의 기본 제한 시간(초)
+        stage_timeouts: {단계 이름: 제한 시간} (예: {"diary": 60})
+        max_retries: 재시도 횟수 (첫 시도 제외)
+        backoff_base: 첫 재시도 대기 시간의 최대값(초). 재시도마다 2배 (full jitter)
+        backoff_max: 재시도 대기 시간 상한(초)
+        hedge: 느린 호출에 같은 요청을 한 번 더 보낼지 여부
+        hedge_quantile: 이 백분위수의 지연시간이 지나면 두 번째 요청 전송
+        hedge_min_samples: 지연시간 표본이 이만큼 모이기 전에는 hedging 하지 않음
+        hedge_max_ratio: 단계별 전체 호출 중 hedging 할 수 있는 최대 비율 (중복 요청 비용 제한)
+        failure_threshold / reset_timeout: CircuitBreaker 설정
+        on_event: (단계, 이벤트) 로 호출되는 함수 (이벤트: retry / hedge / hedge_won / timeout / circuit_open)
+    """
+
+    def __init__(self, *, enabled: bool = True, stage_timeout: float = 45.0, stage_timeouts: dict[str, float] | None = None,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 hedge: bool = True, hedge_quantile: float = 0.95, hedge_min_samples: int = 20,
+                 hedge_max_ratio: float = 0.1, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 on_event: Callable[[str, str], Any] | None = None):
+        self.enabled = enabled
+        self.stage_timeout = stage_timeout
+        self.stage_timeouts = stage_timeouts or {}
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = max(1, hedge_min_samples)
+        self.hedge_max_ratio = hedge_max_ratio
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_event = on_event
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._latency: dict[str, LatencyWindow] = {}
+        self._calls: dict[str, int] = {}
+        self._hedges: dict[str, int] = {}
+        self.counters = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0, "circuit_open": 0}
+
+    @classmethod
+    def from_env(cls, stages: list[str], on_event: Callable[[str, str], Any] | None = None) -> "ResilientCaller":
+        """
+        환경 변수에서 설정을 읽습니다.
+        - LLM_RESILIENCE: 0 이면 사용 안 함 (기본 1)
+        - LLM_STAGE_TIMEOUT / LLM_STAGE_TIMEOUT_<단계>: 호출 1회 제한 시간(초, 기본 45)
+        - LLM_MAX_RETRIES / LLM_RETRY_BACKOFF / LLM_RETRY_BACKOFF_MAX: 재시도 횟수(기본 2) / 백오프(초)
+        - LLM_HEDGE / LLM_HEDGE_QUANTILE / LLM_HEDGE_MIN_SAMPLES / LLM_HEDGE_MAX_RATIO: hedging 설정
+        - LLM_BREAKER_FAILURES / LLM_BREAKER_RESET: 회로 차단기 연속 실패 수(기본 5) / 차단 시간(초, 기본 30)
+        """
+        stage_timeout = env_float("LLM_STAGE_TIMEOUT", 45.0)
+        return cls(
+            enabled=env_int("LLM_RESILIENCE", 1) != 0,
+            stage_timeout=stage_timeout,
+            stage_timeouts={stage: env_float(f"LLM_STAGE_TIMEOUT_{stage.upper()}", stage_timeout) for stage in stages},
+            max_retries=env_int("LLM_MAX_RETRIES", 2),
+            backoff_base=env_float("LLM_RETRY_BACKOFF", 0.5),
+            backoff_max=env_float("LLM_RETRY_BACKOFF_MAX", 8.0),
+            hedge=env_int("LLM_HEDGE", 1) != 0,
+            hedge_quantile=env_float("LLM_HEDGE_QUANTILE", 0.95),
+            hedge_min_samples=env_int("LLM_HEDGE_MIN_SAMPLES", 20),
+            hedge_max_ratio=env_float("LLM_HEDGE_MAX_RATIO", 0.1),
+            failure_threshold=env_int("LLM_BREAKER_FAILURES", 5),
+            reset_timeout=env_float("LLM_BREAKER_RESET", 30.0),
+            on_event=on_event,
+        )
+
+    def _emit(self, stage: str, event: str) -> None:
+        if self.on_event is not None:
+            self.on_event(stage, event)
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def timeout_for(self, stage: str) -> float:
+        """이번 호출의 제한 시간 = min(단계 제한 시간, 요청에 남은 시간). 남은 시간이 없으면 DeadlineExceededError"""
+        limit = self.stage_timeouts.get(stage, self.stage_timeout)
+        remaining = remaining_budget()
+        if remaining is None:
+            return limit
+        if remaining <= 0:
+            raise DeadlineExceededError(f"요청 시간 예산을 모두 써서 '{stage}' 단계를 실행하지 못했습니다.")
+        return min(limit, remaining)
+
+    def hedge_delay(self, stage: str) -> float | None:
+        """두 번째 요청을 보내기까지 기다릴 시간. hedging 하지 않으면 None"""
+        if not self.hedge:
+            return None
+        window = self._latency.get(stage)
+        if window is None or len(window) < self.hedge_min_samples:
+            return None
+        if self._hedges.get(stage, 0) >= self.hedge_max_ratio * self._calls.get(stage, 0):
+            return None
+        return window.percentile(self.hedge_quantile)
+
+    def _backoff(self, retry: int, exc: BaseException) -> float:
+        # full jitter: 0 ~ min(상한, base × 2^retry) 사이 무작위 대기. 서버가 Retry-After 를 주면 그보다 짧게 기다리지 않음
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** retry)))
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max) + random.uniform(0, self.backoff_base))
+        return delay
+
+    async def call(self, stage: str, attempt: Callable[[], Awaitable[T]], *, breaker_key: str = "default",
+                   hedge: bool = True, can_retry: Callable[[], bool] | None = None) -> T:
+        """
+        attempt() 를 시간 제한 / hedging / 재시도 / 회로 차단기를 적용해서 실행합니다.
+
+        Args:
+            stage: 단계 이름 (지연시간 통계와 제한 시간을 단계별로 관리)
+            attempt: 호출 1회를 실행하는 코루틴 함수 (hedging / 재시도 때마다 새로 호출됨)
+            breaker_key: 회로 차단기를 나누는 기준 (예: 모델 이름)
+            hedge: False 이면 hedging 하지 않음 (스트리밍처럼 중복 실행하면 안 되는 호출)
+            can_retry: 재시도해도 되는지 확인하는 함수 (예: 스트리밍 응답을 이미 일부 전달했으면 False)
+
+        Returns:
+            attempt() 의 결과
+        """
+        if not self.enabled:
+            return await attempt()
+
+        breaker = self.breaker(breaker_key)
+        self.counters["calls"] += 1
+        self._calls[stage] = self._calls.get(stage, 0) + 1
+        retry = 0
+        while True:
+            try:
+                breaker.allow()
+            except CircuitOpenError:
+                self.counters["circuit_open"] += 1
+                self._emit(stage, "circuit_open")
+                raise
+            try:
+                timeout = self.timeout_for(stage)
+            except DeadlineExceededError:
+                breaker.record(None)
+                raise
+
+            ok = None
+            try:
+                result = await self._hedged(stage, attempt, timeout, hedge, breaker.state == CircuitBreaker.CLOSED)
+                ok = True
+                return result
+            except Exception as exc:
+                retryable = is_retryable(exc)
+                ok = False if retryable else None
+                if isinstance(exc, asyncio.TimeoutError):
+                    self.counters["timeouts"] += 1
+                    self._emit(stage, "timeout")
+                delay = self._backoff(retry, exc)
+                remaining = remaining_budget()
+                if (not retryable or retry >= self.max_retries or (can_retry is not None and not can_retry())
+                        or (remaining is not None and delay >= remaining)):
+                    if isinstance(exc, asyncio.TimeoutError):
+                        raise DeadlineExceededError(f"'{stage}' 단계의 OpenAI 응답이 {timeout:.1f}초 안에 오지 않았습니다.") from exc
+                    raise
+            finally:
+                breaker.record(ok)
+
+            retry += 1
+            self.counters["retries"] += 1
+            self._emit(stage, "retry")
+            await asyncio.sleep(delay)
+
+    async def _hedged(self, stage: str, attempt: Callable[[], Awaitable[T]], timeout: float,
+                      hedgeable: bool, healthy: bool) -> T:
+        # attempt 를 시작하고, hedge 지연시간이 지나도 응답이 없으면 같은 요청을 하나 더 시작
+        # - 먼저 성공한 응답을 사용하고 나머지는 취소
+        # - 하나가 실패하면 나머지 하나를 계속 기다림. 모두 실패하면 첫 번째 오류를 다시 발생
+        # - hedging 대상 호출의 지연시간만 기록 (스트리밍 / 다중 샘플 호출은 지연시간 분포가 달라서 제외)
+        window = self._latency.setdefault(stage, LatencyWindow()) if hedgeable else None
+        delay = self.hedge_delay(stage) if hedgeable and healthy else None
+        started = time.monotonic()
+        give_up_at = started + timeout
+        launched: dict[asyncio.Future, float] = {asyncio.ensure_future(attempt()): started}
+        pending = set(launched)
+        hedge_task = None
+        errors: list[BaseException] = []
+        try:
+            while pending:
+                now = time.monotonic()
+                wait = give_up_at - now
+                if hedge_task is None and delay is not None:
+                    wait = min(wait, started + delay - now)
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, wait),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    exc = task.exception()
+                    if exc is None:
+                        if window is not None:
+                            window.add(time.monotonic() - launched[task])
+                        if task is hedge_task:
+                            self.counters["hedge_wins"] += 1
+                            self._emit(stage, "hedge_won")
+                        return task.result()
+                    errors.append(exc)
+                if done:
+                    continue
+                now = time.monotonic()
+                if now >= give_up_at:
+                    raise asyncio.TimeoutError()
+                if hedge_task is None and delay is not None:
+                    hedge_task = asyncio.ensure_future(attempt())
+                    launched[hedge_task] = now
+                    pending.add(hedge_task)
+                    self._hedges[stage] = self._hedges.get(stage, 0) + 1
+                    self.counters["hedges"] += 1
+                    self._emit(stage, "hedge")
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            **self.counters,
+            "hedge_delay": {stage: round(d, 3) for stage in self._latency if (d := self.hedge_delay(stage)) is not None},
+            "breakers": {key: breaker.stats() for key, breaker in self._breakers.items()},
+        }
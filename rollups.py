@@ -0,0 +1,281 @@
+# 달력 / 감정 추이 화면용 일별·주별·월별 집계(rollup) 모듈 (SQLite)
+# - 일기 / 이벤트 분석이 끝날 때마다 그 날짜의 기록(fact)을 저장하고, 이전 기록과의 차이만 일·주·월 집계에 더함
+#   (같은 기록(같은 날짜의 일기 / 이벤트 분석)을 다시 만들거나 지우면 이전 값은 빼고 새 값만 반영,
+#    사용자 + 대화방 + 날짜로 구분되지 않는 일기는 일기마다 따로 기록해서 같은 날 여러 개면 모두 더함)
+# - 집계는 대화방별과 사용자 전체(room "*")를 함께 유지 → 기간 조회는 구간(bucket) 수만큼만 읽음 (LLM 호출 없음)
+# - 감정 비율은 합계를 저장해두고 조회할 때 감정 결과가 있는 일기 수로 나눠 평균을 계산
+import datetime
+import json
+import threading
+import time
+from collections import Counter
+from typing import Iterable
+
+from concurrency import connect_sqlite
+
+# 집계 단위
+PERIODS = ("day", "week", "month")
+ALL_ROOMS = "*"
+
+# 일기 감정 라벨 (diary_store.EMOTION_LABELS 와 같은 순서) / 이벤트 분석 감정 라벨
+EMOTION_LABELS = ("좋음", "평범함", "나쁨")
+EVENT_EMOTIONS = ("긍정", "부정", "중립")
+
+# 집계 행에 더하는 값 (기록 하나가 만드는 값은 diary_fact / event_fact 참고)
+_FIELDS = ("diaries", "emotion_samples", "good", "neutral", "bad", "event_days", "events", "positive", "negative",
+           "neutral_events")
+
+
+def bucket_of(date: str, period: str) -> str:
+    """날짜("YYYY-MM-DD")가 속한 구간 키 (day: 그 날짜 / week: 그 주 월요일 / month: "YYYY-MM")"""
+    if period == "day":
+        return date
+    if period == "month":
+        return date[:7]
+    day = datetime.date.fromisoformat(date)
+    return (day - datetime.timedelta(days=day.weekday())).isoformat()
+
+
+def diary_fact(diary: dict) -> dict:
+    """일기 결과에서 집계에 쓰는 값 (감정 비율 / 키워드, 감정 결과가 없거나 잘못되면 감정 평균에서 빠짐)"""
+    emotions = diary.get("emotions") if isinstance(diary.get("emotions"), dict) else {}
+    values = [emotions.get(label) for label in EMOTION_LABELS]
+    has_emotions = all(isinstance(value, (int, float)) for value in values)
+    keywords = [str(k).strip() for k in diary.get("keywords") or [] if str(k).strip()]
+    return {
+        "diaries": 1,
+        "emotion_samples": int(has_emotions),
+        **dict(zip(("good", "neutral", "bad"), values if has_emotions else (0, 0, 0))),
+        "keywords": list(dict.fromkeys(keywords)),
+    }
+
+
+def event_fact(result: dict) -> dict:
+    """이벤트 분석 결과에서 집계에 쓰는 값 (이벤트 수 / 감정)"""
+    emotion = result.get("emotion")
+    return {
+        "event_days": 1,
+        "events": len(result.get("events") or []),
+        "positive": int(emotion == "긍정"),
+        "negative": int(emotion == "부정"),
+        "neutral_events": int(emotion == "중립"),
+    }
+
+
+class RollupStore:
+    """
+    날짜별 기록과 일·주·월 집계를 보관하는 저장소
+
+    Args:
+        db_path: SQLite 파일 경로
+    """
+
+    def __init__(self, db_path: str):
+        self._db = connect_sqlite(db_path)
+        self._lock = threading.Lock()
+        counters = ", ".join(f"{field} REAL NOT NULL DEFAULT 0" for field in _FIELDS)
+        self._db.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS rollup_facts (
+                kind TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                room_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                item TEXT NOT NULL DEFAULT '',
+                fact TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (kind, user_id, room_id, date, item)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS rollups (
+                user_id TEXT NOT NULL,
+                room_id TEXT NOT NULL,
+                period TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                {counters},
+                PRIMARY KEY (user_id, room_id, period, bucket)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS rollup_keywords (
+                user_id TEXT NOT NULL,
+                room_id TEXT NOT NULL,
+                period TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, room_id, period, bucket, keyword)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def record(self, kind: str, user_id: str, room_id: str, date: str, fact: dict | None, item: str = "") -> None:
+        """
+        날짜 하나의 기록을 저장하고 이전 기록과의 차이를 집계에 반영합니다.
+
+        Args:
+            kind: "diary" 또는 "event"
+            user_id / room_id: 사용자 / 대화방 (대화방 없이 만든 결과는 "")
+            date: "YYYY-MM-DD"
+            fact: diary_fact / event_fact 결과 (None 이면 기록 삭제)
+            item: 같은 날짜 안에서 기록을 구분하는 키 ("" 이면 날짜마다 하나, 예: 사용자 ID 없이 만든 일기는 diary_id)
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._record_unlocked(kind, user_id, room_id, date, fact, item)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _record_unlocked(self, kind: str, user_id: str, room_id: str, date: str, fact: dict | None,
+                         item: str = "") -> None:
+        key = (kind, user_id, room_id, date, item)
+        row = self._db.execute(
+            "SELECT fact FROM rollup_facts WHERE kind = ? AND user_id = ? AND room_id = ? AND date = ? AND item = ?", key
+        ).fetchone()
+        old = json.loads(row[0]) if row else {}
+        new = fact or {}
+        if old == new:
+            return
+        delta = {field: new.get(field, 0) - old.get(field, 0) for field in _FIELDS}
+        keyword_delta = Counter(new.get("keywords", []))
+        keyword_delta.subtract(old.get("keywords", []))
+        self._apply(user_id, room_id, date, delta, {k: v for k, v in keyword_delta.items() if v})
+        if fact is None:
+            self._db.execute(
+                "DELETE FROM rollup_facts WHERE kind = ? AND user_id = ? AND room_id = ? AND date = ? AND item = ?", key
+            )
+        else:
+            self._db.execute("INSERT OR REPLACE INTO rollup_facts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (*key, json.dumps(fact, ensure_ascii=False), time.time()))
+
+    def _apply(self, user_id: str, room_id: str, date: str, delta: dict, keyword_delta: dict) -> None:
+        # 대화방 집계와 사용자 전체 집계에 같은 차이를 더함
+        changed = [field for field in _FIELDS if delta[field]]
+        for room in dict.fromkeys((room_id, ALL_ROOMS)):
+            for period in PERIODS:
+                key = (user_id, room, period, bucket_of(date, period))
+                if changed:
+                    self._db.execute(
+                        f"INSERT INTO rollups (user_id, room_id, period, bucket, {', '.join(changed)}) "
+                        f"VALUES (?, ?, ?, ?, {', '.join('?' for _ in changed)}) "
+                        f"ON CONFLICT (user_id, room_id, period, bucket) "
+                        f"DO UPDATE SET {', '.join(f'{f} = {f} + excluded.{f}' for f in changed)}",
+                        (*key, *(delta[field] for field in changed)),
+                    )
+                for keyword, count in keyword_delta.items():
+                    self._db.execute(
+                        "INSERT INTO rollup_keywords VALUES (?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (user_id, room_id, period, bucket, keyword) DO UPDATE SET count = count + excluded.count",
+                        (*key, keyword, count),
+                    )
+                if keyword_delta:
+                    self._db.execute(
+                        "DELETE FROM rollup_keywords WHERE user_id = ? AND room_id = ? AND period = ? AND bucket = ? "
+                        "AND count <= 0", key,
+                    )
+                if changed:
+                    self._db.execute(
+                        "DELETE FROM rollups WHERE user_id = ? AND room_id = ? AND period = ? AND bucket = ? "
+                        f"AND {' AND '.join(f'{field} = 0' for field in _FIELDS)}", key,
+                    )
+
+    def rebuild_diaries(self, diaries: Iterable[tuple[str, str, str, str, dict]]) -> int:
+        """
+        일기 기록을 전부 지우고 (user_id, room_id, 날짜, item, 일기 결과) 목록으로 다시 만든 뒤 집계를 다시 계산합니다.
+        - 집계가 생기기 전에 저장된 일기를 반영할 때 사용 (이벤트 기록은 그대로 두고 집계에 다시 반영)
+
+        Returns:
+            int: 반영한 일기 수
+        """
+        count = 0
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM rollup_facts WHERE kind = 'diary'")
+                self._db.execute("DELETE FROM rollups")
+                self._db.execute("DELETE FROM rollup_keywords")
+                events = self._db.execute(
+                    "SELECT user_id, room_id, date, item, fact FROM rollup_facts WHERE kind = 'event'"
+                ).fetchall()
+                self._db.execute("DELETE FROM rollup_facts WHERE kind = 'event'")
+                for user_id, room_id, date, item, fact in events:
+                    self._record_unlocked("event", user_id, room_id, date, json.loads(fact), item)
+                for user_id, room_id, date, item, diary in diaries:
+                    self._record_unlocked("diary", user_id, room_id, date, diary_fact(diary), item)
+                    count += 1
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return count
+
+    def get_range(self, user_id: str, room_id: str = ALL_ROOMS, period: str = "day", start_date: str | None = None,
+                  end_date: str | None = None, top_k: int = 5) -> list[dict]:
+        """
+        기간 안의 구간별 집계를 오래된 구간부터 반환합니다. (기록이 없는 구간은 빠짐)
+
+        Args:
+            user_id / room_id: 사용자 / 대화방 (ALL_ROOMS 면 사용자의 모든 대화방)
+            period: "day" / "week" / "month"
+            start_date / end_date: "YYYY-MM-DD" (그 날짜가 속한 구간까지 포함)
+            top_k: 구간마다 돌려줄 키워드 수 (많이 나온 순서)
+
+        Returns:
+            list[dict]: [{"bucket", "diaries", "emotions" (평균 %), "dominant_emotion", "keywords",
+                          "event_days", "events", "event_emotions"}, ...]
+        """
+        where, args = ["user_id = ?", "room_id = ?", "period = ?"], [user_id, room_id, period]
+        if start_date:
+            where.append("bucket >= ?")
+            args.append(bucket_of(start_date, period))
+        if end_date:
+            where.append("bucket <= ?")
+            args.append(bucket_of(end_date, period))
+        condition = " AND ".join(where)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT bucket, {', '.join(_FIELDS)} FROM rollups WHERE {condition} ORDER BY bucket", args
+            ).fetchall()
+            keyword_rows = self._db.execute(
+                f"""
+                SELECT bucket, keyword, count FROM (
+                    SELECT bucket, keyword, count,
+                           ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY count DESC, keyword) AS rank
+                    FROM rollup_keywords WHERE {condition}
+                ) WHERE rank <= ?
+                """,
+                [*args, top_k],
+            ).fetchall() if top_k > 0 else []
+
+        keywords: dict[str, list] = {}
+        for bucket, keyword, count in keyword_rows:
+            keywords.setdefault(bucket, []).append({"keyword": keyword, "count": count})
+        buckets = []
+        for bucket, *values in rows:
+            totals = dict(zip(_FIELDS, values))
+            diaries = int(totals["diaries"])
+            samples = int(totals["emotion_samples"])
+            emotions = {
+                label: round(totals[field] / samples, 1)
+                for label, field in zip(EMOTION_LABELS, ("good", "neutral", "bad"))
+            } if samples else {}
+            buckets.append({
+                "bucket": bucket,
+                "diaries": diaries,
+                "emotions": emotions,
+                "dominant_emotion": max(emotions, key=emotions.get) if emotions else None,
+                "keywords": keywords.get(bucket, []),
+                "event_days": int(totals["event_days"]),
+                "events": int(totals["events"]),
+                "event_emotions": {
+                    label: int(totals[field])
+                    for label, field in zip(EVENT_EMOTIONS, ("positive", "negative", "neutral_events"))
+                },
+            })
+        return buckets
+
+    def stats(self) -> dict:
+        with self._lock:
+            facts = dict(self._db.execute("SELECT kind, COUNT(*) FROM rollup_facts GROUP BY kind").fetchall())
+            buckets = dict(self._db.execute("SELECT period, COUNT(*) FROM rollups GROUP BY period").fetchall())
+        return {"facts": facts, "buckets": buckets}
@@ -0,0 +1,182 @@
+# 일관성 테스트용 텍스트 유사도 계산 모듈
+# - 한국어는 조사/어미가 붙어서 띄어쓰기 단어 비교로는 같은 표현도 다른 단어가 되므로 글자 n-gram 으로 비교
+#   (예: "회의가" / "회의를" → 단어는 다르지만 "회의" 2-gram 을 공유)
+# - 텍스트마다 n-gram 을 한 번만 만들고 정수 ID 로 바꾼 뒤, 행렬 곱 한 번으로 모든 쌍의 유사도를 계산 (NumPy)
+# - 텍스트가 아주 많으면 MinHash 서명으로 평균 Jaccard 유사도를 근사 (쌍을 하나씩 비교하지 않음)
+# - NumPy 가 없으면 정수 ID 집합으로 같은 값을 계산 (느리지만 결과는 같음)
+from collections import Counter
+from typing import Literal
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 는 선택 의존성
+    np = None
+
+# 기본 n-gram 길이 (한글은 2글자 단위가 단어 어근을 잘 잡음)
+DEFAULT_NGRAM = 2
+# 텍스트 수가 이 값 이상이면 평균 Jaccard 를 MinHash 로 근사
+MINHASH_MIN_TEXTS = 1000
+# MinHash 해시 함수 개수 (많을수록 정확, 오차는 대략 1/sqrt(개수))
+MINHASH_NUM_PERM = 128
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def char_ngrams(text: str, n: int = DEFAULT_NGRAM) -> list[str]:
+    """
+    띄어쓰기로 나눈 단어마다 글자 n-gram 을 만듭니다. (n 보다 짧은 단어는 그대로 사용, 소문자 변환)
+    """
+    grams = []
+    for word in text.lower().split():
+        if len(word) <= n:
+            grams.append(word)
+        else:
+            grams.extend(word[i:i + n] for i in range(len(word) - n + 1))
+    return grams
+
+
+class Vocabulary:
+    """
+    n-gram 문자열을 0부터 시작하는 정수 ID 로 바꿔주는 사전 (같은 문자열은 항상 같은 ID)
+    """
+
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def encode(self, grams: list[str]) -> Counter:
+        """n-gram 목록을 {ID: 등장 횟수} 로 바꿉니다."""
+        ids = self._ids
+        return Counter(ids.setdefault(gram, len(ids)) for gram in grams)
+
+
+def encode_texts(texts: list[str], n: int = DEFAULT_NGRAM) -> tuple[list[Counter], int]:
+    """
+    텍스트마다 n-gram 을 한 번만 만들고 정수 ID 로 바꿉니다.
+
+    Returns:
+        tuple: (텍스트별 {ID: 등장 횟수} 목록, 전체 n-gram 종류 수)
+    """
+    vocab = Vocabulary()
+    encoded = [vocab.encode(char_ngrams(text, n)) for text in texts]
+    return encoded, len(vocab)
+
+
+def _count_matrix(encoded: list[Counter], vocab_size: int):
+    # 텍스트 × n-gram 등장 횟수 행렬
+    matrix = np.zeros((len(encoded), max(vocab_size, 1)), dtype=np.float32)
+    for row, counts in enumerate(encoded):
+        if counts:
+            matrix[row, list(counts.keys())] = list(counts.values())
+    return matrix
+
+
+def pairwise_similarity(texts: list[str], metric: Literal["jaccard", "cosine"] = "jaccard",
+                        n: int = DEFAULT_NGRAM):
+    """
+    모든 텍스트 쌍의 유사도 행렬을 계산합니다. (대각선은 1.0, n-gram 이 없는 텍스트와의 유사도는 0.0)
+
+    Args:
+        texts: 비교할 텍스트 목록
+        metric: jaccard (n-gram 집합 기준) / cosine (n-gram 등장 횟수 벡터 기준)
+        n: n-gram 길이
+
+    Returns:
+        NumPy 배열 (NumPy 가 없으면 2차원 리스트)
+    """
+    encoded, vocab_size = encode_texts(texts, n)
+    if np is None:
+        return _pairwise_similarity_python(encoded, metric)
+
+    counts = _count_matrix(encoded, vocab_size)
+    if metric == "cosine":
+        norms = np.linalg.norm(counts, axis=1)
+        inner = counts @ counts.T
+        denom = np.outer(norms, norms)
+    else:
+        present = (counts > 0).astype(np.float32)
+        inner = present @ present.T                       # 교집합 크기
+        sizes = present.sum(axis=1)
+        denom = sizes[:, None] + sizes[None, :] - inner   # 합집합 크기
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(denom > 0, inner / denom, 0.0)
+    np.fill_diagonal(scores, 1.0)
+    return scores
+
+
+def _pairwise_similarity_python(encoded: list[Counter], metric: str) -> list[list[float]]:
+    size = len(encoded)
+    scores = [[1.0] * size for _ in range(size)]
+    sets = [set(counts) for counts in encoded]
+    norms = [sum(v * v for v in counts.values()) ** 0.5 for counts in encoded]
+    for i in range(size):
+        for j in range(i + 1, size):
+            if metric == "cosine":
+                denom = norms[i] * norms[j]
+                inner = sum(v * encoded[j].get(k, 0) for k, v in encoded[i].items())
+            else:
+                inner = len(sets[i] & sets[j])
+                denom = len(sets[i]) + len(sets[j]) - inner
+            scores[i][j] = scores[j][i] = inner / denom if denom else 0.0
+    return scores
+
+
+def minhash_signatures(encoded: list[Counter], num_perm: int = MINHASH_NUM_PERM, seed: int = 1):
+    """
+    텍스트별 n-gram ID 집합의 MinHash 서명을 계산합니다. (NumPy 필요)
+    - 두 서명에서 값이 같은 칸의 비율이 두 집합의 Jaccard 유사도의 추정치
+    - n-gram 이 없는 텍스트는 다른 어떤 텍스트와도 겹치지 않는 값으로 채움
+
+    Returns:
+        (텍스트 수 × num_perm) int64 배열
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.int64)
+    b = rng.integers(0, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.int64)
+    signatures = np.empty((len(encoded), num_perm), dtype=np.int64)
+    for row, counts in enumerate(encoded):
+        if not counts:
+            signatures[row] = -1 - row
+            continue
+        ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        signatures[row] = ((a * ids + b) % _MERSENNE_PRIME).min(axis=1)
+    return signatures
+
+
+def minhash_mean_similarity(encoded: list[Counter], num_perm: int = MINHASH_NUM_PERM) -> float:
+    """
+    MinHash 로 모든 쌍의 평균 Jaccard 유사도를 근사합니다.
+    - 해시 함수마다 같은 값을 가진 텍스트 묶음의 크기 c 로 일치하는 쌍의 수 c(c-1)/2 를 세므로
+      쌍을 하나씩 비교하지 않음 (텍스트 수 N 에 대해 O(N × num_perm))
+    """
+    size = len(encoded)
+    if size < 2:
+        return 1.0
+    signatures = minhash_signatures(encoded, num_perm)
+    matches = 0
+    for column in signatures.T:
+        _, group_sizes = np.unique(column, return_counts=True)
+        matches += int((group_sizes * (group_sizes - 1) // 2).sum())
+    return matches / (num_perm * size * (size - 1) / 2)
+
+
+def mean_pairwise_similarity(texts: list[str], metric: Literal["jaccard", "cosine"] = "jaccard",
+                             n: int = DEFAULT_NGRAM, minhash_min_texts: int = MINHASH_MIN_TEXTS) -> float:
+    """
+    모든 텍스트 쌍의 평균 유사도를 계산합니다. (텍스트가 2개 미만이면 1.0)
+    - jaccard 이고 텍스트 수가 minhash_min_texts 이상이면 MinHash 근사값을 사용 (NumPy 가 있을 때)
+    """
+    size = len(texts)
+    if size < 2:
+        return 1.0
+    if metric == "jaccard" and np is not None and size >= minhash_min_texts:
+        encoded, _ = encode_texts(texts, n)
+        return minhash_mean_similarity(encoded)
+
+    scores = pairwise_similarity(texts, metric, n)
+    if np is not None:
+        upper = np.triu_indices(size, k=1)
+        return float(scores[upper].mean())
+    pairs = [scores[i][j] for i in range(size) for j in range(i + 1, size)]
+    return sum(pairs) / len(pairs)
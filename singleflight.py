@@ -0,0 +1,87 @@
+# 같은 작업이 동시에 여러 번 실행되지 않도록 합치는 모듈 (single-flight)
+# - 앱이 시간 초과로 재시도하거나 사용자가 두 번 누르면 같은 일기 요청이 동시에 여러 개 들어옴
+# - 같은 키로 실행 중인 작업이 있으면 새로 실행하지 않고 그 작업이 끝나길 기다렸다가 결과를 함께 씀
+# - 결과를 저장해두지는 않음 (끝난 작업의 결과 재사용은 llm_cache 담당)
+# - main.py 에서 요청 단위(정규화한 DiaryRequest)와 단계 단위(LLM 호출 캐시 키)로 사용
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        self.abandoned = False   # 기다리는 호출이 없어 취소한 작업 (새 호출은 이 작업에 붙지 않음)
+
+
+class SingleFlight:
+    """
+    같은 키로 동시에 들어온 비동기 작업을 한 번만 실행하고 결과를 나눠 주는 도구
+
+    - 처음 호출(leader)이 작업을 태스크로 실행하고, 끝나기 전에 같은 키로 온 호출은 그 태스크를 기다림
+    - 결과는 호출마다 깊은 복사본을 돌려줌 (엔드포인트가 결과 딕셔너리에 키를 추가해도 서로 영향 없음)
+    - 작업이 실패하면 기다리던 호출 모두 같은 예외를 받음
+    - 기다리던 호출 하나가 취소되어도 작업은 계속되고, 기다리는 호출이 모두 취소되면 작업도 취소
+    - 작업은 leader 의 컨텍스트(요청 시간 예산, 지표 라벨 등)로 실행됨
+
+    Args:
+        scope: 지표 / 통계에서 구분하는 이름 (예: "request", "llm")
+        on_event: (scope, 라벨, 결과) 로 호출되는 함수 (결과: leader / shared)
+    """
+
+    def __init__(self, scope: str, on_event: Callable[[str, str, str], Any] | None = None):
+        self.scope = scope
+        self.on_event = on_event
+        self._flights: dict[Hashable, _Flight] = {}
+        self.counters = {"leaders": 0, "shared": 0, "cancelled": 0}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]], label: str = "") -> T:
+        """
+        키가 같은 작업이 실행 중이면 그 결과를, 아니면 fn() 을 실행한 결과를 반환합니다.
+
+        Args:
+            key: 같은 작업인지 판단하는 키
+            fn: 실행할 작업 (leader 일 때만 호출)
+            label: 지표 라벨 (예: 단계 이름)
+        """
+        flight = self._flights.get(key)
+        if flight is None or flight.abandoned:
+            flight = _Flight(asyncio.create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self._record(label, "leader")
+        else:
+            self._record(label, "shared")
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.task.done():
+                raise
+            # 이 호출만 취소된 경우: 아무도 기다리지 않으면 작업도 취소
+            flight.waiters -= 1
+            if flight.waiters == 0:
+                self.counters["cancelled"] += 1
+                flight.abandoned = True
+                flight.task.cancel()
+            raise
+        return copy.deepcopy(result)
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _record(self, label: str, result: str) -> None:
+        self.counters["leaders" if result == "leader" else "shared"] += 1
+        if self.on_event is not None:
+            self.on_event(self.scope, label, result)
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_flight": len(self._flights)}
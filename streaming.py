@@ -0,0 +1,104 @@
+# Server-Sent Events(SSE) 스트리밍 관련 유틸리티
+# - SSE 이벤트 문자열 생성
+# - 스트리밍으로 들어오는 일기 JSON 에서 섹션별 텍스트를 조금씩 뽑아내는 파서
+import json
+import re
+
+
+def format_sse(event: str, data) -> str:
+    """
+    SSE 형식의 이벤트 문자열을 만듭니다.
+
+    Args:
+        event: 이벤트 이름 (예: "summary", "section_delta", "done")
+        data: JSON 으로 직렬화할 데이터
+
+    Returns:
+        str: "event: ...\\ndata: ...\\n\\n" 형태의 문자열
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+# 아직 다 들어오지 않은 이스케이프 문자열 (예: 끝이 "\" 또는 "\u12")
+_PARTIAL_ESCAPE = re.compile(r"\\(u[0-9a-fA-F]{0,3})?$")
+
+
+class SectionStreamParser:
+    """
+    스트리밍으로 조금씩 도착하는 일기 JSON 에서 섹션 값을 점진적으로 추출합니다.
+
+    feed() 에 새로 받은 텍스트 조각을 넣으면 다음 이벤트 목록을 반환합니다.
+        ("section_delta", {"section": 이름, "delta": 새로 추가된 텍스트})
+        ("section", {"section": 이름, "text": 완성된 전체 텍스트})
+
+    Args:
+        sections: 추출할 섹션 이름 목록
+    """
+
+    def __init__(self, sections: list[str]):
+        self.sections = sections
+        self._buffer = ""
+        self._sent: dict[str, str] = {}       # 섹션별로 지금까지 보낸 텍스트
+        self._completed: set[str] = set()     # 닫는 따옴표까지 받은 섹션
+        self._key_patterns = {
+            name: re.compile(r'"' + re.escape(name) + r'"\s*:\s*"') for name in sections
+        }
+
+    def _scan_value(self, start: int) -> tuple[str, bool]:
+        # start 위치부터 문자열 값을 읽어 (원본 이스케이프 문자열, 닫힘 여부) 반환
+        i = start
+        buf = self._buffer
+        while i < len(buf):
+            ch = buf[i]
+            if ch == "\\":
+                i += 2
+                continue
+            if ch == '"':
+                return buf[start:i], True
+            i += 1
+        return buf[start:min(i, len(buf))], False
+
+    @staticmethod
+    def _decode(raw: str) -> str:
+        raw = _PARTIAL_ESCAPE.sub("", raw)
+        try:
+            return json.loads('"' + raw + '"')
+        except json.JSONDecodeError:
+            return raw
+
+    def feed(self, delta: str) -> list[tuple[str, dict]]:
+        self._buffer += delta
+        events = []
+        for name in self.sections:
+            if name in self._completed:
+                continue
+            match = self._key_patterns[name].search(self._buffer)
+            if not match:
+                continue
+            raw, closed = self._scan_value(match.end())
+            text = self._decode(raw)
+            sent = self._sent.get(name, "")
+            if len(text) > len(sent) and text.startswith(sent):
+                events.append(("section_delta", {"section": name, "delta": text[len(sent):]}))
+                self._sent[name] = text
+            if closed:
+                self._completed.add(name)
+                events.append(("section", {"section": name, "text": text}))
+        return events
+
+    def finish(self, diary: dict) -> list[tuple[str, dict]]:
+        """
+        스트림이 끝난 뒤 최종 파싱 결과와 비교해서 아직 완료 이벤트를 보내지 않은 섹션을 마무리합니다.
+        """
+        events = []
+        for name in self.sections:
+            if name in self._completed:
+                continue
+            text = str(diary.get(name, ""))
+            sent = self._sent.get(name, "")
+            if text.startswith(sent) and len(text) > len(sent):
+                events.append(("section_delta", {"section": name, "delta": text[len(sent):]}))
+            self._completed.add(name)
+            events.append(("section", {"section": name, "text": text}))
+        return events